@@ -1,7 +1,8 @@
 from openfoodfacts.barcode import normalize_barcode
 
 from .api import API
-from .dataset import ProductDataset, get_dataset
+from .async_api import AsyncAPI
+from .dataset import MultiFlavorDataset, ProductDataset, get_dataset
 from .ocr import OCRResult
 from .types import (
     APIConfig,
@@ -18,12 +19,14 @@ __all__ = [
     "API",
     "APIConfig",
     "APIVersion",
+    "AsyncAPI",
     "Country",
     "DatasetType",
     "Facet",
     "Flavor",
     "Environment",
     "Lang",
+    "MultiFlavorDataset",
     "OCRResult",
     "ProductDataset",
     "get_dataset",
@@ -1,21 +1,97 @@
-from typing import Any, Dict, List, Optional, Tuple, Union, cast
+import collections
+import concurrent.futures
+import contextlib
+import dataclasses
+import math
+import time
+from typing import (
+    Any,
+    Callable,
+    Deque,
+    Dict,
+    Iterable,
+    Iterator,
+    List,
+    Optional,
+    Tuple,
+    Union,
+    cast,
+)
 
 import requests
+from urllib3.exceptions import NewConnectionError
 
+from .barcode import normalize_barcode
+from .cache import CacheEntry, ResponseCache
+from .ratelimit import (
+    THROTTLED_STATUS_CODES,
+    AdaptiveRateLimiter,
+    EndpointClass,
+    parse_retry_after,
+)
 from .types import APIConfig, APIVersion, Country, Environment, Facet, Flavor, JSONType
-from .utils import URLBuilder, http_session
+from .utils import (
+    RETRY_STATUS_CODES,
+    URLBuilder,
+    create_http_session,
+    decode_json,
+    http_session,
+    iter_json_array,
+)
 
 
 def get_http_auth(environment: Environment) -> Optional[Tuple[str, str]]:
     return ("off", "off") if environment is Environment.net else None
 
 
+def get_base_url(api_config: APIConfig, flavor: Optional[Flavor] = None) -> str:
+    """Return the base URL of Product Opener to use for `api_config`.
+
+    :param api_config: the API configuration
+    :param flavor: the flavor to use, defaults to the flavor of
+        `api_config`. Ignored if `api_config.base_url` is set.
+    """
+    if api_config.base_url is not None:
+        return api_config.base_url.rstrip("/")
+    return URLBuilder.country(
+        api_config.flavor if flavor is None else flavor,
+        environment=api_config.environment,
+        country_code=api_config.country.name,
+    )
+
+
+def get_http_session(api_config: APIConfig) -> requests.Session:
+    """Return the requests session to use for `api_config`: its own session
+    if set, the global `http_session` otherwise."""
+    return http_session if api_config._session is None else api_config._session
+
+
+def get_timeout(api_config: APIConfig) -> Union[float, Tuple[float, float]]:
+    """Return the `timeout` parameter of requests for `api_config`."""
+    if api_config.connect_timeout is None:
+        return api_config.timeout
+    return (api_config.connect_timeout, api_config.timeout)
+
+
+def _send_rate_limited(
+    api_config: APIConfig,
+    endpoint_class: EndpointClass,
+    send_request: Callable[[], requests.Response],
+) -> requests.Response:
+    """Send a request with the rate limiter of `api_config`, if any."""
+    if api_config._rate_limiter is None:
+        return send_request()
+    return api_config._rate_limiter.send(endpoint_class, send_request)
+
+
 def send_get_request(
     url: str,
     api_config: APIConfig,
     params: Optional[Dict[str, Any]] = None,
     return_none_on_404: bool = False,
     auth: Optional[Tuple[str, str]] = None,
+    session: Optional[requests.Session] = None,
+    endpoint_class: EndpointClass = EndpointClass.product,
 ) -> Optional[JSONType]:
     """Send a GET request to the given URL.
 
@@ -24,44 +100,353 @@ def send_get_request(
     :param params: the query parameters, defaults to None
     :param return_none_on_404: if True, None is returned if the response
         status code is 404, defaults to False
+    :param session: the requests session to use, defaults to the session of
+        `api_config` (see `get_http_session`)
+    :param endpoint_class: the endpoint class used by the rate limiter of
+        `api_config`, defaults to `EndpointClass.product`
     :return: the API response
     """
-    r = http_session.get(
-        url,
-        params=params,
-        headers={"User-Agent": api_config.user_agent},
-        timeout=api_config.timeout,
-        auth=auth,
+    headers = {"User-Agent": api_config.user_agent}
+    cache = api_config._cache
+    cache_key = None
+    cache_entry = None
+    if cache is not None:
+        cache_key = cache.get_key(url, params)
+        cache_entry = cache.get(cache_key)
+        if cache_entry is not None:
+            if cache.is_fresh(cache_entry):
+                return cache_entry.loads()
+            headers.update(cache_entry.get_validation_headers())
+
+    r = _send_rate_limited(
+        api_config,
+        endpoint_class,
+        lambda: (get_http_session(api_config) if session is None else session).get(
+            url,
+            params=params,
+            headers=headers,
+            timeout=get_timeout(api_config),
+            auth=auth,
+        ),
     )
+    if cache is not None and cache_key is not None:
+        if r.status_code == 304 and cache_entry is not None:
+            cache.set(
+                cache_key, dataclasses.replace(cache_entry, stored_at=time.time())
+            )
+            return cache_entry.loads()
+        if r.status_code == 200:
+            cache.set(
+                cache_key,
+                CacheEntry(
+                    content=r.content,
+                    stored_at=time.time(),
+                    etag=r.headers.get("ETag"),
+                    last_modified=r.headers.get("Last-Modified"),
+                ),
+            )
+
     if r.status_code == 404 and return_none_on_404:
         return None
     r.raise_for_status()
-    return r.json()
+    return decode_json(r.content)
 
 
-def send_form_urlencoded_post_request(
-    url: str, body: Dict[str, Any], api_config: APIConfig
-) -> requests.Response:
-    cookies = None
+def _add_form_credentials(
+    body: Dict[str, Any], api_config: APIConfig
+) -> Optional[Dict[str, str]]:
+    """Add the user credentials of `api_config` to the form `body` and return
+    the cookies to send with the request (if a session cookie is used)."""
     if api_config.username and api_config.password:
         body["user_id"] = api_config.username
         body["password"] = api_config.password
     elif api_config.session_cookie:
-        cookies = {
+        return {
             "session": api_config.session_cookie,
         }
-    r = http_session.post(
-        url,
-        data=body,
-        headers={"User-Agent": api_config.user_agent},
-        timeout=api_config.timeout,
-        auth=get_http_auth(api_config.environment),
-        cookies=cookies,
+    return None
+
+
+def send_form_urlencoded_post_request(
+    url: str, body: Dict[str, Any], api_config: APIConfig
+) -> requests.Response:
+    cookies = _add_form_credentials(body, api_config)
+    r = _send_rate_limited(
+        api_config,
+        EndpointClass.write,
+        lambda: get_http_session(api_config).post(
+            url,
+            data=body,
+            headers={"User-Agent": api_config.user_agent},
+            timeout=get_timeout(api_config),
+            auth=get_http_auth(api_config.environment),
+            cookies=cookies,
+        ),
     )
     r.raise_for_status()
     return r
 
 
+def _create_http_session(api_config: APIConfig, pool_maxsize: int) -> requests.Session:
+    """Create a requests session with the pool and retry settings of
+    `api_config`.
+
+    If `api_config` has a rate limiter, throttled responses are not retried
+    by the session, so that they reach the rate limiter.
+    """
+    retry_status_codes: Tuple[int, ...] = RETRY_STATUS_CODES
+    if api_config._rate_limiter is not None:
+        retry_status_codes = tuple(
+            status_code
+            for status_code in RETRY_STATUS_CODES
+            if status_code not in THROTTLED_STATUS_CODES
+        )
+    return create_http_session(
+        pool_connections=api_config.pool_connections,
+        pool_maxsize=pool_maxsize,
+        max_retries=api_config.max_retries,
+        retry_status_codes=retry_status_codes,
+    )
+
+
+@contextlib.contextmanager
+def _pooled_session(
+    api_config: APIConfig, pool_size: int
+) -> Iterator[requests.Session]:
+    """Yield a requests session whose connection pool can hold `pool_size`
+    connections per host, to be shared by `pool_size` threads.
+
+    The session of `api_config` is used if its pool is large enough,
+    otherwise a temporary session is created.
+    """
+    if api_config._session is not None and api_config.pool_maxsize >= pool_size:
+        yield api_config._session
+        return
+    with _create_http_session(api_config, pool_size) as session:
+        yield session
+
+
+def _iter_pages(
+    api_config: APIConfig,
+    fetch_page: Callable[[int, requests.Session], JSONType],
+    page_size: int,
+    prefetch: int,
+) -> Iterator[JSONType]:
+    """Iterate over the products of all the pages of a paginated endpoint.
+
+    The first page is fetched to get the total number of products (`count`),
+    then up to `prefetch` next pages are fetched concurrently while the
+    products of the current page are yielded.
+
+    :param api_config: the API configuration
+    :param fetch_page: a function returning the response of a page, given
+        the page number (starting at 1) and the session to use
+    :param page_size: the number of products per page
+    :param prefetch: the number of pages fetched in advance, 0 to fetch
+        pages only when they are needed
+    """
+    if prefetch < 0:
+        raise ValueError("prefetch must be >= 0")
+
+    with _pooled_session(api_config, max(prefetch, 1)) as session:
+        response = fetch_page(1, session)
+        page_count = max(1, math.ceil(int(response.get("count") or 0) / page_size))
+        first_products = response.get("products") or []
+        if prefetch == 0:
+            yield from first_products
+            for page in range(2, page_count + 1):
+                products = fetch_page(page, session).get("products") or []
+                if not products:
+                    # The result set shrank during the iteration
+                    return
+                yield from products
+            return
+
+        executor = concurrent.futures.ThreadPoolExecutor(prefetch)
+        pending: Deque[concurrent.futures.Future] = collections.deque()
+        next_page = 2
+
+        def fill_pending() -> None:
+            nonlocal next_page
+            while len(pending) < prefetch and next_page <= page_count:
+                pending.append(executor.submit(fetch_page, next_page, session))
+                next_page += 1
+
+        try:
+            # The next pages are requested before yielding any product, so
+            # that they're fetched while the caller processes the products
+            fill_pending()
+            yield from first_products
+            while pending:
+                products = pending.popleft().result().get("products") or []
+                if not products:
+                    return
+                fill_pending()
+                yield from products
+        finally:
+            executor.shutdown(wait=True, cancel_futures=True)
+
+
+@dataclasses.dataclass
+class ProductFetchResult:
+    """The result of a product fetch, see `ProductResource.get_many`.
+
+    :param code: the barcode of the product
+    :param product: the product, or None if the product was not found or if
+        an error occured
+    :param error: the error message if an error occured (or None)
+    """
+
+    code: str
+    product: Optional[JSONType] = None
+    error: Optional[str] = None
+
+
+@dataclasses.dataclass
+class ProductUpdateResult:
+    """The result of a product update, see `ProductResource.update_many`.
+
+    :param code: the barcode of the product
+    :param response: the API response, or None if an error occured or in
+        dry-run mode
+    :param error: the error message if the update failed (or None)
+    """
+
+    code: str
+    response: Optional[JSONType] = None
+    error: Optional[str] = None
+
+
+def _login(session: requests.Session, api_config: APIConfig) -> str:
+    """Log in with the username and password of `api_config` and return the
+    session cookie."""
+    r = _send_rate_limited(
+        api_config,
+        EndpointClass.write,
+        lambda: session.post(
+            f"{get_base_url(api_config)}/cgi/session.pl",
+            data={
+                "user_id": api_config.username,
+                "password": api_config.password,
+                ".submit": "Sign-in",
+            },
+            headers={"User-Agent": api_config.user_agent},
+            timeout=get_timeout(api_config),
+            auth=get_http_auth(api_config.environment),
+        ),
+    )
+    r.raise_for_status()
+    session_cookie = r.cookies.get("session") or session.cookies.get("session")
+    if not session_cookie:
+        raise ValueError("login failed, check the username and password")
+    return session_cookie
+
+
+def _is_unsent(error: requests.exceptions.RequestException) -> bool:
+    """Return True if `error` was raised before the request was sent (the
+    connection to the server could not be established), so that sending the
+    request again is safe even if it's not idempotent."""
+    if isinstance(error, requests.ConnectTimeout):
+        return True
+    reason = getattr(error.args[0], "reason", None) if error.args else None
+    return isinstance(reason, NewConnectionError)
+
+
+def _get_product_url(
+    base_url: str, api_config: APIConfig, code: str, fields: Optional[List[str]]
+) -> str:
+    if len(code) == 0:
+        raise ValueError("code must be a non-empty string")
+
+    url = f"{base_url}/api/{api_config.version.value}/product/{code}"
+    if fields:
+        # requests escape comma in URLs, as expected, but openfoodfacts
+        # server does not recognize escaped commas.
+        # See
+        # https://github.com/openfoodfacts/openfoodfacts-server/issues/1607
+        url += "?fields={}".format(",".join(fields))
+    return url
+
+
+def _get_product_from_response(
+    resp: Optional[JSONType], code: str, raise_if_invalid: bool
+) -> Optional[JSONType]:
+    if resp is None:
+        # product not found
+        return None
+
+    if resp["status"] == 0:
+        # invalid barcode
+        if raise_if_invalid:
+            raise ValueError(f"invalid barcode: {code}")
+        return None
+
+    return resp["product"]
+
+
+def _get_text_search_params(
+    query: str, page: int, page_size: int, sort_by: Optional[str]
+) -> JSONType:
+    params: JSONType = {
+        "search_terms": query,
+        "page": page,
+        "page_size": page_size,
+        "json": "1",
+    }
+    if sort_by is not None:
+        params["sort_by"] = sort_by
+    return params
+
+
+def _get_select_image_params(
+    api_config: APIConfig,
+    code: str,
+    image_id: str,
+    image_key: str,
+    rotate: Optional[int],
+    crop_bounding_box: Optional[Tuple[float, float, float, float]],
+) -> Tuple[JSONType, Optional[Dict[str, str]]]:
+    """Return the form parameters and the cookies of an image selection
+    request, see `ProductResource.select_image`."""
+    params: JSONType = {
+        "code": code,
+        "imgid": image_id,
+        # We need to tell Product Opener that the bounding box coordinates
+        # are related to the full image
+        "coordinates_image_size": "full",
+    }
+
+    if rotate is not None and rotate != 0:
+        if rotate not in (90, 180, 270):
+            raise ValueError(f"invalid value for rotation angle: {rotate}")
+        params["angle"] = str(rotate)
+
+    if crop_bounding_box is not None:
+        y_min, x_min, y_max, x_max = crop_bounding_box
+        params["x1"] = x_min
+        params["y1"] = y_min
+        params["x2"] = x_max
+        params["y2"] = y_max
+
+    if image_key is not None:
+        params["id"] = image_key
+
+    cookies = None
+    if api_config.session_cookie:
+        cookies = {
+            "session": api_config.session_cookie,
+        }
+    elif api_config.username:
+        params["user_id"] = api_config.username
+        params["password"] = api_config.password
+
+    if cookies is None and not params.get("password"):
+        raise ValueError(
+            "a password or a session cookie is required to select an image"
+        )
+    return params, cookies
+
+
 class RobotoffResource:
     def __init__(self, api_config: APIConfig):
         self.api_config = api_config
@@ -76,20 +461,19 @@ class RobotoffResource:
             returned, defaults to 0.01
         :return: the API response
         """
-        return http_session.post(
+        r = get_http_session(self.api_config).post(
             url=f"{self.base_url}/api/v1/predict/lang",
             data={"text": text, "k": k, "threshold": threshold},
-        ).json()
+            headers={"User-Agent": self.api_config.user_agent},
+            timeout=get_timeout(self.api_config),
+        )
+        return decode_json(r.content)
 
 
 class FacetResource:
     def __init__(self, api_config: APIConfig):
         self.api_config = api_config
-        self.base_url = URLBuilder.country(
-            self.api_config.flavor,
-            environment=api_config.environment,
-            country_code=self.api_config.country.name,
-        )
+        self.base_url = get_base_url(api_config)
 
     def get(self, facet_name: Union[Facet, str]) -> JSONType:
         facet = Facet.from_str_or_enum(facet_name)
@@ -99,6 +483,7 @@ class FacetResource:
             params={"json": "1"},
             api_config=self.api_config,
             auth=get_http_auth(self.api_config.environment),
+            endpoint_class=EndpointClass.search,
         )
         resp = cast(JSONType, resp)
         return resp
@@ -132,19 +517,60 @@ class FacetResource:
             params=params,
             api_config=self.api_config,
             auth=get_http_auth(self.api_config.environment),
+            endpoint_class=EndpointClass.search,
         )
         resp = cast(JSONType, resp)
         return resp
 
+    def iter_facet_products(
+        self,
+        facet_name: Union[Facet, str],
+        facet_value: str,
+        page_size: int = 100,
+        fields: Optional[List[str]] = None,
+        prefetch: int = 2,
+    ) -> Iterator[JSONType]:
+        """Iterate over all the products of a given facet value, across all
+        pages.
+
+        The next `prefetch` pages are fetched concurrently while the products
+        of the current page are yielded.
+
+        :param facet_name: the facet name, e.g. "labels"
+        :param facet_value: the facet value, e.g. "en:organic"
+        :param page_size: the number of items per page, defaults to 100
+        :param fields: a list of fields to return. If None, all fields are
+            returned.
+        :param prefetch: the number of pages fetched in advance, defaults
+            to 2
+        :yield: the products
+        """
+        facet = Facet.from_str_or_enum(facet_name)
+        facet_singular = facet.name.replace("_", "-")
+        params: JSONType = {"page_size": page_size}
+        if fields is not None:
+            params["fields"] = ",".join(fields)
+
+        def fetch_page(page: int, session: requests.Session) -> JSONType:
+            return cast(
+                JSONType,
+                send_get_request(
+                    url=f"{self.base_url}/{facet_singular}/{facet_value}.json",
+                    params={**params, "page": page},
+                    api_config=self.api_config,
+                    auth=get_http_auth(self.api_config.environment),
+                    session=session,
+                    endpoint_class=EndpointClass.search,
+                ),
+            )
+
+        return _iter_pages(self.api_config, fetch_page, page_size, prefetch)
+
 
 class ProductResource:
     def __init__(self, api_config: APIConfig):
         self.api_config = api_config
-        self.base_url = URLBuilder.country(
-            self.api_config.flavor,
-            environment=api_config.environment,
-            country_code=self.api_config.country.name,
-        )
+        self.base_url = get_base_url(api_config)
 
     def get(
         self,
@@ -163,34 +589,134 @@ class ProductResource:
             barcode is invalid, defaults to False.
         :return: the API response
         """
-        if len(code) == 0:
-            raise ValueError("code must be a non-empty string")
-
-        fields = fields or []
-        url = f"{self.base_url}/api/{self.api_config.version.value}/product/{code}"
-
-        if fields:
-            # requests escape comma in URLs, as expected, but openfoodfacts
-            # server does not recognize escaped commas.
-            # See
-            # https://github.com/openfoodfacts/openfoodfacts-server/issues/1607
-            url += "?fields={}".format(",".join(fields))
+        return self._get(code, fields, raise_if_invalid)
 
+    def _get(
+        self,
+        code: str,
+        fields: Optional[List[str]] = None,
+        raise_if_invalid: bool = False,
+        session: Optional[requests.Session] = None,
+    ) -> Optional[JSONType]:
+        url = _get_product_url(self.base_url, self.api_config, code, fields)
         resp = send_get_request(
-            url=url, api_config=self.api_config, return_none_on_404=True
+            url=url,
+            api_config=self.api_config,
+            return_none_on_404=True,
+            session=session,
         )
+        return _get_product_from_response(resp, code, raise_if_invalid)
+
+    def get_many(
+        self,
+        codes: Iterable[str],
+        fields: Optional[List[str]] = None,
+        max_workers: int = 8,
+    ) -> List[ProductFetchResult]:
+        """Return many products, fetched concurrently.
+
+        Requests are sent from a pool of `max_workers` threads, sharing a
+        connection pool of the same size. Errors don't stop the other
+        fetches, they are reported in the result of each product.
+
+        :param codes: the barcodes of the products
+        :param fields: a list of fields to return. If None, all fields are
+            returned.
+        :param max_workers: the number of concurrent requests, defaults to 8
+        :return: a list of `ProductFetchResult`, in the order of `codes`.
+            `product` is None if the product doesn't exist or if the barcode
+            is invalid.
+        """
+        with _pooled_session(self.api_config, max_workers) as session:
 
-        if resp is None:
-            # product not found
-            return None
+            def fetch(code: str) -> ProductFetchResult:
+                try:
+                    product = self._get(code, fields, session=session)
+                except (requests.exceptions.RequestException, ValueError) as e:
+                    return ProductFetchResult(code, error=str(e) or repr(e))
+                return ProductFetchResult(code, product=product)
 
-        if resp["status"] == 0:
-            # invalid barcode
-            if raise_if_invalid:
-                raise ValueError(f"invalid barcode: {code}")
-            return None
+            with concurrent.futures.ThreadPoolExecutor(max_workers) as executor:
+                return list(executor.map(fetch, codes))
 
-        return resp["product"] if resp is not None else None
+    def get_batch(
+        self,
+        codes: Iterable[str],
+        fields: Optional[List[str]] = None,
+        chunk_size: int = 100,
+        max_workers: int = 1,
+    ) -> Dict[str, JSONType]:
+        """Return many products, using one search request per chunk of
+        `chunk_size` barcodes.
+
+        :param codes: the barcodes of the products
+        :param fields: a list of fields to return. If None, all fields are
+            returned. The `code` field is always returned.
+        :param chunk_size: the number of barcodes per request, defaults to
+            100
+        :param max_workers: the number of concurrent requests, defaults to 1
+        :return: a dict mapping the requested barcodes to the products.
+            Barcodes are matched after normalization (see
+            `normalize_barcode`), barcodes of products that were not found
+            are missing from the dict.
+        """
+        if chunk_size < 1:
+            raise ValueError("chunk_size must be >= 1")
+
+        requested: Dict[str, str] = {}
+        for code in codes:
+            if not code:
+                raise ValueError("code must be a non-empty string")
+            requested[normalize_barcode(code)] = code
+
+        fields_param = ""
+        if fields:
+            fields_param = "&fields={}".format(
+                ",".join(["code"] + [field for field in fields if field != "code"])
+            )
+        url = f"{self.base_url}/api/v2/search"
+        requested_codes = list(requested.values())
+        chunks = [
+            requested_codes[i : i + chunk_size]
+            for i in range(0, len(requested_codes), chunk_size)
+        ]
+
+        def fetch(chunk: List[str], session: Optional[requests.Session]) -> JSONType:
+            # The query string is built manually, as Product Opener doesn't
+            # recognize escaped commas
+            return cast(
+                JSONType,
+                send_get_request(
+                    url=f"{url}?code={','.join(chunk)}&page_size={len(chunk)}"
+                    + fields_param,
+                    api_config=self.api_config,
+                    auth=get_http_auth(self.api_config.environment),
+                    session=session,
+                    endpoint_class=EndpointClass.search,
+                ),
+            )
+
+        if max_workers > 1 and len(chunks) > 1:
+            with _pooled_session(
+                self.api_config, max_workers
+            ) as session, concurrent.futures.ThreadPoolExecutor(
+                max_workers
+            ) as executor:
+                responses = list(
+                    executor.map(lambda chunk: fetch(chunk, session), chunks)
+                )
+        else:
+            responses = [fetch(chunk, None) for chunk in chunks]
+
+        products = {}
+        for response in responses:
+            for product in response.get("products", []):
+                requested_code = requested.get(
+                    normalize_barcode(product.get("code") or "")
+                )
+                if requested_code is not None:
+                    products[requested_code] = product
+        return products
 
     def text_search(
         self,
@@ -207,25 +733,94 @@ class ProductResource:
         :param sort_by: result sorting key, defaults to None (no sorting)
         :return: the search results
         """
-        # We force usage of v2 of API
-        params = {
-            "search_terms": query,
-            "page": page,
-            "page_size": page_size,
-            "sort_by": sort_by,
-            "json": "1",
-        }
-
-        if sort_by is not None:
-            params["sort_by"] = sort_by
-
         return send_get_request(
             url=f"{self.base_url}/cgi/search.pl",
             api_config=self.api_config,
-            params=params,
+            params=_get_text_search_params(query, page, page_size, sort_by),
             auth=get_http_auth(self.api_config.environment),
+            endpoint_class=EndpointClass.search,
         )
 
+    def text_search_stream(
+        self,
+        query: str,
+        page: int = 1,
+        page_size: int = 20,
+        sort_by: Optional[str] = None,
+    ) -> Iterator[JSONType]:
+        """Search products using a textual query, and yield the products of
+        the page while the response is downloaded.
+
+        Contrary to `text_search`, the whole response is never loaded in
+        memory: the `products` array is parsed incrementally and each
+        product is yielded as soon as it is complete. This is useful with
+        large pages. The other fields of the response (`count`,...) are not
+        returned.
+
+        :param query: the search query
+        :param page: requested page (starts at 1), defaults to 1
+        :param page_size: number of items per page, defaults to 20
+        :param sort_by: result sorting key, defaults to None (no sorting)
+        :yield: the products of the page
+        """
+        r = _send_rate_limited(
+            self.api_config,
+            EndpointClass.search,
+            lambda: get_http_session(self.api_config).get(
+                f"{self.base_url}/cgi/search.pl",
+                params=_get_text_search_params(query, page, page_size, sort_by),
+                headers={"User-Agent": self.api_config.user_agent},
+                timeout=get_timeout(self.api_config),
+                auth=get_http_auth(self.api_config.environment),
+                stream=True,
+            ),
+        )
+        with r:
+            r.raise_for_status()
+            yield from iter_json_array(r.iter_content(chunk_size=65536), "products")
+
+    def iter_search(
+        self,
+        query: str,
+        page_size: int = 100,
+        sort_by: Optional[str] = None,
+        fields: Optional[List[str]] = None,
+        prefetch: int = 2,
+    ) -> Iterator[JSONType]:
+        """Iterate over all the products matching a textual query, across
+        all pages.
+
+        The next `prefetch` pages are fetched concurrently while the products
+        of the current page are yielded.
+
+        :param query: the search query
+        :param page_size: number of items per page, defaults to 100
+        :param sort_by: result sorting key, defaults to None (no sorting)
+        :param fields: a list of fields to return. If None, all fields are
+            returned.
+        :param prefetch: the number of pages fetched in advance, defaults
+            to 2
+        :yield: the products
+        """
+        params = _get_text_search_params(query, 1, page_size, sort_by)
+        if fields is not None:
+            params["fields"] = ",".join(fields)
+
+        def fetch_page(page: int, session: requests.Session) -> JSONType:
+            return cast(
+                JSONType,
+                send_get_request(
+                    url=f"{self.base_url}/cgi/search.pl",
+                    api_config=self.api_config,
+                    params={**params, "page": page},
+                    auth=get_http_auth(self.api_config.environment),
+                    session=session,
+                    endpoint_class=EndpointClass.search,
+                ),
+            )
+
+        return _iter_pages(self.api_config, fetch_page, page_size, prefetch)
+
     def update(self, body: Dict[str, Any]):
         """Create a new product or update an existing one."""
         if not body.get("code"):
@@ -234,6 +829,113 @@ class ProductResource:
         url = f"{self.base_url}/cgi/product_jqm2.pl"
         return send_form_urlencoded_post_request(url, body, self.api_config)
 
+    def update_many(
+        self,
+        bodies: Iterable[Dict[str, Any]],
+        max_workers: int = 4,
+        max_retries: int = 3,
+        backoff_factor: float = 1.0,
+        dry_run: bool = False,
+    ) -> List[ProductUpdateResult]:
+        """Create or update many products, concurrently.
+
+        If a username and a password are configured, we log in once and
+        all edits are sent with the session cookie, instead of sending the
+        credentials with every edit. Edits are sent from a pool of
+        `max_workers` threads sharing the session of the API (see
+        `get_http_session`), or a temporary session with a larger pool.
+        Errors don't stop the other edits, they are reported in the result
+        of each product.
+
+        As an edit may have been applied by the server even if it failed,
+        an edit is only sent again if the server didn't receive it (failure
+        to connect) or explicitly rejected it with a 429/503 response. The
+        latter are retried by the rate limiter of the API if there is one.
+
+        :param bodies: the update bodies (see `update`), each one containing
+            the product `code`
+        :param max_workers: the number of concurrent requests, defaults to 4
+        :param max_retries: the number of times an edit is retried,
+            defaults to 3
+        :param backoff_factor: the n-th retry is sent after
+            `backoff_factor * 2 ** (n - 1)` seconds, or after the delay of
+            the `Retry-After` header of the response, defaults to 1
+        :param dry_run: if True, the bodies are only checked and no request
+            is sent (not even the login request), defaults to False
+        :raises ValueError: if the login fails
+        :return: a list of `ProductUpdateResult`, in the order of `bodies`
+        """
+        url = f"{self.base_url}/cgi/product_jqm2.pl"
+        # Throttled responses are already retried by the rate limiter
+        retry_status_codes = (
+            THROTTLED_STATUS_CODES if self.api_config._rate_limiter is None else ()
+        )
+
+        def send(
+            session: requests.Session,
+            body: Dict[str, Any],
+            cookies: Optional[Dict[str, str]],
+        ) -> ProductUpdateResult:
+            code = str(body.get("code") or "")
+            if not code:
+                return ProductUpdateResult(code, error="missing code from body")
+            if dry_run:
+                return ProductUpdateResult(code)
+
+            retries = 0
+            while True:
+                delay = backoff_factor * 2**retries
+                try:
+                    r = _send_rate_limited(
+                        self.api_config,
+                        EndpointClass.write,
+                        lambda: session.post(
+                            url,
+                            data=body,
+                            headers={"User-Agent": self.api_config.user_agent},
+                            timeout=get_timeout(self.api_config),
+                            auth=get_http_auth(self.api_config.environment),
+                            cookies=cookies,
+                        ),
+                    )
+                except requests.exceptions.RequestException as e:
+                    if retries < max_retries and _is_unsent(e):
+                        retries += 1
+                        time.sleep(delay)
+                        continue
+                    return ProductUpdateResult(code, error=str(e) or repr(e))
+
+                if retries < max_retries and r.status_code in retry_status_codes:
+                    retry_after = parse_retry_after(r.headers.get("Retry-After"))
+                    r.close()
+                    retries += 1
+                    time.sleep(delay if retry_after is None else retry_after)
+                    continue
+
+                try:
+                    r.raise_for_status()
+                    response = decode_json(r.content)
+                except (requests.exceptions.RequestException, ValueError) as e:
+                    return ProductUpdateResult(code, error=str(e) or repr(e))
+                if isinstance(response, dict) and response.get("status") == 0:
+                    return ProductUpdateResult(
+                        code,
+                        response=response,
+                        error=response.get("status_verbose") or "update failed",
+                    )
+                return ProductUpdateResult(code, response=response)
+
+        with _pooled_session(self.api_config, max_workers) as session:
+            session_cookie = self.api_config.session_cookie
+            if not dry_run and self.api_config.username and self.api_config.password:
+                session_cookie = _login(session, self.api_config)
+            cookies = {"session": session_cookie} if session_cookie else None
+
+            with concurrent.futures.ThreadPoolExecutor(max_workers) as executor:
+                return list(
+                    executor.map(lambda body: send(session, body, cookies), bodies)
+                )
+
     def select_image(
         self,
         code: str,
@@ -262,50 +964,20 @@ class ProductResource:
         :return: the API response
         """
         url = f"{self.base_url}/cgi/product_image_crop.pl"
-        params: JSONType = {
-            "code": code,
-            "imgid": image_id,
-            # We need to tell Product Opener that the bounding box coordinates
-            # are related to the full image
-            "coordinates_image_size": "full",
-        }
-
-        if rotate is not None and rotate != 0:
-            if rotate not in (90, 180, 270):
-                raise ValueError(f"invalid value for rotation angle: {rotate}")
-            params["angle"] = str(rotate)
-
-        if crop_bounding_box is not None:
-            y_min, x_min, y_max, x_max = crop_bounding_box
-            params["x1"] = x_min
-            params["y1"] = y_min
-            params["x2"] = x_max
-            params["y2"] = y_max
-
-        if image_key is not None:
-            params["id"] = image_key
-
-        cookies = None
-        if self.api_config.session_cookie:
-            cookies = {
-                "session": self.api_config.session_cookie,
-            }
-        elif self.api_config.username:
-            params["user_id"] = self.api_config.username
-            params["password"] = self.api_config.password
-
-        if cookies is None and not params.get("password"):
-            raise ValueError(
-                "a password or a session cookie is required to select an image"
-            )
-
-        r = http_session.post(
-            url,
-            data=params,
-            headers={"User-Agent": self.api_config.user_agent},
-            timeout=self.api_config.timeout,
-            auth=get_http_auth(self.api_config.environment),
-            cookies=cookies,
+        params, cookies = _get_select_image_params(
+            self.api_config, code, image_id, image_key, rotate, crop_bounding_box
+        )
+        r = _send_rate_limited(
+            self.api_config,
+            EndpointClass.write,
+            lambda: get_http_session(self.api_config).post(
+                url,
+                data=params,
+                headers={"User-Agent": self.api_config.user_agent},
+                timeout=get_timeout(self.api_config),
+                auth=get_http_auth(self.api_config.environment),
+                cookies=cookies,
+            ),
         )
 
         r.raise_for_status()
@@ -324,6 +996,14 @@ class API:
         environment: Union[Environment, str] = Environment.org,
         session_cookie: Optional[str] = None,
         timeout: int = 10,
+        base_url: Optional[str] = None,
+        cache: Optional[ResponseCache] = None,
+        connect_timeout: Optional[float] = None,
+        pool_connections: int = 10,
+        pool_maxsize: int = 10,
+        max_retries: int = 0,
+        session: Optional[requests.Session] = None,
+        rate_limiter: Optional[AdaptiveRateLimiter] = None,
     ) -> None:
         """Initialize the API instance.
 
@@ -344,6 +1024,29 @@ class API:
         :param session_cookie: a session cookie, only used for write requests,
             defaults to None
         :param timeout: the timeout for HTTP requests, defaults to 10 seconds
+        :param base_url: the base URL of Product Opener, overrides the URL
+            derived from `flavor`, `environment` and `country` (ex: to use a
+            local server, see `openfoodfacts.server.LocalAPIServer`),
+            defaults to None
+        :param cache: a cache of GET responses (see
+            `openfoodfacts.cache.ResponseCache`), defaults to None (no cache)
+        :param connect_timeout: the timeout for establishing connections,
+            defaults to None (`timeout` is used)
+        :param pool_connections: the number of hosts whose connection pool is
+            kept, defaults to 10
+        :param pool_maxsize: the maximum number of connections kept per host,
+            it should be at least the number of threads sharing the API
+            instance, defaults to 10
+        :param max_retries: the number of times idempotent requests are
+            retried on connection errors and 429/5xx responses (429/503
+            responses are left to the rate limiter if there is one),
+            defaults to 0 (no retry)
+        :param session: the requests session to use, if None (default) a
+            session is created for this instance, with the pool and retry
+            settings above
+        :param rate_limiter: a client-side rate limiter (see
+            `openfoodfacts.ratelimit.AdaptiveRateLimiter`), defaults to None
+            (no rate limiting)
         """
         if not isinstance(country, Country):
             country = Country[country]
@@ -358,6 +1061,18 @@ class API:
             password=password,
             session_cookie=session_cookie,
             timeout=timeout,
+            base_url=base_url,
+            connect_timeout=connect_timeout,
+            pool_connections=pool_connections,
+            pool_maxsize=pool_maxsize,
+            max_retries=max_retries,
+        )
+        self.api_config._cache = cache
+        self.api_config._rate_limiter = rate_limiter
+        self.api_config._session = (
+            _create_http_session(self.api_config, pool_maxsize)
+            if session is None
+            else session
         )
         self.password = password
         self.country = country
@@ -392,32 +1107,18 @@ def parse_ingredients(text: str, lang: str, api_config: APIConfig) -> list[JSONT
     :raises RuntimeError: a RuntimeError is raised if the parsing fails
     :return: the list of parsed ingredients
     """
-    base_url = URLBuilder.country(
-        Flavor.off,
-        environment=api_config.environment,
-        country_code=api_config.country.name,
-    )
-    # by using "test" as code, we don't save any information to database
-    # This endpoint is specifically designed for testing purposes
-    url = f"{base_url}/api/v3/product/test"
-
-    if len(text) == 0:
-        raise ValueError("text must be a non-empty string")
-
+    url, body = _get_parse_ingredients_request(text, lang, api_config)
     try:
-        r = http_session.patch(
-            url,
-            auth=get_http_auth(api_config.environment),
-            json={
-                "fields": "ingredients",
-                "lc": lang,
-                "tags_lc": lang,
-                "product": {
-                    "lang": lang,
-                    f"ingredients_text_{lang}": text,
-                },
-            },
-            timeout=api_config.timeout,
+        r = _send_rate_limited(
+            api_config,
+            EndpointClass.write,
+            lambda: get_http_session(api_config).patch(
+                url,
+                auth=get_http_auth(api_config.environment),
+                json=body,
+                headers={"User-Agent": api_config.user_agent},
+                timeout=get_timeout(api_config),
+            ),
         )
     except (
         requests.exceptions.ConnectionError,
@@ -433,8 +1134,34 @@ def parse_ingredients(text: str, lang: str, api_config: APIConfig) -> list[JSONT
             f"Unable to parse ingredients (non-200 status code): {r.status_code}, {r.text}"
         )
 
-    response_data = r.json()
+    return _get_parsed_ingredients(decode_json(r.content))
+
+
+def _get_parse_ingredients_request(
+    text: str, lang: str, api_config: APIConfig
+) -> Tuple[str, JSONType]:
+    """Return the URL and the JSON body of an ingredient parsing request, see
+    `parse_ingredients`."""
+    base_url = get_base_url(api_config, flavor=Flavor.off)
+    # by using "test" as code, we don't save any information to database
+    # This endpoint is specifically designed for testing purposes
+    url = f"{base_url}/api/v3/product/test"
+
+    if len(text) == 0:
+        raise ValueError("text must be a non-empty string")
+
+    return url, {
+        "fields": "ingredients",
+        "lc": lang,
+        "tags_lc": lang,
+        "product": {
+            "lang": lang,
+            f"ingredients_text_{lang}": text,
+        },
+    }
+
 
+def _get_parsed_ingredients(response_data: JSONType) -> list[JSONType]:
     if response_data.get("status") != "success":
         raise RuntimeError(f"Unable to parse ingredients: {response_data}")
 
@@ -0,0 +1,361 @@
+"""An asyncio client of Open Food Facts API, mirroring `openfoodfacts.API`.
+
+All requests of an `AsyncAPI` instance go through a single pooled
+`httpx.AsyncClient`, so that many requests can be in flight at the same
+time from a single event loop:
+
+>>> async with AsyncAPI(user_agent="my-app", max_connections=50) as api:
+...     products = await asyncio.gather(
+...         *(api.product.get(code) for code in codes)
+...     )
+
+Requests exceeding `max_connections` wait for a free connection. This module
+requires httpx (`pip install openfoodfacts[httpx]`).
+"""
+
+from typing import Any, Dict, List, Optional, Tuple, Union, cast
+
+from .api import (
+    _add_form_credentials,
+    _get_parse_ingredients_request,
+    _get_parsed_ingredients,
+    _get_product_from_response,
+    _get_product_url,
+    _get_select_image_params,
+    _get_text_search_params,
+    get_base_url,
+    get_http_auth,
+)
+from .types import APIConfig, APIVersion, Country, Environment, Facet, Flavor, JSONType
+from .utils import URLBuilder, decode_json
+
+_httpx_available = True
+try:
+    import httpx
+except ImportError:
+    _httpx_available = False
+
+
+def _get_headers(
+    api_config: APIConfig, cookies: Optional[Dict[str, str]] = None
+) -> Dict[str, str]:
+    headers = {"User-Agent": api_config.user_agent}
+    if cookies:
+        # Per-request cookies are deprecated in httpx, send the header
+        # directly
+        headers["Cookie"] = "; ".join(f"{k}={v}" for k, v in cookies.items())
+    return headers
+
+
+def _get_auth(environment: Environment) -> Any:
+    # httpx doesn't accept `auth=None` for requests with a body, use the
+    # client default (no auth) instead
+    auth = get_http_auth(environment)
+    return httpx.USE_CLIENT_DEFAULT if auth is None else auth
+
+
+async def send_get_request(
+    client: "httpx.AsyncClient",
+    url: str,
+    api_config: APIConfig,
+    params: Optional[Dict[str, Any]] = None,
+    return_none_on_404: bool = False,
+    auth: Optional[Tuple[str, str]] = None,
+) -> Optional[JSONType]:
+    """Send a GET request to the given URL.
+
+    :param client: the HTTP client to use
+    :param url: the URL to send the request to
+    :param api_config: the API configuration
+    :param params: the query parameters, defaults to None
+    :param return_none_on_404: if True, None is returned if the response
+        status code is 404, defaults to False
+    :return: the API response
+    """
+    r = await client.get(
+        url,
+        params=params,
+        headers=_get_headers(api_config),
+        timeout=api_config.timeout,
+        auth=auth,
+    )
+    if r.status_code == 404 and return_none_on_404:
+        return None
+    r.raise_for_status()
+    return decode_json(r.content)
+
+
+async def send_form_urlencoded_post_request(
+    client: "httpx.AsyncClient", url: str, body: Dict[str, Any], api_config: APIConfig
+) -> "httpx.Response":
+    cookies = _add_form_credentials(body, api_config)
+    r = await client.post(
+        url,
+        data=body,
+        headers=_get_headers(api_config, cookies),
+        timeout=api_config.timeout,
+        auth=_get_auth(api_config.environment),
+    )
+    r.raise_for_status()
+    return r
+
+
+class AsyncRobotoffResource:
+    def __init__(self, api_config: APIConfig, client: "httpx.AsyncClient"):
+        self.api_config = api_config
+        self.client = client
+        self.base_url = URLBuilder.robotoff(environment=api_config.environment)
+
+    async def predict_lang(
+        self, text: str, k: int = 10, threshold: float = 0.01
+    ) -> JSONType:
+        """Predict the language of a text.
+
+        :param text: the text to predict the language of
+        :param k: the number of predictions to return, defaults to 10
+        :param threshold: the minimum probability for a prediction to be
+            returned, defaults to 0.01
+        :return: the API response
+        """
+        r = await self.client.post(
+            f"{self.base_url}/api/v1/predict/lang",
+            data={"text": text, "k": k, "threshold": threshold},
+            headers=_get_headers(self.api_config),
+            timeout=self.api_config.timeout,
+        )
+        return decode_json(r.content)
+
+
+class AsyncFacetResource:
+    def __init__(self, api_config: APIConfig, client: "httpx.AsyncClient"):
+        self.api_config = api_config
+        self.client = client
+        self.base_url = get_base_url(api_config)
+
+    async def get(self, facet_name: Union[Facet, str]) -> JSONType:
+        facet = Facet.from_str_or_enum(facet_name)
+        facet_plural = facet.value.replace("_", "-")
+        resp = await send_get_request(
+            self.client,
+            url=f"{self.base_url}/{facet_plural}",
+            params={"json": "1"},
+            api_config=self.api_config,
+            auth=get_http_auth(self.api_config.environment),
+        )
+        return cast(JSONType, resp)
+
+    async def get_products(
+        self,
+        facet_name: Union[Facet, str],
+        facet_value: str,
+        page: int = 1,
+        page_size: int = 25,
+        fields: Optional[List[str]] = None,
+    ) -> JSONType:
+        """Return products for a given facet value, see
+        `FacetResource.get_products`."""
+        facet = Facet.from_str_or_enum(facet_name)
+        facet_singular = facet.name.replace("_", "-")
+        params: JSONType = {"page": page, "page_size": page_size}
+        if fields is not None:
+            params["fields"] = ",".join(fields)
+
+        resp = await send_get_request(
+            self.client,
+            url=f"{self.base_url}/{facet_singular}/{facet_value}.json",
+            params=params,
+            api_config=self.api_config,
+            auth=get_http_auth(self.api_config.environment),
+        )
+        return cast(JSONType, resp)
+
+
+class AsyncProductResource:
+    def __init__(self, api_config: APIConfig, client: "httpx.AsyncClient"):
+        self.api_config = api_config
+        self.client = client
+        self.base_url = get_base_url(api_config)
+
+    async def get(
+        self,
+        code: str,
+        fields: Optional[List[str]] = None,
+        raise_if_invalid: bool = False,
+    ) -> Optional[JSONType]:
+        """Return a product, see `ProductResource.get`."""
+        url = _get_product_url(self.base_url, self.api_config, code, fields)
+        resp = await send_get_request(
+            self.client, url=url, api_config=self.api_config, return_none_on_404=True
+        )
+        return _get_product_from_response(resp, code, raise_if_invalid)
+
+    async def text_search(
+        self,
+        query: str,
+        page: int = 1,
+        page_size: int = 20,
+        sort_by: Optional[str] = None,
+    ) -> Optional[JSONType]:
+        """Search products using a textual query, see
+        `ProductResource.text_search`."""
+        return await send_get_request(
+            self.client,
+            url=f"{self.base_url}/cgi/search.pl",
+            api_config=self.api_config,
+            params=_get_text_search_params(query, page, page_size, sort_by),
+            auth=get_http_auth(self.api_config.environment),
+        )
+
+    async def update(self, body: Dict[str, Any]) -> "httpx.Response":
+        """Create a new product or update an existing one."""
+        if not body.get("code"):
+            raise ValueError("missing code from body")
+
+        url = f"{self.base_url}/cgi/product_jqm2.pl"
+        return await send_form_urlencoded_post_request(
+            self.client, url, body, self.api_config
+        )
+
+    async def select_image(
+        self,
+        code: str,
+        image_id: str,
+        image_key: str,
+        rotate: Optional[int] = None,
+        crop_bounding_box: Optional[Tuple[float, float, float, float]] = None,
+    ) -> "httpx.Response":
+        """Select an image (front/ingredients/nutrition/packaging) for a
+        product, see `ProductResource.select_image`."""
+        url = f"{self.base_url}/cgi/product_image_crop.pl"
+        params, cookies = _get_select_image_params(
+            self.api_config, code, image_id, image_key, rotate, crop_bounding_box
+        )
+        r = await self.client.post(
+            url,
+            data=params,
+            headers=_get_headers(self.api_config, cookies),
+            timeout=self.api_config.timeout,
+            auth=_get_auth(self.api_config.environment),
+        )
+        r.raise_for_status()
+        return r
+
+
+async def parse_ingredients(
+    text: str, lang: str, api_config: APIConfig, client: "httpx.AsyncClient"
+) -> List[JSONType]:
+    """Parse ingredients text using Product Opener API, see
+    `openfoodfacts.api.parse_ingredients`.
+
+    :param text: the ingredients text to parse
+    :param lang: the language of the text (used for parsing) as a 2-letter code
+    :param api_config: the API configuration
+    :param client: the HTTP client to use
+    :raises RuntimeError: a RuntimeError is raised if the parsing fails
+    :return: the list of parsed ingredients
+    """
+    url, body = _get_parse_ingredients_request(text, lang, api_config)
+    try:
+        r = await client.patch(
+            url,
+            auth=_get_auth(api_config.environment),
+            json=body,
+            headers=_get_headers(api_config),
+            timeout=api_config.timeout,
+        )
+    except httpx.TransportError as e:
+        raise RuntimeError(
+            f"Unable to parse ingredients: error during HTTP request: {e}"
+        )
+
+    if not r.is_success:
+        raise RuntimeError(
+            f"Unable to parse ingredients (non-200 status code): {r.status_code}, {r.text}"
+        )
+
+    return _get_parsed_ingredients(decode_json(r.content))
+
+
+class AsyncAPI:
+    def __init__(
+        self,
+        user_agent: str,
+        username: Optional[str] = None,
+        password: Optional[str] = None,
+        country: Union[Country, str] = Country.world,
+        flavor: Union[Flavor, str] = Flavor.off,
+        version: Union[APIVersion, str] = APIVersion.v2,
+        environment: Union[Environment, str] = Environment.org,
+        session_cookie: Optional[str] = None,
+        timeout: int = 10,
+        base_url: Optional[str] = None,
+        max_connections: int = 100,
+        max_keepalive_connections: int = 20,
+        api_config: Optional[APIConfig] = None,
+        client: Optional["httpx.AsyncClient"] = None,
+    ) -> None:
+        """Initialize the async API instance.
+
+        The parameters are the same as `openfoodfacts.API`, with the
+        following additions.
+
+        :param max_connections: the maximum number of concurrent connections
+            of the HTTP client, additional requests wait for a free
+            connection, defaults to 100
+        :param max_keepalive_connections: the maximum number of idle
+            connections kept open, defaults to 20
+        :param api_config: an existing API configuration (ex: the
+            `api_config` of an `API` instance), if provided the other
+            configuration parameters are ignored, defaults to None
+        :param client: the `httpx.AsyncClient` to use, if not provided a
+            client is created with the connection limits above and closed
+            by `aclose`, defaults to None
+        """
+        if not _httpx_available:
+            raise ImportError("httpx is required to use AsyncAPI")
+
+        if api_config is None:
+            if not isinstance(country, Country):
+                country = Country[country]
+            api_config = APIConfig(
+                user_agent=user_agent,
+                country=country,
+                flavor=Flavor[flavor],
+                version=APIVersion[version],
+                environment=Environment[environment],
+                username=username,
+                password=password,
+                session_cookie=session_cookie,
+                timeout=timeout,
+                base_url=base_url,
+            )
+        self.api_config = api_config
+        self._owns_client = client is None
+        self.client = (
+            httpx.AsyncClient(
+                limits=httpx.Limits(
+                    max_connections=max_connections,
+                    max_keepalive_connections=max_keepalive_connections,
+                )
+            )
+            if client is None
+            else client
+        )
+        self.product = AsyncProductResource(self.api_config, self.client)
+        self.facet = AsyncFacetResource(self.api_config, self.client)
+        self.robotoff = AsyncRobotoffResource(self.api_config, self.client)
+
+    async def parse_ingredients(self, text: str, lang: str) -> List[JSONType]:
+        """Parse ingredients text, see `parse_ingredients`."""
+        return await parse_ingredients(text, lang, self.api_config, self.client)
+
+    async def aclose(self) -> None:
+        """Close the HTTP client, if it was created by this instance."""
+        if self._owns_client:
+            await self.client.aclose()
+
+    async def __aenter__(self) -> "AsyncAPI":
+        return self
+
+    async def __aexit__(self, exc_type, exc_value, traceback) -> None:
+        await self.aclose()
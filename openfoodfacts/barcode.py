@@ -1,3 +1,10 @@
+import hashlib
+import json
+import math
+from pathlib import Path
+from typing import Any, Dict, Iterator, Optional, Tuple
+
+
 def normalize_barcode(barcode: str) -> str:
     """Normalize the barcode.
 
@@ -58,3 +65,101 @@ def calculate_check_digit(gtin: str) -> str:
             % 10  # Modulo 10 (the remainder after dividing by 10)
         )
     )[-1]
+
+
+class BarcodeBloomFilter:
+    """A Bloom filter over product barcodes.
+
+    A Bloom filter is a compact probabilistic set: `barcode in bloom_filter`
+    returns False if the barcode was never added ("definitely absent"), and
+    True if it was probably added. The false positive rate depends on the
+    number of bits per item and on the number of hash functions, use
+    `for_capacity` to size the filter.
+
+    Barcodes are normalized with `normalize_barcode` before being added or
+    checked.
+
+    :param num_bits: the size of the filter, in bits
+    :param num_hashes: the number of hash functions
+    :param bits: the filter bits, used when loading a filter from disk
+    """
+
+    def __init__(
+        self, num_bits: int, num_hashes: int, bits: Optional[bytearray] = None
+    ):
+        self.num_bits = num_bits
+        self.num_hashes = num_hashes
+        self.bits = bytearray((num_bits + 7) // 8) if bits is None else bits
+
+    @classmethod
+    def for_capacity(
+        cls, capacity: int, false_positive_rate: float = 0.001
+    ) -> "BarcodeBloomFilter":
+        """Create an empty filter sized to store `capacity` barcodes with the
+        requested false positive rate.
+
+        :param capacity: the expected number of barcodes
+        :param false_positive_rate: the target false positive rate, defaults
+            to 0.001
+        """
+        capacity = max(capacity, 1)
+        num_bits = math.ceil(
+            -capacity * math.log(false_positive_rate) / (math.log(2) ** 2)
+        )
+        num_hashes = max(1, round(num_bits / capacity * math.log(2)))
+        return cls(num_bits, num_hashes)
+
+    def _positions(self, barcode: str) -> Iterator[int]:
+        # Double hashing: the k positions are derived from two 64-bit hashes
+        digest = hashlib.blake2b(
+            normalize_barcode(barcode).encode("utf-8"), digest_size=16
+        ).digest()
+        h1 = int.from_bytes(digest[:8], "little")
+        h2 = int.from_bytes(digest[8:], "little") | 1
+        for i in range(self.num_hashes):
+            yield (h1 + i * h2) % self.num_bits
+
+    def add(self, barcode: str) -> None:
+        """Add a barcode to the filter."""
+        for position in self._positions(barcode):
+            self.bits[position >> 3] |= 1 << (position & 7)
+
+    def __contains__(self, barcode: str) -> bool:
+        """Return False if `barcode` was never added to the filter, True if
+        it was probably added."""
+        bits = self.bits
+        return all(
+            bits[position >> 3] & (1 << (position & 7))
+            for position in self._positions(barcode)
+        )
+
+    def save(self, path: Path, metadata: Optional[Dict[str, Any]] = None) -> None:
+        """Save the filter in `path`.
+
+        The file contains a JSON header line followed by the filter bits.
+
+        :param path: the output path
+        :param metadata: additional metadata to store in the header
+        """
+        header = {
+            "num_bits": self.num_bits,
+            "num_hashes": self.num_hashes,
+            "metadata": metadata or {},
+        }
+        tmp_path = path.with_name(path.name + ".part")
+        with tmp_path.open("wb") as f:
+            f.write(json.dumps(header).encode("utf-8") + b"\n")
+            f.write(self.bits)
+        tmp_path.replace(path)
+
+    @classmethod
+    def load(cls, path: Path) -> Tuple["BarcodeBloomFilter", Dict[str, Any]]:
+        """Load a filter saved with `save`.
+
+        :param path: the path of the filter
+        :return: a (filter, metadata) tuple
+        """
+        with path.open("rb") as f:
+            header = json.loads(f.readline())
+            bits = bytearray(f.read())
+        return cls(header["num_bits"], header["num_hashes"], bits), header["metadata"]
@@ -0,0 +1,176 @@
+"""A cache of API responses, used by `openfoodfacts.api.send_get_request`.
+
+Responses are kept in an in-memory LRU cache, and optionally on disk. Once
+an entry is older than the cache TTL, it's revalidated with a conditional
+request (`If-None-Match` / `If-Modified-Since`) if the server returned an
+`ETag` or a `Last-Modified` header, so that unchanged responses are not
+downloaded again.
+
+>>> cache = ResponseCache(max_size=10_000, ttl=300)
+>>> api = API(user_agent="my-app", cache=cache)
+"""
+
+import collections
+import dataclasses
+import hashlib
+import json
+import threading
+import time
+from pathlib import Path
+from typing import Any, Dict, Iterable, List, Optional, OrderedDict, Tuple, Union, cast
+from urllib.parse import parse_qsl, urlencode, urlsplit, urlunsplit
+
+from .utils import decode_json
+
+
+@dataclasses.dataclass
+class CacheEntry:
+    """A cached response.
+
+    :param content: the raw response body
+    :param stored_at: the UNIX timestamp of the last time the response was
+        fetched or revalidated
+    :param etag: the `ETag` header of the response, if any
+    :param last_modified: the `Last-Modified` header of the response, if any
+    """
+
+    content: bytes
+    stored_at: float
+    etag: Optional[str] = None
+    last_modified: Optional[str] = None
+
+    def get_validation_headers(self) -> Dict[str, str]:
+        """Return the headers of a conditional request revalidating the
+        entry."""
+        headers = {}
+        if self.etag is not None:
+            headers["If-None-Match"] = self.etag
+        if self.last_modified is not None:
+            headers["If-Modified-Since"] = self.last_modified
+        return headers
+
+    def loads(self) -> Any:
+        """Decode the JSON content of the entry."""
+        return decode_json(self.content)
+
+
+class ResponseCache:
+    """A thread-safe LRU cache of API responses, with an optional disk tier.
+
+    :param max_size: the maximum number of entries kept in memory, defaults
+        to 1024
+    :param ttl: the time (in seconds) during which an entry is used without
+        contacting the server, defaults to 60
+    :param cache_dir: if provided, entries are also saved in this directory,
+        and entries evicted from memory are loaded back from disk, defaults
+        to None (memory only)
+    """
+
+    def __init__(
+        self,
+        max_size: int = 1024,
+        ttl: float = 60,
+        cache_dir: Optional[Path] = None,
+    ):
+        if max_size < 1:
+            raise ValueError("max_size must be >= 1")
+        self.max_size = max_size
+        self.ttl = ttl
+        self.cache_dir = cache_dir
+        if cache_dir is not None:
+            cache_dir.mkdir(parents=True, exist_ok=True)
+        self._entries: OrderedDict[str, CacheEntry] = collections.OrderedDict()
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def get_key(
+        url: str,
+        params: Optional[Union[Dict[str, Any], Iterable[Tuple[str, Any]]]] = None,
+    ) -> str:
+        """Return the cache key of a request.
+
+        The query parameters of the URL and `params` are merged and sorted,
+        parameters with a None value are ignored (as requests does), and the
+        scheme and host are lowercased.
+        """
+        parts = urlsplit(url)
+        query: List[Tuple[str, str]] = parse_qsl(parts.query, keep_blank_values=True)
+        if params:
+            items = params.items() if isinstance(params, dict) else params
+            query.extend((str(k), str(v)) for k, v in items if v is not None)
+        return urlunsplit(
+            (
+                parts.scheme.lower(),
+                parts.netloc.lower(),
+                parts.path,
+                urlencode(sorted(query)),
+                "",
+            )
+        )
+
+    def is_fresh(self, entry: CacheEntry) -> bool:
+        """Return True if `entry` can be used without revalidation."""
+        return time.time() - entry.stored_at < self.ttl
+
+    def _get_path(self, key: str) -> Path:
+        digest = hashlib.sha256(key.encode("utf-8")).hexdigest()
+        return cast(Path, self.cache_dir) / digest[:2] / digest
+
+    def get(self, key: str) -> Optional[CacheEntry]:
+        """Return the entry (fresh or stale) stored under `key`, or None."""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                self._entries.move_to_end(key)
+                return entry
+
+        if self.cache_dir is None:
+            return None
+        path = self._get_path(key)
+        try:
+            with path.open("rb") as f:
+                header = json.loads(f.readline())
+                content = f.read()
+        except (FileNotFoundError, ValueError):
+            return None
+        if header.pop("key") != key:
+            # hash collision
+            return None
+        entry = CacheEntry(content=content, **header)
+        self._set_in_memory(key, entry)
+        return entry
+
+    def _set_in_memory(self, key: str, entry: CacheEntry) -> None:
+        with self._lock:
+            self._entries[key] = entry
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+
+    def set(self, key: str, entry: CacheEntry) -> None:
+        """Store `entry` under `key`."""
+        self._set_in_memory(key, entry)
+        if self.cache_dir is None:
+            return
+        path = self._get_path(key)
+        path.parent.mkdir(exist_ok=True)
+        header = {
+            "key": key,
+            "stored_at": entry.stored_at,
+            "etag": entry.etag,
+            "last_modified": entry.last_modified,
+        }
+        tmp_path = path.with_name(f"{path.name}.{threading.get_ident()}.part")
+        with tmp_path.open("wb") as f:
+            f.write(json.dumps(header).encode("utf-8") + b"\n")
+            f.write(entry.content)
+        tmp_path.replace(path)
+
+    def clear(self) -> None:
+        """Remove all entries from memory (entries on disk are kept)."""
+        with self._lock:
+            self._entries.clear()
+
+    def __len__(self) -> int:
+        """Return the number of entries in memory."""
+        return len(self._entries)
@@ -1,19 +1,69 @@
+import array
+import bisect
+import collections
+import concurrent.futures
 import csv
+import dataclasses
+import heapq
+import itertools
+import json
+import operator
+import os
+import queue
+import tempfile
+import threading
+import time
 from pathlib import Path
-from typing import Optional
+from typing import (
+    Any,
+    Callable,
+    Deque,
+    Dict,
+    Iterable,
+    Iterator,
+    List,
+    Optional,
+    Tuple,
+    TypeVar,
+    Union,
+    cast,
+)
 
-from .types import DatasetType, Environment, Flavor
+from .barcode import BarcodeBloomFilter, normalize_barcode
+from .images import ImageManifestItem, iter_image_manifest
+from .types import (
+    COUNTRY_CODE_TO_NAME,
+    Country,
+    DatasetType,
+    Environment,
+    Flavor,
+    JSONType,
+)
 from .utils import (
+    IterationStats,
+    JSONLWriter,
     URLBuilder,
+    _open_binary,
+    _sanitize_file_path,
+    decode_json,
     download_file,
+    get_file_etag,
     get_logger,
     get_open_fn,
     jsonl_iter,
     should_download_file,
 )
 
+_pandas_available = True
+try:
+    import pandas as pd
+except ImportError:
+    _pandas_available = False
+
 logger = get_logger(__name__)
 
+T = TypeVar("T")
+
 # Increase field_size to accommodate large fields.
 # sys.maxsize will overflow on windows so using max 32-bit integer instead.
 csv.field_size_limit(pow(2, 31) - 1)
@@ -39,6 +89,488 @@ DATASET_FILE_NAMES = {
     },
 }
 
+# Map a country tag (ex: `en:france`) to the `Country`
+COUNTRY_TAG_TO_COUNTRY = {
+    name: country
+    for country, name in COUNTRY_CODE_TO_NAME.items()
+    if country is not Country.world
+}
+
+
+@dataclasses.dataclass
+class DatasetCursor:
+    """A resumable position in a JSONL dataset.
+
+    A cursor always points to the beginning of the next line to read, so that
+    an iteration started from a cursor never yields twice the same product.
+
+    :param line_number: the number of lines read so far
+    :param offset: the offset (in bytes) in the uncompressed stream
+    :param compressed_offset: the approximate offset (in bytes) in the
+        compressed file, or None if the dataset is not compressed. It's only
+        informative (ex: to report progress), `offset` is used to resume the
+        iteration.
+    """
+
+    line_number: int = 0
+    offset: int = 0
+    compressed_offset: Optional[int] = None
+
+    def to_dict(self) -> JSONType:
+        return dataclasses.asdict(self)
+
+    @classmethod
+    def from_dict(cls, data: JSONType) -> "DatasetCursor":
+        return cls(**data)
+
+    def save(self, path: Path) -> None:
+        """Save the cursor as JSON in `path`.
+
+        The file is first written in a temporary file and then renamed, so
+        that a crash during the save never leaves a corrupted cursor file.
+
+        :param path: the path of the cursor file
+        """
+        tmp_path = path.with_name(path.name + ".part")
+        tmp_path.write_text(json.dumps(self.to_dict()))
+        tmp_path.replace(path)
+
+    @classmethod
+    def load(cls, path: Path) -> Optional["DatasetCursor"]:
+        """Load a cursor saved with `save`.
+
+        :param path: the path of the cursor file
+        :return: the cursor, or None if the file does not exist
+        """
+        if not path.is_file():
+            return None
+        return cls.from_dict(json.loads(path.read_text()))
+
+
+# Explicit dtypes of the known columns of the CSV export, used by
+# `ProductDataset.load_frame`. Columns ending with `_100g` (nutrients) are
+# loaded as float32, other columns as Python strings (`object` dtype, as
+# "str" would load them as `StringDtype` with pandas >= 3).
+CSV_DTYPES = {
+    "code": "object",
+    "created_t": "Int64",
+    "last_modified_t": "Int64",
+    "last_updated_t": "Int64",
+    "last_image_t": "Int64",
+    "serving_quantity": "float32",
+    "product_quantity": "float32",
+    "no_nutrition_data": "category",
+    "additives_n": "Int64",
+    "nutriscore_score": "float32",
+    "nutriscore_grade": "category",
+    "nova_group": "category",
+    "ecoscore_score": "float32",
+    "ecoscore_grade": "category",
+    "environmental_score_score": "float32",
+    "environmental_score_grade": "category",
+    "pnns_groups_1": "category",
+    "pnns_groups_2": "category",
+    "food_groups": "category",
+    "food_groups_tags": "category",
+    "food_groups_en": "category",
+    "countries": "category",
+    "countries_tags": "category",
+    "countries_en": "category",
+    "main_category": "category",
+    "main_category_en": "category",
+    "owner": "category",
+    "creator": "category",
+    "last_modified_by": "category",
+    "last_updated_by": "category",
+    "unique_scans_n": "Int64",
+    "completeness": "float32",
+}
+
+
+def get_csv_dtype(column: str) -> str:
+    """Return the dtype used to load a column of the CSV export with
+    pandas."""
+    if column in CSV_DTYPES:
+        return CSV_DTYPES[column]
+    if column.endswith("_100g"):
+        return "float32"
+    return "object"
+
+
+def _get_dataset_fingerprint(dataset_path: Path) -> JSONType:
+    """Return a fingerprint of the dataset file, used to check that a file
+    derived from the dataset (index, filter,...) is up to date."""
+    stat = dataset_path.stat()
+    return {
+        "etag": get_file_etag(dataset_path),
+        "size": stat.st_size,
+        "mtime": stat.st_mtime_ns,
+    }
+
+
+def _batched(items: Iterator[T], batch_size: int) -> Iterator[List[T]]:
+    batch = []
+    for item in items:
+        batch.append(item)
+        if len(batch) >= batch_size:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
+
+
+def get_recompressed_path(dataset_path: Path) -> Path:
+    """Return the path of the zstd-compressed copy of the gzipped dataset
+    located at `dataset_path` (ex: `openfoodfacts-products.jsonl.zst`)."""
+    return dataset_path.with_suffix(".zst")
+
+
+def is_recompressed_dataset_up_to_date(dataset_path: Path) -> bool:
+    """Return True if the zstd-compressed copy of the dataset located at
+    `dataset_path` exists and was generated from the current version of the
+    dataset."""
+    recompressed_path = get_recompressed_path(dataset_path)
+    metadata_path = _sanitize_file_path(recompressed_path, ".json")
+    if not recompressed_path.is_file() or not metadata_path.is_file():
+        return False
+    metadata = json.loads(metadata_path.read_text())
+    return metadata.get("source") == _get_dataset_fingerprint(dataset_path)
+
+
+def recompress_dataset(
+    dataset_path: Path,
+    compresslevel: Optional[int] = None,
+    max_workers: Optional[int] = None,
+) -> Path:
+    """Transcode a gzipped JSONL dataset into a seekable multi-frame zstd
+    file.
+
+    zstd decompression is several times faster than gzip decompression, so
+    that repeated scans of the same dataset are faster. The output file is
+    written next to the dataset (see `get_recompressed_path`) using the zstd
+    seekable format (see `JSONLWriter`), and the metadata of the dataset
+    (Etag, URL,...) are copied. Lines are copied without being decoded.
+
+    This function requires the `zstandard` package.
+
+    :param dataset_path: the path of the gzipped JSONL dataset
+    :param compresslevel: the zstd compression level, defaults to 3
+    :param max_workers: the number of compression threads, defaults to the
+        number of CPUs
+    :return: the path of the zstd-compressed dataset
+    """
+    recompressed_path = get_recompressed_path(dataset_path)
+    # Compute the fingerprint before transcoding, in case the dataset is
+    # updated in the meantime
+    fingerprint = _get_dataset_fingerprint(dataset_path)
+    logger.info("Recompressing %s into %s", dataset_path, recompressed_path)
+    with JSONLWriter(
+        recompressed_path, compresslevel=compresslevel, max_workers=max_workers
+    ) as writer:
+        for line, _ in ProductDataset(dataset_path=dataset_path)._iter_lines():
+            if line.strip():
+                writer.write_line(line if line.endswith(b"\n") else line + b"\n")
+
+    metadata_path = _sanitize_file_path(dataset_path, ".json")
+    metadata = json.loads(metadata_path.read_text()) if metadata_path.is_file() else {}
+    metadata["source"] = fingerprint
+    _sanitize_file_path(recompressed_path, ".json").write_text(json.dumps(metadata))
+    return recompressed_path
+
+
+# Recompression threads started by `get_dataset`, by dataset path
+_recompress_threads: Dict[Path, threading.Thread] = {}
+_recompress_threads_lock = threading.Lock()
+
+
+def _start_recompress_thread(dataset_path: Path) -> threading.Thread:
+    with _recompress_threads_lock:
+        thread = _recompress_threads.get(dataset_path)
+        if thread is None or not thread.is_alive():
+            thread = threading.Thread(
+                target=recompress_dataset,
+                args=(dataset_path,),
+                name=f"recompress-{dataset_path.name}",
+            )
+            thread.start()
+            _recompress_threads[dataset_path] = thread
+        return thread
+
+
+def get_country_partition_dir(dataset_path: Path) -> Path:
+    """Return the directory where the country partitions of the dataset
+    located at `dataset_path` are stored."""
+    return _sanitize_file_path(dataset_path, "_countries")
+
+
+def partition_dataset_by_country(
+    dataset_path: Path,
+    force: bool = False,
+    max_workers: Optional[int] = None,
+) -> Path:
+    """Split a JSONL dataset into one gzipped JSONL file per country.
+
+    Products are assigned to countries using the `countries_tags` field:
+    a product sold in several countries is written in every matching
+    partition, products without any known country are not written in any
+    partition. Partitions are named after the `Country` enum name (ex:
+    `fr.jsonl.gz`) and stored in the directory returned by
+    `get_country_partition_dir`.
+
+    The dataset is scanned once, and partitions are compressed in parallel
+    in a shared thread pool. Partitions are only rebuilt if the dataset
+    changed since the last partitioning (or if `force` is True).
+
+    :param dataset_path: the path of the JSONL dataset
+    :param force: if True, rebuild the partitions even if they are up to
+        date, defaults to False
+    :param max_workers: the number of compression threads, defaults to the
+        number of CPUs
+    :return: the partition directory
+    """
+    partition_dir = get_country_partition_dir(dataset_path)
+    # The metadata file is written last, it's only present if the
+    # partitioning completed
+    metadata_path = partition_dir / "metadata.json"
+    fingerprint = _get_dataset_fingerprint(dataset_path)
+
+    if metadata_path.is_file() and not force:
+        if json.loads(metadata_path.read_text())["dataset"] == fingerprint:
+            return partition_dir
+        logger.info("Country partitions in %s are outdated", partition_dir)
+
+    logger.info("Partitioning dataset by country in %s", partition_dir)
+    partition_dir.mkdir(parents=True, exist_ok=True)
+    metadata_path.unlink(missing_ok=True)
+    for old_partition_path in partition_dir.glob("*.jsonl.gz"):
+        old_partition_path.unlink()
+
+    writers: Dict[Country, JSONLWriter] = {}
+    dataset = ProductDataset(dataset_path=dataset_path)
+    with concurrent.futures.ThreadPoolExecutor(max_workers) as executor:
+        try:
+            for line, _ in dataset._iter_lines():
+                stripped_line = line.rstrip(b"\n")
+                if not stripped_line:
+                    continue
+                product = decode_json(stripped_line)
+                for country_tag in set(product.get("countries_tags") or []):
+                    country = COUNTRY_TAG_TO_COUNTRY.get(country_tag)
+                    if country is None:
+                        continue
+                    if country not in writers:
+                        writers[country] = JSONLWriter(
+                            partition_dir / f"{country.name}.jsonl.gz",
+                            block_size=1024 * 1024,
+                            executor=executor,
+                            max_workers=max_workers,
+                        )
+                    writers[country].write_line(stripped_line + b"\n")
+        except BaseException:
+            for writer in writers.values():
+                writer.discard()
+            raise
+
+        for writer in writers.values():
+            writer.close()
+
+    metadata_path.write_text(
+        json.dumps(
+            {
+                "dataset": fingerprint,
+                "counts": {
+                    country.name: writer.count for country, writer in writers.items()
+                },
+            }
+        )
+    )
+    return partition_dir
+
+
+def _get_product_barcode_key(product: JSONType) -> str:
+    return normalize_barcode(product.get("code") or "")
+
+
+def get_sorted_dataset_path(dataset_path: Path) -> Path:
+    """Return the path of the copy of the dataset located at `dataset_path`
+    sorted by barcode, see `sort_dataset_by_barcode`."""
+    return _sanitize_file_path(dataset_path, "_by_barcode.jsonl.gz")
+
+
+def _write_sorted_run(run: List[Tuple[bytes, bytes]], run_path: Path) -> Path:
+    # `list.sort` is stable: products with the same barcode stay in dataset
+    # order
+    run.sort(key=operator.itemgetter(0))
+    with run_path.open("wb") as f:
+        f.writelines(key + b"\t" + line for key, line in run)
+    return run_path
+
+
+def _iter_sorted_run(run_path: Path) -> Iterator[Tuple[bytes, bytes]]:
+    with run_path.open("rb") as f:
+        for run_line in f:
+            key, line = run_line.split(b"\t", 1)
+            yield key, line
+
+
+def sort_dataset_by_barcode(
+    dataset_path: Path,
+    force: bool = False,
+    max_run_bytes: int = 256 * 1024 * 1024,
+    tmp_dir: Optional[Path] = None,
+    max_workers: Optional[int] = None,
+) -> Path:
+    """Write a copy of a JSONL dataset sorted by normalized barcode (see
+    `openfoodfacts.barcode.normalize_barcode`), in lexicographic order.
+
+    The dataset is sorted with an external merge sort, so that the memory
+    usage is bounded by `max_run_bytes`: sorted runs of products are written
+    to temporary files, and then merged in a single sequential pass. Lines
+    are copied without being re-encoded. Products with the same barcode are
+    kept in dataset order.
+
+    The sorted copy is written next to the dataset (see
+    `get_sorted_dataset_path`) as a gzipped JSONL file, that can be read with
+    `ProductDataset(dataset_path=...)`. It's only rebuilt if the dataset
+    changed since the last sort (or if `force` is True). Use `merge_join` to
+    join it with other lists sorted by barcode.
+
+    :param dataset_path: the path of the JSONL dataset
+    :param force: if True, sort the dataset even if the sorted copy is up to
+        date, defaults to False
+    :param max_run_bytes: the maximum size of the lines kept in memory
+        before being sorted and written to a temporary run file, defaults to
+        256 MiB
+    :param tmp_dir: the directory where the temporary run files are stored,
+        defaults to the system temporary directory
+    :param max_workers: the number of compression threads, defaults to the
+        number of CPUs
+    :return: the path of the sorted dataset
+    """
+    sorted_path = get_sorted_dataset_path(dataset_path)
+    metadata_path = _sanitize_file_path(sorted_path, ".json")
+    fingerprint = _get_dataset_fingerprint(dataset_path)
+
+    if sorted_path.is_file() and metadata_path.is_file() and not force:
+        if json.loads(metadata_path.read_text())["dataset"] == fingerprint:
+            return sorted_path
+        logger.info("Sorted dataset %s is outdated", sorted_path)
+
+    logger.info("Sorting dataset by barcode in %s", sorted_path)
+    metadata_path.unlink(missing_ok=True)
+    with tempfile.TemporaryDirectory(dir=tmp_dir) as run_dir_str:
+        run_dir = Path(run_dir_str)
+        run_paths: List[Path] = []
+        run: List[Tuple[bytes, bytes]] = []
+        run_bytes = 0
+        for line, _ in ProductDataset(dataset_path=dataset_path)._iter_lines():
+            stripped_line = line.rstrip(b"\n")
+            if not stripped_line:
+                continue
+            product = decode_json(stripped_line)
+            key = _get_product_barcode_key(product).encode("utf-8")
+            run.append((key, stripped_line + b"\n"))
+            run_bytes += len(line)
+            if run_bytes >= max_run_bytes:
+                run_paths.append(
+                    _write_sorted_run(run, run_dir / f"{len(run_paths)}.run")
+                )
+                run = []
+                run_bytes = 0
+        if run:
+            run_paths.append(_write_sorted_run(run, run_dir / f"{len(run_paths)}.run"))
+        logger.info("Merging %d sorted runs", len(run_paths))
+
+        with JSONLWriter(sorted_path, max_workers=max_workers) as writer:
+            # `heapq.merge` is stable: products with the same barcode are
+            # yielded in run order
+            for _, line in heapq.merge(
+                *(_iter_sorted_run(run_path) for run_path in run_paths),
+                key=operator.itemgetter(0),
+            ):
+                writer.write_line(line)
+
+    metadata_path.write_text(json.dumps({"dataset": fingerprint}))
+    return sorted_path
+
+
+def merge_join(
+    left: Iterable[Any],
+    right: Iterable[Any],
+    left_key: Callable[[Any], str] = _get_product_barcode_key,
+    right_key: Callable[[Any], str] = normalize_barcode,
+    how: str = "inner",
+) -> Iterator[Tuple[Any, Any]]:
+    """Join two iterables sorted by key in a single streaming pass.
+
+    Only the items sharing the current key are kept in memory, so that the
+    memory usage doesn't depend on the size of the inputs. By default, the
+    left iterable is a dataset of products sorted by barcode (see
+    `sort_dataset_by_barcode`) and the right iterable a sorted list of
+    barcodes, both joined on the normalized barcode:
+
+    >>> products = ProductDataset(dataset_path=sort_dataset_by_barcode(path))
+    >>> for product, barcode in merge_join(products, sorted_barcodes):
+    ...     ...
+
+    Keys must be sorted in lexicographic order (as with `sorted` or the
+    `LC_ALL=C sort` command), a ValueError is raised otherwise.
+
+    :param left: the left iterable, sorted by `left_key`
+    :param right: the right iterable, sorted by `right_key`
+    :param left_key: the function returning the join key of a left item,
+        defaults to the normalized barcode of a product
+    :param right_key: the function returning the join key of a right item,
+        defaults to `normalize_barcode`
+    :param how: the join type: `inner`, `left`, `right` or `outer`, defaults
+        to `inner`. Missing items are replaced by None.
+    :yield: (left_item, right_item) tuples, in key order. When several items
+        share the same key, all combinations are yielded.
+    """
+    if how not in ("inner", "left", "right", "outer"):
+        raise ValueError(f"invalid join type: {how}")
+    keep_left = how in ("left", "outer")
+    keep_right = how in ("right", "outer")
+
+    def iter_groups(
+        items: Iterable[T], key_fn: Callable[[T], str], side: str
+    ) -> Iterator[Tuple[str, List[T]]]:
+        previous_key: Optional[str] = None
+        for key, group in itertools.groupby(items, key_fn):
+            if previous_key is not None and key < previous_key:
+                raise ValueError(
+                    f"{side} items are not sorted: {key!r} follows {previous_key!r}"
+                )
+            previous_key = key
+            yield key, list(group)
+
+    left_groups = iter_groups(left, left_key, "left")
+    right_groups = iter_groups(right, right_key, "right")
+    left_group = next(left_groups, None)
+    right_group = next(right_groups, None)
+    while left_group is not None and right_group is not None:
+        if left_group[0] < right_group[0]:
+            if keep_left:
+                yield from ((item, None) for item in left_group[1])
+            left_group = next(left_groups, None)
+        elif left_group[0] > right_group[0]:
+            if keep_right:
+                yield from ((None, item) for item in right_group[1])
+            right_group = next(right_groups, None)
+        else:
+            yield from itertools.product(left_group[1], right_group[1])
+            left_group = next(left_groups, None)
+            right_group = next(right_groups, None)
+
+    if keep_left:
+        while left_group is not None:
+            yield from ((item, None) for item in left_group[1])
+            left_group = next(left_groups, None)
+    if keep_right:
+        while right_group is not None:
+            yield from ((None, item) for item in right_group[1])
+            right_group = next(right_groups, None)
+
 
 def get_dataset(
     flavor: Flavor = Flavor.off,
@@ -46,6 +578,8 @@ def get_dataset(
     force_download: bool = False,
     download_newer: bool = False,
     cache_dir: Optional[Path] = None,
+    partition_by_country: bool = False,
+    recompress: Optional[str] = None,
 ) -> Path:
     """Download (and cache) Open Food Facts dataset.
 
@@ -60,28 +594,71 @@ def get_dataset(
         version is available (based on file Etag)
     :param cache_dir: the cache directory to use, defaults to
         ~/.cache/openfoodfacts/taxonomy
+    :param partition_by_country: if True, split the dataset into one file
+        per country after the download (see
+        `partition_dataset_by_country`), only
+        available for the JSONL dataset, defaults to False
+    :param recompress: if "zstd", transcode the dataset once into a seekable
+        zstd file (see `recompress_dataset`), only available for the JSONL
+        dataset. The transcoding is performed in a background thread: the
+        gzipped dataset path is returned right away, and `ProductDataset`
+        uses the zstd file automatically once it's ready. Defaults to None
+        (no recompression).
     :return: the path of the dataset
     """
+    dataset_type = DatasetType[dataset_type]
+    if partition_by_country and dataset_type is not DatasetType.jsonl:
+        raise ValueError("country partitioning is only available for JSONL datasets")
+
+    if recompress is not None:
+        if recompress != "zstd":
+            raise ValueError(f"unsupported recompression codec: {recompress}")
+        if dataset_type is not DatasetType.jsonl:
+            raise ValueError("recompression is only available for JSONL datasets")
+
     cache_dir = DEFAULT_CACHE_DIR if cache_dir is None else cache_dir
     file_name = DATASET_FILE_NAMES[flavor][dataset_type]
     dataset_path = cache_dir / file_name
     url = f"{URLBuilder.static(flavor, Environment.org)}/data/{file_name}"
     cache_dir.mkdir(parents=True, exist_ok=True)
 
-    if not should_download_file(url, dataset_path, force_download, download_newer):
-        return dataset_path
+    if should_download_file(url, dataset_path, force_download, download_newer):
+        logger.info("Downloading dataset, saving it in %s", dataset_path)
+        download_file(url, dataset_path)
+
+    if partition_by_country:
+        partition_dataset_by_country(dataset_path)
+
+    if recompress is not None and not is_recompressed_dataset_up_to_date(dataset_path):
+        _start_recompress_thread(dataset_path)
 
-    logger.info("Downloading dataset, saving it in %s", dataset_path)
-    download_file(url, dataset_path)
     return dataset_path
 
 
+# The function applied by `ProductDataset.map` in worker processes
+_worker_fn: Optional[Callable[[JSONType], Any]] = None
+
+
+def _init_map_worker(fn: Callable[[JSONType], Any]) -> None:
+    global _worker_fn
+    _worker_fn = fn
+
+
+def _map_worker(batch: List[Union[bytes, JSONType]]) -> List[Any]:
+    fn = cast(Callable[[JSONType], Any], _worker_fn)
+    return [
+        fn(decode_json(item) if isinstance(item, bytes) else item) for item in batch
+    ]
+
+
 class ProductDataset:
     def __init__(
         self,
         flavor: Flavor = Flavor.off,
         dataset_type: DatasetType = DatasetType.jsonl,
         dataset_path: Optional[Path] = None,
+        countries: Optional[List[Union[Country, str]]] = None,
+        stats: Optional[IterationStats] = None,
         **kwargs,
     ):
         """A product dataset.
@@ -90,7 +667,9 @@ class ProductDataset:
         to retrieve the information about products as dict.
 
         If dataset_path is None (default), the dataset is downloaded and
-        cached in `~/.cache/openfoodfacts/datasets`.
+        cached in `~/.cache/openfoodfacts/datasets`. If an up-to-date zstd
+        copy of the JSONL dataset exists (see `get_dataset`'s `recompress`
+        parameter), it's used instead of the gzipped dataset.
 
         Otherwise, the dataset is loaded from the provided path.
 
@@ -101,17 +680,37 @@ class ProductDataset:
             to DatasetType.jsonl. This parameter is ignored if dataset_path is
             provided.
         :param dataset_path: the path of the dataset, defaults to None.
+        :param countries: if provided, only iterate over the products sold in
+            these countries, using the country partitions of the JSONL
+            dataset (see `partition_dataset_by_country`). The partitions are
+            built if needed. Each product is yielded once, even if it's sold
+            in several of the requested countries. Only the iteration
+            (`for product in dataset`, `count`) is restricted to these
+            countries, other methods work on the full dataset. Defaults to
+            None (all products).
+        :param stats: if provided, the throughput statistics of the
+            iterations over the dataset are collected in this object (see
+            `IterationStats`), defaults to None
         :param kwargs: additional arguments passed to `get_dataset` when
             downloading the dataset
         """
-        self.dataset_type = dataset_type
+        self.dataset_type = DatasetType[dataset_type]
+        self.stats = stats
+        self.countries = (
+            None
+            if countries is None
+            else [
+                country if isinstance(country, Country) else Country[country]
+                for country in countries
+            ]
+        )
 
         if dataset_path is not None:
-            self.dataset_path = dataset_path
+            self.dataset_path = source_path = dataset_path
 
             # We infer the dataset type from the file extension
             full_suffix = "".join(dataset_path.suffixes)
-            if full_suffix in (".jsonl.gz", ".jsonl"):
+            if full_suffix in (".jsonl.gz", ".jsonl.zst", ".jsonl"):
                 self.dataset_type = DatasetType.jsonl
             elif full_suffix in (".csv.gz", ".csv"):
                 self.dataset_type = DatasetType.csv
@@ -119,19 +718,449 @@ class ProductDataset:
                 raise ValueError(f"Unknown dataset type: {full_suffix}")
         else:
             self.dataset_path = get_dataset(flavor, dataset_type, **kwargs)
+            source_path = self.dataset_path
+            if (
+                self.dataset_type is DatasetType.jsonl
+                and is_recompressed_dataset_up_to_date(self.dataset_path)
+            ):
+                self.dataset_path = get_recompressed_path(self.dataset_path)
+
+        self.partition_dir: Optional[Path] = None
+        if self.countries is not None:
+            if self.dataset_type is not DatasetType.jsonl:
+                raise ValueError(
+                    "country filtering is only available for JSONL datasets"
+                )
+            # Partition the downloaded dump rather than its zstd copy, to
+            # reuse the partitions built by `get_dataset`
+            self.partition_dir = partition_dataset_by_country(source_path)
 
     def __iter__(self):
-        if self.dataset_type is DatasetType.jsonl:
-            return jsonl_iter(self.dataset_path)
+        if self.countries is not None:
+            return self._partitions_iterator()
+        elif self.dataset_type is DatasetType.jsonl:
+            return jsonl_iter(self.dataset_path, stats=self.stats)
         else:
             return self._csv_iterator()
 
+    def _partitions_iterator(self) -> Iterator[JSONType]:
+        countries = cast(List[Country], self.countries)
+        partition_dir = cast(Path, self.partition_dir)
+        for i, country in enumerate(countries):
+            partition_path = partition_dir / f"{country.name}.jsonl.gz"
+            if not partition_path.is_file():
+                continue
+            # Products sold in a previous country were already yielded
+            previous_country_tags = {
+                COUNTRY_CODE_TO_NAME[previous] for previous in countries[:i]
+            }
+            for product in jsonl_iter(partition_path, stats=self.stats):
+                if previous_country_tags.isdisjoint(
+                    product.get("countries_tags") or []
+                ):
+                    yield product
+
+    def iter_frames(
+        self,
+        columns: Optional[List[str]] = None,
+        chunksize: int = 100_000,
+        downcast: bool = False,
+    ) -> Iterator["pd.DataFrame"]:
+        """Load the CSV dataset as pandas DataFrames of `chunksize` rows.
+
+        Columns are loaded with explicit dtypes (see `CSV_DTYPES`) instead of
+        letting pandas infer them: nutrients are loaded as float32,
+        timestamps as (nullable) int64, low-cardinality columns (countries,
+        grades,...) as categoricals and other columns as Python strings
+        (`object` dtype, with all pandas versions). This function requires
+        pandas.
+
+        :param columns: the columns to load, defaults to None (all columns).
+            Selecting the columns is the most efficient way to reduce the
+            memory footprint.
+        :param chunksize: the number of rows of each DataFrame, defaults to
+            100,000
+        :param downcast: if True, downcast numeric columns to the smallest
+            possible dtype, defaults to False
+        :yield: pandas DataFrames
+        """
+        if not _pandas_available:
+            raise ImportError("pandas is required to load the dataset as DataFrame")
+        if self.dataset_type is not DatasetType.csv:
+            raise ValueError("DataFrames can only be loaded from CSV datasets")
+
+        if columns is None:
+            columns = list(pd.read_csv(self.dataset_path, sep="\t", nrows=0).columns)
+        dtypes = {column: get_csv_dtype(column) for column in columns}
+        reader = pd.read_csv(
+            self.dataset_path,
+            sep="\t",
+            usecols=columns,
+            dtype=dtypes,
+            chunksize=chunksize,
+        )
+        with reader:
+            for df in reader:
+                if downcast:
+                    for column in df.columns:
+                        if dtypes[column] == "Int64":
+                            df[column] = pd.to_numeric(df[column], downcast="integer")
+                        elif dtypes[column] == "float32":
+                            df[column] = pd.to_numeric(df[column], downcast="float")
+                yield df
+
+    def load_frame(
+        self,
+        columns: Optional[List[str]] = None,
+        chunksize: int = 100_000,
+        downcast: bool = False,
+    ) -> "pd.DataFrame":
+        """Load the CSV dataset as a single pandas DataFrame.
+
+        The dataset is loaded by chunks with explicit dtypes (see
+        `iter_frames`), which needs much less memory than `pd.read_csv` with
+        inferred dtypes. The chunks are then concatenated, so the peak
+        memory usage is about twice the size of the final DataFrame: use
+        `iter_frames` to process the dataset with a bounded memory usage.
+        Categorical columns of the chunks are merged into a single
+        categorical column. This function requires pandas.
+
+        :param columns: the columns to load, defaults to None (all columns)
+        :param chunksize: the number of rows loaded at once, defaults to
+            100,000
+        :param downcast: if True, downcast numeric columns to the smallest
+            possible dtype, defaults to False
+        :return: the DataFrame
+        """
+        frames = list(self.iter_frames(columns, chunksize, downcast))
+        if not frames:
+            return pd.DataFrame(columns=columns)
+
+        for column in frames[0].columns:
+            if isinstance(frames[0][column].dtype, pd.CategoricalDtype):
+                categories = pd.api.types.union_categoricals(
+                    [df[column] for df in frames]
+                ).categories
+                for df in frames:
+                    df[column] = df[column].cat.set_categories(categories)
+            elif downcast:
+                # Chunks may have been downcasted to different dtypes
+                dtype = pd.concat([df[column].head(0) for df in frames]).dtype
+                for df in frames:
+                    df[column] = df[column].astype(dtype)
+
+        return pd.concat(frames, ignore_index=True)
+
+    def iter_with_cursor(
+        self, start_from: Optional[DatasetCursor] = None
+    ) -> Iterator[Tuple[JSONType, DatasetCursor]]:
+        """Iterate over the dataset, yielding (product, cursor) tuples.
+
+        The cursor yielded with a product points right after this product:
+        pass it as `start_from` to resume the iteration from the next
+        product. Only JSONL datasets are supported.
+
+        :param start_from: the cursor to resume the iteration from, defaults
+            to None (start from the beginning of the dataset)
+        :yield: (product, cursor) tuples
+        """
+        for line, cursor in self._iter_lines(start_from):
+            line = line.rstrip(b"\n")
+            if line:
+                yield decode_json(line), cursor
+
+    def iter_checkpointed(
+        self, checkpoint_path: Union[str, Path], every: int = 10_000
+    ) -> Iterator[JSONType]:
+        """Iterate over the dataset, saving the position in
+        `checkpoint_path` every `every` products.
+
+        If `checkpoint_path` already exists, the iteration resumes from the
+        saved position. The position is saved once the consumer asked for
+        the next product, so that a product is only considered as processed
+        when the consumer is done with it: after a crash, at most `every`
+        products are processed twice.
+
+        The checkpoint file is not deleted at the end of the iteration, the
+        cursor then points to the end of the dataset.
+
+        :param checkpoint_path: the path of the checkpoint file
+        :param every: the number of products between two checkpoints,
+            defaults to 10,000
+        :yield: the products
+        """
+        checkpoint_path = Path(checkpoint_path)
+        start_from = DatasetCursor.load(checkpoint_path)
+        if start_from is not None:
+            logger.info(
+                "Resuming iteration from line %d (%s)",
+                start_from.line_number,
+                checkpoint_path,
+            )
+
+        cursor = start_from
+        for i, (product, cursor) in enumerate(
+            self.iter_with_cursor(start_from), start=1
+        ):
+            yield product
+            if i % every == 0:
+                cursor.save(checkpoint_path)
+
+        if cursor is not None:
+            cursor.save(checkpoint_path)
+
+    def map(
+        self,
+        fn: Callable[[JSONType], Any],
+        max_workers: Optional[int] = None,
+        batch_size: int = 1000,
+    ) -> Iterator[Any]:
+        """Apply `fn` to every product of the dataset in parallel worker
+        processes, and iterate over the results (in dataset order).
+
+        `fn` is sent once to each worker, so it can carry heavy read-only
+        state (ex: a `TaxonomyEnricher`). It must be picklable. For JSONL
+        datasets, raw lines are sent to the workers, so that JSON decoding
+        is also performed in parallel.
+
+        :param fn: the function to apply to each product
+        :param max_workers: the number of worker processes, defaults to the
+            number of CPUs
+        :param batch_size: the number of products sent at once to a worker,
+            defaults to 1000
+        :yield: the results of `fn`
+        """
+        batches: Iterator[List[Union[bytes, JSONType]]]
+        if self.dataset_type is DatasetType.jsonl and self.countries is None:
+            lines = (line for line, _ in self._iter_lines() if line.strip())
+            batches = _batched(lines, batch_size)
+        else:
+            batches = _batched(iter(self), batch_size)
+
+        with concurrent.futures.ProcessPoolExecutor(
+            max_workers, initializer=_init_map_worker, initargs=(fn,)
+        ) as executor:
+            # Bound the number of batches in flight
+            max_pending = 2 * (max_workers or os.cpu_count() or 1)
+            pending: Deque[concurrent.futures.Future] = collections.deque()
+            for batch in batches:
+                pending.append(executor.submit(_map_worker, batch))
+                if len(pending) >= max_pending:
+                    yield from pending.popleft().result()
+            while pending:
+                yield from pending.popleft().result()
+
+    def iter_images(self, **kwargs) -> Iterator[ImageManifestItem]:
+        """Iterate over the images of all products of the dataset.
+
+        See `openfoodfacts.images.iter_image_manifest` for the available
+        filters, and `openfoodfacts.images.write_image_manifest` to save the
+        images in a manifest file.
+
+        :param kwargs: arguments passed to `iter_image_manifest`
+        :return: an iterator of `ImageManifestItem`
+        """
+        return iter_image_manifest(self, **kwargs)
+
+    def get_barcode_filter(
+        self,
+        false_positive_rate: float = 0.001,
+        capacity: Optional[int] = None,
+        force_rebuild: bool = False,
+    ) -> BarcodeBloomFilter:
+        """Return a Bloom filter over all the barcodes of the dataset.
+
+        The filter is built with a full scan the first time, and saved next
+        to the dataset. It's rebuilt automatically when the dataset changes
+        (new snapshot).
+
+        Use it to know if a barcode is definitely absent from the dataset:
+
+        >>> barcode_filter = dataset.get_barcode_filter()
+        >>> "3017620422003" in barcode_filter
+        True
+
+        :param false_positive_rate: the target false positive rate, defaults
+            to 0.001. Only used when building the filter.
+        :param capacity: the expected number of products, defaults to None
+            (the products are counted before building the filter)
+        :param force_rebuild: if True, rebuild the filter even if an up to
+            date filter exists, defaults to False
+        :return: the barcode filter
+        """
+        filter_path = _sanitize_file_path(self.dataset_path, "_barcodes.bloom")
+        fingerprint = _get_dataset_fingerprint(self.dataset_path)
+
+        if filter_path.is_file() and not force_rebuild:
+            barcode_filter, metadata = BarcodeBloomFilter.load(filter_path)
+            if metadata.get("dataset") == fingerprint:
+                return barcode_filter
+            logger.info("Barcode filter %s is outdated", filter_path)
+
+        if capacity is None:
+            capacity = self._count_lines()
+
+        logger.info("Building barcode filter, saving it in %s", filter_path)
+        barcode_filter = BarcodeBloomFilter.for_capacity(capacity, false_positive_rate)
+        for code in self._iter_barcodes():
+            barcode_filter.add(code)
+
+        barcode_filter.save(filter_path, metadata={"dataset": fingerprint})
+        return barcode_filter
+
+    def build_time_index(self, force_rebuild: bool = False) -> Path:
+        """Build an index of the dataset sorted by `last_modified_t`, used by
+        `modified_since`.
+
+        The index is built with a full scan the first time, and saved next
+        to the dataset. It's rebuilt automatically when the dataset changes
+        (new snapshot). Products without `last_modified_t` are indexed with
+        a timestamp of 0. Only JSONL datasets are supported.
+
+        :param force_rebuild: if True, rebuild the index even if an up to
+            date index exists, defaults to False
+        :return: the path of the index
+        """
+        index_path = _sanitize_file_path(self.dataset_path, "_last_modified.idx")
+        fingerprint = _get_dataset_fingerprint(self.dataset_path)
+
+        if index_path.is_file() and not force_rebuild:
+            with index_path.open("rb") as f:
+                header = json.loads(f.readline())
+            if header["dataset"] == fingerprint:
+                return index_path
+            logger.info("Time index %s is outdated", index_path)
+
+        logger.info("Building time index, saving it in %s", index_path)
+        entries = []
+        for line, cursor in self._iter_lines():
+            stripped_line = line.rstrip(b"\n")
+            if not stripped_line:
+                continue
+            product = decode_json(stripped_line)
+            entries.append(
+                (int(product.get("last_modified_t") or 0), cursor.offset - len(line))
+            )
+        entries.sort()
+
+        header = {"count": len(entries), "dataset": fingerprint}
+        tmp_path = index_path.with_name(index_path.name + ".part")
+        with tmp_path.open("wb") as f:
+            f.write(json.dumps(header).encode("utf-8") + b"\n")
+            array.array("q", (timestamp for timestamp, _ in entries)).tofile(f)
+            array.array("Q", (offset for _, offset in entries)).tofile(f)
+        tmp_path.replace(index_path)
+        return index_path
+
+    def modified_since(self, timestamp: int) -> Iterator[JSONType]:
+        """Iterate over the products modified strictly after `timestamp`.
+
+        The time index (see `build_time_index`) is used to only read and
+        decode the products modified after `timestamp`, it's built if it
+        doesn't exist yet. Products are yielded in dataset order.
+
+        :param timestamp: a UNIX timestamp (in seconds)
+        :yield: the products whose `last_modified_t` is > `timestamp`
+        """
+        index_path = self.build_time_index()
+        timestamps = array.array("q")
+        offsets = array.array("Q")
+        with index_path.open("rb") as f:
+            header = json.loads(f.readline())
+            timestamps.fromfile(f, header["count"])
+            offsets.fromfile(f, header["count"])
+
+        start = bisect.bisect_right(timestamps, timestamp)
+        with _open_binary(self.dataset_path) as (_, stream):
+            # Read the products in file order to only seek forward
+            for offset in sorted(offsets[start:]):
+                stream.seek(offset)
+                line = stream.readline()
+                yield decode_json(line)
+
+    def _iter_barcodes(self) -> Iterator[str]:
+        """Iterate over the barcodes of the full dataset, ignoring the
+        `countries` restriction."""
+        if self.dataset_type is not DatasetType.jsonl:
+            products: Iterable[JSONType] = self._csv_iterator()
+        else:
+            products = (
+                decode_json(line) for line, _ in self._iter_lines() if line.strip()
+            )
+        for product in products:
+            code = product.get("code")
+            if code:
+                yield code
+
+    def _count_lines(self) -> int:
+        """Return the number of products, without decoding JSON lines for
+        JSONL datasets."""
+        if self.dataset_type is not DatasetType.jsonl:
+            return self.count()
+        count = 0
+        for _ in self._iter_lines():
+            count += 1
+        return count
+
+    def _iter_lines(
+        self, start_from: Optional[DatasetCursor] = None
+    ) -> Iterator[Tuple[bytes, DatasetCursor]]:
+        """Iterate over the raw lines of a JSONL dataset.
+
+        :param start_from: the cursor to resume the iteration from
+        :yield: (line, cursor) tuples, where the cursor points right after
+            the line
+        """
+        if self.dataset_type is not DatasetType.jsonl:
+            raise ValueError("cursors are only supported for JSONL datasets")
+
+        line_number = 0
+        offset = 0
+        with _open_binary(self.dataset_path) as (raw, stream):
+            compressed = raw is not stream
+            if start_from is not None:
+                line_number = start_from.line_number
+                offset = start_from.offset
+                # For gzip files, the seek is performed by decompressing the
+                # file up to `offset`, which is still much faster than
+                # decoding JSON lines
+                stream.seek(offset)
+
+            for line in stream:
+                line_number += 1
+                offset += len(line)
+                yield line, DatasetCursor(
+                    line_number=line_number,
+                    offset=offset,
+                    compressed_offset=raw.tell() if compressed else None,
+                )
+
     def _csv_iterator(self):
         open_fn = get_open_fn(self.dataset_path)
         with open_fn(self.dataset_path, "rt", newline="") as csvfile:
             reader = csv.DictReader(csvfile, delimiter="\t")
-            for row in reader:
+            if self.stats is None:
+                for row in reader:
+                    yield dict(row)
+                return
+
+            # Reading and CSV parsing can't be measured separately, the
+            # time is accounted as decode time
+            stats = self.stats
+            stats.start()
+            while True:
+                start = time.perf_counter()
+                row = next(reader, None)
+                decode_end = time.perf_counter()
+                stats.decode_time += decode_end - start
+                if row is None:
+                    break
+                stats.lines += 1
                 yield dict(row)
+                now = time.perf_counter()
+                stats.consumer_time += now - decode_end
+                stats.maybe_report(now)
+            stats.finish()
 
     def count(self) -> int:
         """Return the number of products in the dataset."""
@@ -139,3 +1168,131 @@ class ProductDataset:
         for _ in self:
             count += 1
         return count
+
+
+# Sentinel put in a reader queue when the reader is done
+_READER_DONE = object()
+
+
+class MultiFlavorDataset:
+    def __init__(
+        self,
+        flavors: Optional[List[Union[Flavor, str]]] = None,
+        dataset_type: DatasetType = DatasetType.jsonl,
+        order: str = "interleave",
+        batch_size: int = 100,
+        prefetch_batches: int = 10,
+        **kwargs,
+    ):
+        """A dataset iterating over the products of several flavors.
+
+        Missing datasets are downloaded concurrently, and each dataset is
+        read in its own thread: decompression releases the GIL, so that the
+        datasets are read in parallel while the main thread consumes the
+        products.
+
+        :param flavors: the flavors to iterate over, defaults to None (all
+            flavors with a dataset: off, obf, opff and opf)
+        :param dataset_type: the dataset type to use (csv or jsonl),
+            defaults to DatasetType.jsonl
+        :param order: `interleave` to yield one batch of each flavor in turn
+            (flavors whose dataset is exhausted are skipped), or
+            `sequential` to yield all products of the first flavor, then all
+            products of the second flavor,... (the next datasets are still
+            read ahead in the background). Defaults to `interleave`.
+        :param batch_size: the number of products read at once by a reader
+            thread, defaults to 100
+        :param prefetch_batches: the maximum number of batches read ahead by
+            each reader thread, defaults to 10
+        :param kwargs: additional arguments passed to `ProductDataset`
+        """
+        if order not in ("interleave", "sequential"):
+            raise ValueError(f"invalid order: {order}")
+        if flavors is None:
+            flavors = list(DATASET_FILE_NAMES)
+        self.flavors = [Flavor[flavor] for flavor in flavors]
+        self.order = order
+        self.batch_size = batch_size
+        self.prefetch_batches = prefetch_batches
+
+        with concurrent.futures.ThreadPoolExecutor(len(self.flavors)) as executor:
+            datasets = executor.map(
+                lambda flavor: ProductDataset(flavor, dataset_type, **kwargs),
+                self.flavors,
+            )
+            self.datasets: Dict[Flavor, ProductDataset] = dict(
+                zip(self.flavors, datasets)
+            )
+
+    def _read(
+        self,
+        dataset: ProductDataset,
+        output_queue: "queue.Queue",
+        stop_event: threading.Event,
+    ) -> None:
+        def put(item) -> bool:
+            # Don't block forever if the consumer stopped the iteration
+            while not stop_event.is_set():
+                try:
+                    output_queue.put(item, timeout=0.1)
+                    return True
+                except queue.Full:
+                    continue
+            return False
+
+        try:
+            batch = []
+            for product in dataset:
+                batch.append(product)
+                if len(batch) >= self.batch_size:
+                    if not put(batch):
+                        return
+                    batch = []
+            if batch and not put(batch):
+                return
+            put(_READER_DONE)
+        except BaseException as e:
+            put(e)
+
+    def __iter__(self) -> Iterator[Tuple[Flavor, JSONType]]:
+        """Iterate over the products of all flavors.
+
+        :yield: (flavor, product) tuples
+        """
+        stop_event = threading.Event()
+        queues: Dict[Flavor, queue.Queue] = {
+            flavor: queue.Queue(maxsize=self.prefetch_batches)
+            for flavor in self.flavors
+        }
+        threads = [
+            threading.Thread(
+                target=self._read,
+                args=(self.datasets[flavor], queues[flavor], stop_event),
+                name=f"dataset-reader-{flavor.name}",
+                daemon=True,
+            )
+            for flavor in self.flavors
+        ]
+        for thread in threads:
+            thread.start()
+
+        active_flavors = list(self.flavors)
+        try:
+            while active_flavors:
+                # In sequential order, the first active flavor is consumed
+                # until it's exhausted
+                for flavor in list(
+                    active_flavors if self.order == "interleave" else active_flavors[:1]
+                ):
+                    batch = queues[flavor].get()
+                    if batch is _READER_DONE:
+                        active_flavors.remove(flavor)
+                        continue
+                    if isinstance(batch, BaseException):
+                        raise batch
+                    for product in batch:
+                        yield flavor, product
+        finally:
+            stop_event.set()
+            for thread in threads:
+                thread.join()
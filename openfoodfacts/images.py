@@ -1,12 +1,18 @@
+import csv
 import logging
 from pathlib import Path
-from typing import List, Optional, Tuple, Union
+from typing import Iterable, Iterator, List, NamedTuple, Optional, Tuple, Union
 from urllib.parse import urlparse
 
 import requests
 
-from openfoodfacts.types import Environment, Flavor
-from openfoodfacts.utils import ImageDownloadItem, URLBuilder, get_image_from_url
+from openfoodfacts.types import Environment, Flavor, JSONType
+from openfoodfacts.utils import (
+    ImageDownloadItem,
+    URLBuilder,
+    get_image_from_url,
+    get_open_fn,
+)
 
 logger = logging.getLogger(__name__)
 
@@ -130,6 +136,139 @@ def generate_image_url(
     )
 
 
+class ImageManifestItem(NamedTuple):
+    """An image of the image manifest, see `iter_image_manifest`.
+
+    :param barcode: the product barcode
+    :param image_id: the raw image ID (ex: `1`, `2`,...)
+    :param image_key: the key of the selected image (ex: `front_fr`), or
+        None for raw images
+    :param url: the URL of the image, at the requested resolution
+    :param ocr_url: the URL of the OCR JSON of the raw image
+    """
+
+    barcode: str
+    image_id: str
+    image_key: Optional[str]
+    url: str
+    ocr_url: str
+
+
+IMAGE_RESOLUTIONS = ("100", "200", "400", "full")
+# Product Opener only generates the 200px version of selected images
+RAW_IMAGE_RESOLUTIONS = ("100", "400", "full")
+
+
+def iter_image_manifest(
+    products: Iterable[JSONType],
+    selected_only: bool = False,
+    lang: Optional[str] = None,
+    uploaded_after: Optional[int] = None,
+    resolution: str = "full",
+    flavor: Flavor = Flavor.off,
+    environment: Environment = Environment.org,
+) -> Iterator[ImageManifestItem]:
+    """Iterate over the images of `products` (as found in the dataset, see
+    `ProductDataset`), using the `images` field of each product.
+
+    Both raw images (uploaded by contributors) and selected images (ex:
+    `front_fr`, a crop/rotation of a raw image) are returned, unless
+    filters are provided.
+
+    :param products: an iterable of products
+    :param selected_only: if True, only return selected images, defaults to
+        False
+    :param lang: if provided, only return selected images of this language
+        (ex: `fr`). As raw images don't have a language, this implies
+        `selected_only`. Defaults to None.
+    :param uploaded_after: if provided, only return images whose raw image
+        was uploaded after this timestamp, defaults to None
+    :param resolution: the resolution of the image URLs, one of `100`,
+        `200`, `400` and `full`, defaults to `full`. `200` is only
+        available for selected images (with `selected_only` or `lang`).
+    :param flavor: the project to use, defaults to Flavor.off
+    :param environment: the environment (prod/staging), defaults to
+        Environment.org
+    :yield: an `ImageManifestItem` for each image
+    """
+    if resolution not in IMAGE_RESOLUTIONS:
+        raise ValueError(f"invalid image resolution: {resolution}")
+
+    selected_only = selected_only or lang is not None
+    if not selected_only and resolution not in RAW_IMAGE_RESOLUTIONS:
+        raise ValueError(
+            f"raw images are not available in resolution {resolution}, "
+            "use selected_only=True or another resolution"
+        )
+    lang_suffix = None if lang is None else f"_{lang}"
+    # Build the URL prefix once instead of once per image
+    url_prefix = URLBuilder.image_url(flavor, environment, "")
+    raw_suffix = ".jpg" if resolution == "full" else f".{resolution}.jpg"
+
+    for product in products:
+        images = product.get("images")
+        code = product.get("code")
+        if not images or not code:
+            continue
+        try:
+            product_url = f"{url_prefix}/{'/'.join(split_barcode(code))}/"
+        except ValueError:
+            logger.debug("Invalid barcode, skipping images: %s", code)
+            continue
+
+        for key, image_data in images.items():
+            if key.isdigit():
+                image_id = key
+                image_key = None
+                if selected_only:
+                    continue
+                file_name = f"{image_id}{raw_suffix}"
+            else:
+                image_id = str(image_data.get("imgid", ""))
+                image_key = key
+                if not image_id or (
+                    lang_suffix is not None and not key.endswith(lang_suffix)
+                ):
+                    continue
+                file_name = f"{key}.{image_data.get('rev')}.{resolution}.jpg"
+
+            if uploaded_after is not None:
+                raw_image_data = images.get(image_id) or {}
+                if int(raw_image_data.get("uploaded_t") or 0) <= uploaded_after:
+                    continue
+
+            yield ImageManifestItem(
+                code,
+                image_id,
+                image_key,
+                product_url + file_name,
+                f"{product_url}{image_id}.json",
+            )
+
+
+def write_image_manifest(
+    path: Union[str, Path], items: Iterable[ImageManifestItem]
+) -> int:
+    """Write an image manifest as a tab-separated CSV file, with a header.
+
+    The file can be compressed (.gz, .zst), and each line can be processed
+    independently (ex: to split the manifest between several downloaders).
+
+    :param path: the output path
+    :param items: the manifest items, see `iter_image_manifest`
+    :return: the number of written items
+    """
+    count = 0
+    open_fn = get_open_fn(path)
+    with open_fn(str(path), "wt", newline="") as f:
+        writer = csv.writer(f, delimiter="\t")
+        writer.writerow(ImageManifestItem._fields)
+        for item in items:
+            writer.writerow(item)
+            count += 1
+    return count
+
+
 def extract_barcode_from_url(url: str) -> Optional[str]:
     """Extract a product barcode from an image/OCR URL.
 
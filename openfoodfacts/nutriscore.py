@@ -0,0 +1,301 @@
+"""Vectorized computation of the Nutri-Score on many products at once.
+
+This module implements the 2021 version of the Nutri-Score computation (the
+version used by Open Food Facts before the 2023 update), for solid foods,
+cheeses, added fats, beverages and waters. It works on a nutrient matrix
+(one row per product, one column per nutrient, see `NUTRIENT_FIELDS`), so
+that millions of products can be (re)scored in a few seconds:
+
+>>> matrix = build_nutrient_matrix(ProductDataset())
+>>> scores, grades = compute_nutriscore(matrix.values, matrix.categories)
+
+This module requires numpy. It's meant for offline what-if analyses: the
+Nutri-Score computed by Product Opener has more special cases (product
+categories where the Nutri-Score is not applicable, estimation of the
+fruit/vegetable content,...), and remains the reference.
+"""
+
+import dataclasses
+import enum
+from typing import Any, Callable, Iterable, List, Optional, Sequence, Tuple
+
+from .taxonomy import Taxonomy
+from .types import JSONType
+
+_numpy_available = True
+try:
+    import numpy as np
+except ImportError:
+    _numpy_available = False
+
+
+class NutriScoreCategory(enum.IntEnum):
+    """The category of a product, that determines how the Nutri-Score is
+    computed."""
+
+    general = 0
+    cheese = 1
+    fats = 2
+    beverage = 3
+    water = 4
+
+
+# Nutrients used to compute the Nutri-Score, in the column order of the
+# nutrient matrix. Values are per 100g (or 100ml), sodium is in g.
+NUTRIENT_FIELDS = (
+    "energy-kj",
+    "sugars",
+    "saturated-fat",
+    "fat",
+    "sodium",
+    "fruits-vegetables-nuts",
+    "fiber",
+    "proteins",
+)
+
+# Fields used (in order of preference) to get the fruit/vegetable/nuts
+# content of a product
+FRUITS_VEGETABLES_NUTS_FIELDS = (
+    "fruits-vegetables-nuts_100g",
+    "fruits-vegetables-nuts-dried_100g",
+    "fruits-vegetables-nuts-estimate_100g",
+    "fruits-vegetables-nuts-estimate-from-ingredients_100g",
+)
+
+# Taxonomy IDs of the categories used to select the NutriScoreCategory, in
+# order of priority
+CATEGORY_TAGS = (
+    ("en:waters", NutriScoreCategory.water),
+    ("en:cheeses", NutriScoreCategory.cheese),
+    ("en:fats", NutriScoreCategory.fats),
+    ("en:beverages", NutriScoreCategory.beverage),
+)
+# Beverage subcategories that are scored as solid foods
+NON_BEVERAGE_TAGS = ("en:milks", "en:plant-based-milk-alternatives")
+
+# A product gets one point for each threshold strictly exceeded
+ENERGY_THRESHOLDS = (335, 670, 1005, 1340, 1675, 2010, 2345, 2680, 3015, 3350)
+SUGARS_THRESHOLDS = (4.5, 9, 13.5, 18, 22.5, 27, 31, 36, 40, 45)
+SATURATED_FAT_THRESHOLDS = (1, 2, 3, 4, 5, 6, 7, 8, 9, 10)
+SODIUM_MG_THRESHOLDS = (90, 180, 270, 360, 450, 540, 630, 720, 810, 900)
+FIBER_THRESHOLDS = (0.9, 1.9, 2.8, 3.7, 4.7)
+PROTEINS_THRESHOLDS = (1.6, 3.2, 4.8, 6.4, 8.0)
+FRUITS_THRESHOLDS = (40, 60, 80)
+FRUITS_POINTS = (0, 1, 2, 5)
+BEVERAGE_ENERGY_THRESHOLDS = (0, 30, 60, 90, 120, 150, 180, 210, 240, 270)
+BEVERAGE_SUGARS_THRESHOLDS = (0, 1.5, 3, 4.5, 6, 7.5, 9, 10.5, 12, 13.5)
+BEVERAGE_FRUITS_POINTS = (0, 2, 4, 10)
+# For added fats, the saturated fat points are computed from the saturated
+# fat / fat ratio (in %), one point for each threshold reached
+FATS_SATURATED_FAT_RATIO_THRESHOLDS = (10, 16, 22, 28, 34, 40, 46, 52, 58, 64)
+
+# Upper bound (inclusive) of the score for each grade
+GRADE_THRESHOLDS = (-1, 2, 10, 18)
+BEVERAGE_GRADE_THRESHOLDS = (1, 5, 9)
+GRADES = ("a", "b", "c", "d", "e")
+
+
+@dataclasses.dataclass
+class NutrientMatrix:
+    """Nutrient values of a set of products.
+
+    :param codes: the product barcodes, one per row
+    :param values: a float32 array of shape (n_products, len(NUTRIENT_FIELDS))
+        with the nutrient values, NaN for missing values
+    :param categories: an int8 array of shape (n_products,) with the
+        `NutriScoreCategory` of each product
+    """
+
+    codes: List[str]
+    values: "np.ndarray"
+    categories: "np.ndarray"
+
+
+def _check_numpy() -> None:
+    if not _numpy_available:
+        raise ImportError("numpy is required to compute the Nutri-Score")
+
+
+def get_nutriscore_category(
+    categories_tags: Iterable[str],
+    get_ancestors: Optional[Callable[[str], Iterable[str]]] = None,
+) -> NutriScoreCategory:
+    """Return the `NutriScoreCategory` of a product from its categories.
+
+    :param categories_tags: the category tags of the product
+    :param get_ancestors: a function returning the ancestors of a category
+        (ex: `Taxonomy.get_ancestor_ids` of the category taxonomy), defaults
+        to None. It's not needed if `categories_tags` already contains the
+        parent categories, which is the case for products of the dataset.
+    """
+    tags = set(categories_tags)
+    if get_ancestors is not None:
+        for tag in list(tags):
+            tags.update(get_ancestors(tag))
+
+    for tag, category in CATEGORY_TAGS:
+        if tag in tags:
+            if category is NutriScoreCategory.beverage and not tags.isdisjoint(
+                NON_BEVERAGE_TAGS
+            ):
+                return NutriScoreCategory.general
+            return category
+    return NutriScoreCategory.general
+
+
+def _to_float(value: Any) -> float:
+    """Convert a nutrient value to float, or NaN if it's missing or not a
+    number (ex: "" or "<0.5")."""
+    try:
+        return float(value)
+    except (TypeError, ValueError):
+        return float("nan")
+
+
+def _get_nutrient_value(nutriments: JSONType, field: str) -> float:
+    if field == "fruits-vegetables-nuts":
+        for fruits_field in FRUITS_VEGETABLES_NUTS_FIELDS:
+            if fruits_field in nutriments:
+                return _to_float(nutriments[fruits_field])
+        return float("nan")
+    if field == "energy-kj" and "energy-kj_100g" not in nutriments:
+        # `energy_100g` is always in kJ
+        field = "energy"
+    value = nutriments.get(f"{field}_100g")
+    if value is None and field == "sodium" and "salt_100g" in nutriments:
+        return _to_float(nutriments["salt_100g"]) / 2.5
+    return _to_float(value)
+
+
+def build_nutrient_matrix(
+    products: Iterable[JSONType], category_taxonomy: Optional[Taxonomy] = None
+) -> NutrientMatrix:
+    """Build a `NutrientMatrix` from products, as found in the dataset
+    (see `ProductDataset`).
+
+    :param products: an iterable of products
+    :param category_taxonomy: the category taxonomy, used to add the parent
+        categories of `categories_tags` before selecting the Nutri-Score
+        category, defaults to None
+    :return: the nutrient matrix
+    """
+    _check_numpy()
+    get_ancestors = (
+        None if category_taxonomy is None else category_taxonomy.get_ancestor_ids
+    )
+    codes = []
+    rows = []
+    categories = []
+    for product in products:
+        nutriments = product.get("nutriments") or {}
+        codes.append(product.get("code", ""))
+        rows.append(
+            [_get_nutrient_value(nutriments, nutrient) for nutrient in NUTRIENT_FIELDS]
+        )
+        categories.append(
+            get_nutriscore_category(product.get("categories_tags") or [], get_ancestors)
+        )
+    return NutrientMatrix(
+        codes=codes,
+        values=np.array(rows, dtype=np.float32).reshape(-1, len(NUTRIENT_FIELDS)),
+        categories=np.array(categories, dtype=np.int8),
+    )
+
+
+def _points(values: "np.ndarray", thresholds: Sequence[float]) -> "np.ndarray":
+    # Number of thresholds strictly exceeded by each value
+    return np.searchsorted(np.array(thresholds), values, side="left")
+
+
+def compute_nutriscore(
+    values: "np.ndarray", categories: "np.ndarray"
+) -> Tuple["np.ndarray", "np.ndarray"]:
+    """Compute the Nutri-Score (2021 version) of many products at once.
+
+    Missing fiber and fruit/vegetable/nuts values are considered as 0. The
+    score is not computable if energy, sugars, saturated fat, sodium or
+    proteins (or fat, for fats) is missing.
+
+    :param values: the nutrient values, see `NutrientMatrix.values`
+    :param categories: the Nutri-Score categories, see
+        `NutrientMatrix.categories`
+    :return: a (scores, grades) tuple: scores is a float32 array (NaN when
+        the score cannot be computed) and grades an array of grade letters
+        (`a` to `e`, empty string when the score cannot be computed). Waters
+        get a score of 0 and the grade `a`.
+    """
+    _check_numpy()
+    values = np.asarray(values, dtype=np.float32)
+    categories = np.asarray(categories)
+    energy, sugars, saturated_fat, fat, sodium, fruits, fiber, proteins = (
+        values[:, i] for i in range(len(NUTRIENT_FIELDS))
+    )
+    fruits = np.nan_to_num(fruits, nan=0.0)
+    fiber = np.nan_to_num(fiber, nan=0.0)
+
+    is_beverage = categories == NutriScoreCategory.beverage
+    is_fats = categories == NutriScoreCategory.fats
+    is_cheese = categories == NutriScoreCategory.cheese
+    is_water = categories == NutriScoreCategory.water
+
+    energy_points = np.where(
+        is_beverage,
+        _points(energy, BEVERAGE_ENERGY_THRESHOLDS),
+        _points(energy, ENERGY_THRESHOLDS),
+    )
+    sugars_points = np.where(
+        is_beverage,
+        _points(sugars, BEVERAGE_SUGARS_THRESHOLDS),
+        _points(sugars, SUGARS_THRESHOLDS),
+    )
+    with np.errstate(divide="ignore", invalid="ignore"):
+        saturated_fat_ratio = np.where(fat > 0, saturated_fat / fat * 100, 0.0)
+    saturated_fat_points = np.where(
+        is_fats,
+        np.searchsorted(
+            np.array(FATS_SATURATED_FAT_RATIO_THRESHOLDS),
+            saturated_fat_ratio,
+            side="right",
+        ),
+        _points(saturated_fat, SATURATED_FAT_THRESHOLDS),
+    )
+    sodium_points = _points(sodium * 1000, SODIUM_MG_THRESHOLDS)
+    negative_points = energy_points + sugars_points + saturated_fat_points
+    negative_points += sodium_points
+
+    fruits_index = _points(fruits, FRUITS_THRESHOLDS)
+    fruits_points = np.where(
+        is_beverage,
+        np.array(BEVERAGE_FRUITS_POINTS)[fruits_index],
+        np.array(FRUITS_POINTS)[fruits_index],
+    )
+    fiber_points = _points(fiber, FIBER_THRESHOLDS)
+    proteins_points = _points(proteins, PROTEINS_THRESHOLDS)
+
+    # Proteins are not counted for products with many negative points,
+    # unless they contain a lot of fruits/vegetables or they are cheeses
+    max_fruits_points = np.where(is_beverage, BEVERAGE_FRUITS_POINTS[-1], 5)
+    count_proteins = (
+        (negative_points < 11) | is_cheese | (fruits_points >= max_fruits_points)
+    )
+    scores = (
+        negative_points
+        - fruits_points
+        - fiber_points
+        - np.where(count_proteins, proteins_points, 0)
+    ).astype(np.float32)
+    scores[is_water] = 0
+
+    required = values[:, [0, 1, 2, 4, 7]]
+    missing = np.isnan(required).any(axis=1) | (is_fats & np.isnan(fat))
+    scores[missing & ~is_water] = np.nan
+
+    grade_index = np.where(
+        is_beverage,
+        np.searchsorted(np.array(BEVERAGE_GRADE_THRESHOLDS), scores, side="left") + 1,
+        np.searchsorted(np.array(GRADE_THRESHOLDS), scores, side="left"),
+    )
+    grade_index[is_water] = 0
+    grades = np.array(GRADES)[np.minimum(grade_index, len(GRADES) - 1)]
+    grades[np.isnan(scores)] = ""
+    return scores, grades
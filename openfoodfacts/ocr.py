@@ -13,7 +13,7 @@ from typing import Callable, Dict, List, Optional, Tuple, Union
 import requests
 
 from .types import JSONType
-from .utils import _pillow_available, get_logger, http_session
+from .utils import _pillow_available, decode_json, get_logger, http_session
 
 if _pillow_available:
     from PIL import Image
@@ -331,7 +331,7 @@ class OCRResult:
             return None
 
         try:
-            ocr_data: dict = r.json()
+            ocr_data: dict = decode_json(r.content)
         except json.JSONDecodeError as e:
             error_message = "Error while decoding OCR JSON"
             if error_raise:
@@ -0,0 +1,223 @@
+"""Client-side rate limiting of API requests.
+
+`AdaptiveRateLimiter` spaces out requests with one token bucket per
+endpoint class (product reads, searches, writes). The rate of each bucket
+adapts to the server signals, AIMD-style (additive increase, multiplicative
+decrease): it's decreased on 429/503 responses (and on slow responses if
+`latency_threshold` is set), and slowly increased back on successful
+responses, up to the maximum rate. Throttled requests are retried after
+a jittered exponential backoff, honoring the `Retry-After` header:
+
+>>> api = API(user_agent="my-app", rate_limiter=AdaptiveRateLimiter())
+"""
+
+import email.utils
+import enum
+import random
+import threading
+import time
+from typing import Callable, Dict, Optional
+
+import requests
+
+
+class EndpointClass(str, enum.Enum):
+    """The class of an API endpoint, each class being rate-limited
+    independently."""
+
+    product = "product"
+    search = "search"
+    write = "write"
+
+
+# Rate limits (in requests per second) of Product Opener, see
+# https://openfoodfacts.github.io/openfoodfacts-server/api/
+DEFAULT_RATES = {
+    EndpointClass.product: 100 / 60,
+    EndpointClass.search: 10 / 60,
+    EndpointClass.write: 60 / 60,
+}
+# Status codes of throttled requests, that are retried
+THROTTLED_STATUS_CODES = (429, 503)
+
+
+class TokenBucket:
+    """A thread-safe token bucket.
+
+    :param rate: the number of tokens added per second
+    :param burst: the maximum number of tokens in the bucket, defaults to 1
+    """
+
+    def __init__(self, rate: float, burst: int = 1):
+        if rate <= 0:
+            raise ValueError("rate must be > 0")
+        self.rate = rate
+        self.burst = burst
+        self.tokens = float(burst)
+        self.updated_at = time.monotonic()
+        self._lock = threading.Lock()
+
+    def _refill(self, now: float) -> None:
+        self.tokens = min(
+            float(self.burst), self.tokens + (now - self.updated_at) * self.rate
+        )
+        self.updated_at = now
+
+    def set_rate(self, rate: float) -> None:
+        """Change the refill rate of the bucket."""
+        with self._lock:
+            self._refill(time.monotonic())
+            self.rate = rate
+
+    def acquire(self) -> None:
+        """Take a token from the bucket, waiting until one is available."""
+        while True:
+            with self._lock:
+                self._refill(time.monotonic())
+                if self.tokens >= 1:
+                    self.tokens -= 1
+                    return
+                wait = (1 - self.tokens) / self.rate
+            time.sleep(wait)
+
+
+def parse_retry_after(value: Optional[str]) -> Optional[float]:
+    """Parse the value of a `Retry-After` header (a number of seconds or an
+    HTTP date) into a number of seconds, or None if it's missing or
+    invalid."""
+    if not value:
+        return None
+    try:
+        return max(0.0, float(value))
+    except ValueError:
+        pass
+    try:
+        retry_at = email.utils.parsedate_to_datetime(value)
+    except (TypeError, ValueError):
+        return None
+    return max(0.0, retry_at.timestamp() - time.time())
+
+
+class AdaptiveRateLimiter:
+    """An adaptive rate limiter of API requests, see the module docstring.
+
+    :param rates: the initial rate (in requests per second) of each
+        endpoint class, defaults to `DEFAULT_RATES`
+    :param max_rates: the maximum rate of each endpoint class, defaults to
+        the initial rates
+    :param min_rate: the minimum rate of all endpoint classes, defaults to
+        one request per minute
+    :param decrease_factor: the factor applied to the rate when a request is
+        throttled, defaults to 0.5
+    :param increase_step: the fraction of the maximum rate added to the rate
+        after each successful request, defaults to 0.01
+    :param latency_threshold: if provided, responses slower than this
+        threshold (in seconds) reduce the rate by `latency_decrease_factor`,
+        defaults to None
+    :param latency_decrease_factor: the factor applied to the rate on slow
+        responses, defaults to 0.9
+    :param max_retries: the maximum number of retries of a throttled
+        request, defaults to 5
+    :param base_delay: the base delay (in seconds) of the exponential
+        backoff, defaults to 1
+    :param max_delay: the maximum delay (in seconds) between two retries,
+        defaults to 60
+    """
+
+    def __init__(
+        self,
+        rates: Optional[Dict[EndpointClass, float]] = None,
+        max_rates: Optional[Dict[EndpointClass, float]] = None,
+        min_rate: float = 1 / 60,
+        decrease_factor: float = 0.5,
+        increase_step: float = 0.01,
+        latency_threshold: Optional[float] = None,
+        latency_decrease_factor: float = 0.9,
+        max_retries: int = 5,
+        base_delay: float = 1.0,
+        max_delay: float = 60.0,
+    ):
+        rates = {**DEFAULT_RATES, **(rates or {})}
+        self.max_rates = {**rates, **(max_rates or {})}
+        self.min_rate = min_rate
+        self.decrease_factor = decrease_factor
+        self.increase_step = increase_step
+        self.latency_threshold = latency_threshold
+        self.latency_decrease_factor = latency_decrease_factor
+        self.max_retries = max_retries
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self.buckets = {
+            endpoint_class: TokenBucket(rate) for endpoint_class, rate in rates.items()
+        }
+
+    def get_rate(self, endpoint_class: EndpointClass) -> float:
+        """Return the current rate of `endpoint_class`."""
+        return self.buckets[endpoint_class].rate
+
+    def _set_rate(self, endpoint_class: EndpointClass, rate: float) -> None:
+        rate = max(self.min_rate, min(self.max_rates[endpoint_class], rate))
+        self.buckets[endpoint_class].set_rate(rate)
+
+    def on_success(self, endpoint_class: EndpointClass, latency: float) -> None:
+        """Update the rate of `endpoint_class` after a successful request."""
+        rate = self.get_rate(endpoint_class)
+        if self.latency_threshold is not None and latency > self.latency_threshold:
+            self._set_rate(endpoint_class, rate * self.latency_decrease_factor)
+        else:
+            self._set_rate(
+                endpoint_class,
+                rate + self.max_rates[endpoint_class] * self.increase_step,
+            )
+
+    def on_throttled(self, endpoint_class: EndpointClass) -> None:
+        """Update the rate of `endpoint_class` after a throttled request."""
+        self._set_rate(
+            endpoint_class, self.get_rate(endpoint_class) * self.decrease_factor
+        )
+
+    def get_retry_delay(self, attempt: int, retry_after: Optional[float]) -> float:
+        """Return the delay (in seconds) before retrying a throttled request.
+
+        :param attempt: the number of the retry (starting at 0)
+        :param retry_after: the delay requested by the server (`Retry-After`
+            header), if any
+        """
+        if retry_after is not None:
+            return min(retry_after, self.max_delay)
+        delay = min(self.max_delay, self.base_delay * 2**attempt)
+        # "Equal jitter": wait between half and the full backoff delay
+        return delay / 2 + random.uniform(0, delay / 2)
+
+    def send(
+        self,
+        endpoint_class: EndpointClass,
+        send_request: Callable[[], requests.Response],
+    ) -> requests.Response:
+        """Send a request, waiting for the rate limit and retrying it if it's
+        throttled.
+
+        :param endpoint_class: the class of the requested endpoint
+        :param send_request: a function sending the request
+        :return: the response (the last one if all retries were throttled)
+        """
+        attempt = 0
+        while True:
+            self.buckets[endpoint_class].acquire()
+            start = time.monotonic()
+            r = send_request()
+            if r.status_code not in THROTTLED_STATUS_CODES:
+                self.on_success(endpoint_class, time.monotonic() - start)
+                return r
+
+            self.on_throttled(endpoint_class)
+            if attempt >= self.max_retries:
+                return r
+            # Release the connection of the throttled response
+            r.close()
+            time.sleep(
+                self.get_retry_delay(
+                    attempt, parse_retry_after(r.headers.get("Retry-After"))
+                )
+            )
+            attempt += 1
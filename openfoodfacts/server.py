@@ -0,0 +1,287 @@
+"""A local HTTP server exposing a subset of Product Opener read API, backed
+by a local copy of the products.
+
+It's useful for load tests, for latency-critical services that can work on
+a snapshot of the database, and as a network-free stand-in for tests:
+
+>>> store = DatasetProductStore(ProductDataset(dataset_path=path))
+>>> with LocalAPIServer(store) as server:
+...     api = API(user_agent="my-app", base_url=server.base_url)
+...     api.product.get("3017620422003")
+
+The following routes are supported:
+
+- `/api/v{0,1,2,3}/product/{code}`: get a product, with an optional
+  `fields` parameter
+- `/cgi/search.pl` and `/api/v2/search`: search products, with the `code`
+  (comma-separated barcodes), `search_terms`, `page`, `page_size` and
+  `fields` parameters. Searching by `search_terms` performs a full scan of
+  the store.
+"""
+
+import http.server
+import re
+import threading
+from typing import Dict, Iterable, Iterator, List, Optional, Tuple, Union, cast
+from urllib.parse import parse_qs, urlparse
+
+from .barcode import normalize_barcode
+from .dataset import ProductDataset
+from .types import JSONType
+from .utils import _open_binary, decode_json, dump_json_line, get_logger
+
+logger = get_logger(__name__)
+
+
+PRODUCT_ROUTE_REGEX = re.compile(r"^/api/v[0-3]/product/([^/]+?)(?:\.json)?/?$")
+SEARCH_ROUTES = ("/cgi/search.pl", "/api/v2/search")
+# Fields matched by the `search_terms` parameter
+SEARCH_TERMS_FIELDS = ("product_name", "generic_name", "brands")
+
+
+class InMemoryProductStore:
+    """A product store keeping all products in memory, indexed by
+    normalized barcode.
+
+    :param products: the products to store
+    """
+
+    def __init__(self, products: Iterable[JSONType]):
+        self.products: Dict[str, JSONType] = {}
+        for product in products:
+            code = product.get("code")
+            if code:
+                self.products[normalize_barcode(code)] = product
+
+    def get(self, code: str) -> Optional[JSONType]:
+        """Return the product with barcode `code`, or None if not found."""
+        return self.products.get(normalize_barcode(code))
+
+    def iter_products(self) -> Iterator[JSONType]:
+        """Iterate over all products of the store."""
+        return iter(self.products.values())
+
+
+class DatasetProductStore:
+    """A product store backed by a JSONL dataset file.
+
+    An index mapping each (normalized) barcode to the offset of the product
+    in the file is built in memory when the store is created, products are
+    then read from disk on lookup.
+
+    The dataset must be seekable: plain JSONL files (.jsonl) and zstd files
+    generated by `openfoodfacts.dataset.recompress_dataset` (.jsonl.zst) are
+    supported, gzipped files are not.
+
+    :param dataset: the JSONL dataset
+    """
+
+    def __init__(self, dataset: ProductDataset):
+        if dataset.dataset_path.suffix == ".gz":
+            raise ValueError(
+                "gzipped datasets are not seekable, use a plain JSONL file or "
+                "a zstd file (see `recompress_dataset`)"
+            )
+        self.dataset = dataset
+        self.offsets: Dict[str, int] = {}
+        for line, cursor in dataset._iter_lines():
+            product = self._loads(line)
+            if product is not None and product.get("code"):
+                offset = cursor.offset - len(line)
+                self.offsets[normalize_barcode(product["code"])] = offset
+        self._lock = threading.Lock()
+        self._file_context = _open_binary(dataset.dataset_path)
+        _, self._stream = self._file_context.__enter__()
+
+    @staticmethod
+    def _loads(line: bytes) -> Optional[JSONType]:
+        line = line.rstrip(b"\n")
+        if not line:
+            return None
+        return decode_json(line)
+
+    def get(self, code: str) -> Optional[JSONType]:
+        """Return the product with barcode `code`, or None if not found."""
+        offset = self.offsets.get(normalize_barcode(code))
+        if offset is None:
+            return None
+        with self._lock:
+            self._stream.seek(offset)
+            line = self._stream.readline()
+        return self._loads(line)
+
+    def iter_products(self) -> Iterator[JSONType]:
+        """Iterate over all products of the store."""
+        return iter(self.dataset)
+
+    def close(self) -> None:
+        self._file_context.__exit__(None, None, None)
+
+
+ProductStore = Union[InMemoryProductStore, DatasetProductStore]
+
+
+def _select_fields(product: JSONType, fields: Optional[List[str]]) -> JSONType:
+    if not fields:
+        return product
+    return {field: product[field] for field in fields if field in product}
+
+
+def _get_fields(params: Dict[str, List[str]]) -> Optional[List[str]]:
+    if "fields" not in params:
+        return None
+    return [
+        field
+        for value in params["fields"]
+        for field in value.split(",")
+        if field.strip()
+    ]
+
+
+class _RequestHandler(http.server.BaseHTTPRequestHandler):
+    # set by `LocalAPIServer`
+    store: ProductStore
+
+    def log_message(self, format, *args):
+        logger.debug(format, *args)
+
+    def do_GET(self):
+        url = urlparse(self.path)
+        params = parse_qs(url.query)
+        match = PRODUCT_ROUTE_REGEX.match(url.path)
+        if match is not None:
+            status_code, response = self.get_product(match.group(1), params)
+        elif url.path in SEARCH_ROUTES:
+            status_code, response = self.search(params)
+        else:
+            status_code, response = 404, {"status": 0, "status_verbose": "not found"}
+
+        body = dump_json_line(response)
+        self.send_response(status_code)
+        self.send_header("Content-Type", "application/json; charset=utf-8")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def get_product(
+        self, code: str, params: Dict[str, List[str]]
+    ) -> Tuple[int, JSONType]:
+        product = self.store.get(code)
+        if product is None:
+            return 404, {
+                "code": code,
+                "status": 0,
+                "status_verbose": "product not found",
+            }
+        return 200, {
+            "code": code,
+            "product": _select_fields(product, _get_fields(params)),
+            "status": 1,
+            "status_verbose": "product found",
+        }
+
+    def search(self, params: Dict[str, List[str]]) -> Tuple[int, JSONType]:
+        try:
+            page = int(params.get("page", ["1"])[0])
+            page_size = int(params.get("page_size", ["24"])[0])
+        except ValueError:
+            return 400, {"status": 0, "status_verbose": "invalid page"}
+        page = max(page, 1)
+        page_size = max(page_size, 1)
+        fields = _get_fields(params)
+
+        products: Iterable[JSONType]
+        if "code" in params:
+            codes = [
+                code for value in params["code"] for code in value.split(",") if code
+            ]
+            products = (
+                product
+                for product in (self.store.get(code) for code in codes)
+                if product is not None
+            )
+        else:
+            products = self.store.iter_products()
+
+        search_terms = params.get("search_terms", [""])[0].lower().split()
+        if search_terms:
+            products = (
+                product
+                for product in products
+                if all(
+                    term
+                    in " ".join(
+                        str(product.get(field) or "") for field in SEARCH_TERMS_FIELDS
+                    ).lower()
+                    for term in search_terms
+                )
+            )
+
+        count = 0
+        skip = (page - 1) * page_size
+        selected = []
+        for product in products:
+            if skip <= count < skip + page_size:
+                selected.append(_select_fields(product, fields))
+            count += 1
+
+        return 200, {
+            "count": count,
+            "page": page,
+            "page_count": len(selected),
+            "page_size": page_size,
+            "skip": skip,
+            "products": selected,
+        }
+
+
+class LocalAPIServer:
+    """An embeddable HTTP server answering Product Opener read requests from
+    a local product store.
+
+    The server runs in a background thread, each request being handled in
+    its own thread.
+
+    :param store: the product store, either a `InMemoryProductStore` or a
+        `DatasetProductStore`
+    :param host: the host to bind to, defaults to 127.0.0.1
+    :param port: the port to bind to, defaults to 0 (a free port is chosen,
+        see `base_url`)
+    """
+
+    def __init__(
+        self,
+        store: ProductStore,
+        host: str = "127.0.0.1",
+        port: int = 0,
+    ):
+        handler_cls = type("RequestHandler", (_RequestHandler,), {"store": store})
+        self.httpd = http.server.ThreadingHTTPServer((host, port), handler_cls)
+        self._thread: Optional[threading.Thread] = None
+
+    @property
+    def base_url(self) -> str:
+        """The base URL of the server, to pass to `API(base_url=...)`."""
+        host, port = self.httpd.server_address[:2]
+        return f"http://{cast(str, host)}:{port}"
+
+    def start(self) -> None:
+        """Start serving requests in a background thread."""
+        self._thread = threading.Thread(
+            target=self.httpd.serve_forever, name="local-api-server", daemon=True
+        )
+        self._thread.start()
+
+    def stop(self) -> None:
+        """Stop the server."""
+        self.httpd.shutdown()
+        self.httpd.server_close()
+        if self._thread is not None:
+            self._thread.join()
+
+    def __enter__(self) -> "LocalAPIServer":
+        self.start()
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback) -> None:
+        self.stop()
@@ -1,11 +1,27 @@
+import collections
+import dataclasses
 from pathlib import Path
-from typing import Any, Dict, Iterable, List, Optional, Set, Union
+from typing import (
+    TYPE_CHECKING,
+    Any,
+    Callable,
+    Counter,
+    Dict,
+    FrozenSet,
+    Iterable,
+    List,
+    Optional,
+    Set,
+    Tuple,
+    Union,
+)
 
 import requests
 
 from .types import Environment, Flavor, JSONType, TaxonomyType
 from .utils import (
     URLBuilder,
+    decode_json,
     download_file,
     get_logger,
     http_session,
@@ -13,6 +29,9 @@ from .utils import (
     should_download_file,
 )
 
+if TYPE_CHECKING:
+    from .dataset import ProductDataset
+
 logger = get_logger(__name__)
 
 
@@ -200,6 +219,8 @@ class Taxonomy:
 
     def __init__(self) -> None:
         self.nodes: Dict[str, TaxonomyNode] = {}
+        # Cache of the ancestors of each node, see `get_ancestor_ids`
+        self._ancestors: Dict[str, Tuple[str, ...]] = {}
 
     def add(self, key: str, node: TaxonomyNode) -> None:
         """Add a node to the taxonomy under the id `key`.
@@ -208,6 +229,7 @@ class Taxonomy:
         :param node: the TaxonomyNode
         """
         self.nodes[key] = node
+        self._ancestors.clear()
 
     def __contains__(self, item: str):
         """Return True if `item` (a taxonomy id) is in the taxonomy, False
@@ -279,6 +301,62 @@ class Taxonomy:
 
         return node.is_parent_of_any(to_check_nodes)
 
+    def get_ancestor_ids(self, item: str) -> Tuple[str, ...]:
+        """Return the IDs of all parents (direct and indirect) of `item`.
+
+        Unlike `TaxonomyNode.get_parents_hierarchy`, results are memoized:
+        the ancestors of a node are computed once from the ancestors of its
+        parents. If `item` is not in the taxonomy, an empty tuple is
+        returned.
+
+        :param item: the taxonomy ID
+        :return: the ancestor IDs, direct parents first
+        """
+        ancestors = self._ancestors.get(item)
+        if ancestors is not None:
+            return ancestors
+
+        node = self.nodes.get(item)
+        if node is None:
+            return ()
+
+        # Mark the node as being processed, to stop on cycles
+        self._ancestors[item] = ()
+        seen: Dict[str, None] = {}
+        for parent in node.parents:
+            seen[parent.id] = None
+        for parent in node.parents:
+            for ancestor_id in self.get_ancestor_ids(parent.id):
+                if ancestor_id != item:
+                    seen[ancestor_id] = None
+        ancestors = tuple(seen)
+        self._ancestors[item] = ancestors
+        return ancestors
+
+    def get_closure(self) -> Dict[str, Tuple[str, ...]]:
+        """Return a dict mapping each node ID to its ancestor IDs (see
+        `get_ancestor_ids`)."""
+        return {key: self.get_ancestor_ids(key) for key in self.nodes}
+
+    def expand_tags(self, tag_lists: Iterable[List[str]]) -> List[List[str]]:
+        """Expand lists of tags with all their ancestors.
+
+        It's the batch version of `TaxonomyNode.get_parents_hierarchy`,
+        typically used to compute the full hierarchy of the tags of each
+        product (ex: `categories_tags`).
+
+        For each list, the tags are returned first (in the same order)
+        followed by the ancestors that are not already in the list, without
+        duplicates. Tags that are not in the taxonomy are kept, without
+        ancestors.
+
+        :param tag_lists: an iterable of tag lists
+        :return: the expanded tag lists
+        """
+        return [
+            expand_tags_with_closure(tags, self.get_ancestor_ids) for tags in tag_lists
+        ]
+
     def get_localized_name(self, key: str, lang: str) -> str:
         """Return the name of a taxonomy element in a given language.
 
@@ -355,7 +433,7 @@ class Taxonomy:
         """
         session = http_session if session is None else session
         r = session.get(url, timeout=timeout)
-        data = r.json()
+        data = decode_json(r.content)
         return cls.from_dict(data)
 
     @classmethod
@@ -370,6 +448,59 @@ class Taxonomy:
         return cls.from_url(url)
 
 
+def expand_tags_with_closure(
+    tags: Iterable[str], get_ancestors: Callable[[str], Iterable[str]]
+) -> List[str]:
+    """Return `tags` followed by all their ancestors, without duplicates.
+
+    :param tags: the tags to expand
+    :param get_ancestors: a function returning the ancestors of a tag
+    """
+    expanded: Dict[str, None] = dict.fromkeys(tags)
+    for tag in list(expanded):
+        for ancestor in get_ancestors(tag):
+            expanded[ancestor] = None
+    return list(expanded)
+
+
+class TaxonomyEnricher:
+    """Add the full hierarchy of a tag field to products.
+
+    Only the ancestor closure of the taxonomy (a plain dict) is kept, so
+    that instances are cheap to send to worker processes, see
+    `ProductDataset.map`:
+
+    >>> taxonomy = get_taxonomy("category")
+    >>> enricher = TaxonomyEnricher(taxonomy, "categories_tags")
+    >>> for product in dataset.map(enricher, max_workers=8):
+    ...     product["categories_tags_hierarchy"]
+
+    :param taxonomy: the taxonomy of the field
+    :param field: the product field containing the tags (ex:
+        `categories_tags`)
+    :param output_field: the product field where the expanded tags are
+        stored, defaults to `{field}_hierarchy`
+    """
+
+    def __init__(
+        self, taxonomy: Taxonomy, field: str, output_field: Optional[str] = None
+    ):
+        self.closure = taxonomy.get_closure()
+        self.field = field
+        self.output_field = (
+            f"{field}_hierarchy" if output_field is None else output_field
+        )
+
+    def _get_ancestors(self, tag: str) -> Tuple[str, ...]:
+        return self.closure.get(tag, ())
+
+    def __call__(self, product: JSONType) -> JSONType:
+        product[self.output_field] = expand_tags_with_closure(
+            product.get(self.field) or [], self._get_ancestors
+        )
+        return product
+
+
 def get_taxonomy(
     taxonomy_type: Union[TaxonomyType, str],
     force_download: bool = False,
@@ -403,3 +534,181 @@ def get_taxonomy(
     logger.info("Downloading taxonomy, saving it in %s", taxonomy_path)
     download_file(url, taxonomy_path)
     return Taxonomy.from_path(taxonomy_path)
+
+
+# Product fields containing the tags of each taxonomy, used to check the
+# taxonomy coverage of products. The brand taxonomy only contains a few
+# brands, and the language field contains non-taxonomized tags, so they are
+# not included.
+TAXONOMY_TAG_FIELDS = {
+    TaxonomyType.category: "categories_tags",
+    TaxonomyType.ingredient: "ingredients_tags",
+    TaxonomyType.label: "labels_tags",
+    TaxonomyType.packaging_shape: "packaging_shapes_tags",
+    TaxonomyType.packaging_material: "packaging_materials_tags",
+    TaxonomyType.packaging_recycling: "packaging_recycling_tags",
+    TaxonomyType.country: "countries_tags",
+    TaxonomyType.additive: "additives_tags",
+    TaxonomyType.vitamin: "vitamins_tags",
+    TaxonomyType.mineral: "minerals_tags",
+    TaxonomyType.amino_acid: "amino_acids_tags",
+    TaxonomyType.nucleotide: "nucleotides_tags",
+    TaxonomyType.allergen: "allergens_tags",
+    TaxonomyType.state: "states_tags",
+    TaxonomyType.origin: "origins_tags",
+    TaxonomyType.other_nutritional_substance: "other_nutritional_substances_tags",
+}
+
+
+@dataclasses.dataclass
+class ProductUnknownTags:
+    """The tags of a product that are not in the taxonomies.
+
+    :param code: the product barcode
+    :param unknown_tags: a dict mapping the product field (ex:
+        `categories_tags`) to the unknown tags of the field, only fields with
+        at least one unknown tag are present
+    :param checked_tags: a dict mapping the product field to the number of
+        tags checked in the field
+    """
+
+    code: Optional[str]
+    unknown_tags: Dict[str, List[str]]
+    checked_tags: Dict[str, int]
+
+
+class TaxonomyCoverageChecker:
+    """Find the tags of a product that are unknown to the taxonomies.
+
+    Only the IDs of the taxonomy nodes are kept, so that instances are cheap
+    to send to worker processes, see `ProductDataset.map` and
+    `scan_taxonomy_coverage`.
+
+    :param taxonomies: a dict mapping the taxonomy type to the taxonomy. The
+        product field checked for each taxonomy is given by
+        `TAXONOMY_TAG_FIELDS`.
+    """
+
+    def __init__(self, taxonomies: Dict[TaxonomyType, Taxonomy]):
+        self.known_ids: Dict[str, FrozenSet[str]] = {}
+        for taxonomy_type, taxonomy in taxonomies.items():
+            taxonomy_type = TaxonomyType[taxonomy_type]
+            if taxonomy_type not in TAXONOMY_TAG_FIELDS:
+                raise ValueError(
+                    f"no product field is known for taxonomy {taxonomy_type.name}"
+                )
+            self.known_ids[TAXONOMY_TAG_FIELDS[taxonomy_type]] = frozenset(
+                taxonomy.keys()
+            )
+
+    @classmethod
+    def from_types(
+        cls,
+        taxonomy_types: Optional[Iterable[Union[TaxonomyType, str]]] = None,
+        cache_dir: Optional[Path] = None,
+    ) -> "TaxonomyCoverageChecker":
+        """Create a checker from taxonomy types, the taxonomies are
+        downloaded if needed (see `get_taxonomy`).
+
+        :param taxonomy_types: the taxonomies to check, defaults to all
+            taxonomies of `TAXONOMY_TAG_FIELDS`
+        :param cache_dir: the taxonomy cache directory, see `get_taxonomy`
+        """
+        if taxonomy_types is None:
+            taxonomy_types = TAXONOMY_TAG_FIELDS.keys()
+        return cls(
+            {
+                TaxonomyType[taxonomy_type]: get_taxonomy(
+                    taxonomy_type, cache_dir=cache_dir
+                )
+                for taxonomy_type in taxonomy_types
+            }
+        )
+
+    def __call__(self, product: JSONType) -> ProductUnknownTags:
+        unknown_tags = {}
+        checked_tags = {}
+        for field, known_ids in self.known_ids.items():
+            tags = product.get(field) or []
+            checked_tags[field] = len(tags)
+            unknown = [tag for tag in tags if tag not in known_ids]
+            if unknown:
+                unknown_tags[field] = unknown
+        return ProductUnknownTags(
+            code=product.get("code"),
+            unknown_tags=unknown_tags,
+            checked_tags=checked_tags,
+        )
+
+
+@dataclasses.dataclass
+class TaxonomyCoverageReport:
+    """Aggregated unknown tag statistics, see `scan_taxonomy_coverage`.
+
+    :param product_count: the number of products checked
+    :param products_with_unknown_tags: the number of products with at least
+        one unknown tag, per field
+    :param checked_tags: the number of tags checked, per field
+    :param unknown_tags: the number of occurrences of each unknown tag, per
+        field
+    """
+
+    product_count: int = 0
+    products_with_unknown_tags: Counter[str] = dataclasses.field(
+        default_factory=collections.Counter
+    )
+    checked_tags: Counter[str] = dataclasses.field(default_factory=collections.Counter)
+    unknown_tags: Dict[str, Counter[str]] = dataclasses.field(
+        default_factory=lambda: collections.defaultdict(collections.Counter)
+    )
+
+    def add(self, result: ProductUnknownTags) -> None:
+        """Add the result of a product to the report."""
+        self.product_count += 1
+        self.checked_tags.update(result.checked_tags)
+        for field, tags in result.unknown_tags.items():
+            self.products_with_unknown_tags[field] += 1
+            self.unknown_tags[field].update(tags)
+
+    def get_unknown_ratio(self, field: str) -> float:
+        """Return the ratio of unknown tags among the checked tags of
+        `field`."""
+        checked = self.checked_tags[field]
+        if not checked:
+            return 0.0
+        return sum(self.unknown_tags.get(field, {}).values()) / checked
+
+
+def scan_taxonomy_coverage(
+    dataset: "ProductDataset",
+    taxonomy_types: Optional[Iterable[Union[TaxonomyType, str]]] = None,
+    max_workers: Optional[int] = None,
+    batch_size: int = 1000,
+    cache_dir: Optional[Path] = None,
+    callback: Optional[Callable[[ProductUnknownTags], None]] = None,
+) -> TaxonomyCoverageReport:
+    """Check the tags of all products of a dataset against the taxonomies,
+    in parallel worker processes.
+
+    The taxonomies are loaded once in the main process, and only their node
+    IDs are sent (once) to each worker.
+
+    :param dataset: the dataset to scan
+    :param taxonomy_types: the taxonomies to check, defaults to all
+        taxonomies of `TAXONOMY_TAG_FIELDS`
+    :param max_workers: the number of worker processes, defaults to the
+        number of CPUs
+    :param batch_size: the number of products sent at once to a worker,
+        defaults to 1000
+    :param cache_dir: the taxonomy cache directory, see `get_taxonomy`
+    :param callback: a function called with the result of each product
+        having at least one unknown tag, defaults to None
+    :return: the aggregated report
+    """
+    checker = TaxonomyCoverageChecker.from_types(taxonomy_types, cache_dir)
+    report = TaxonomyCoverageReport()
+    for result in dataset.map(checker, max_workers=max_workers, batch_size=batch_size):
+        report.add(result)
+        if callback is not None and result.unknown_tags:
+            callback(result)
+    return report
@@ -1,7 +1,13 @@
 import enum
-from typing import Any, Dict, Optional, Union
+from typing import TYPE_CHECKING, Any, Dict, Optional, Union
 
-from pydantic import BaseModel, model_validator
+from pydantic import BaseModel, PrivateAttr, model_validator
+
+if TYPE_CHECKING:
+    import requests
+
+    from .cache import ResponseCache
+    from .ratelimit import AdaptiveRateLimiter
 
 #: A precise expectation of what mappings looks like in json.
 #: (dict where keys are always of type `str`).
@@ -843,6 +849,27 @@ class APIConfig(BaseModel):
     password: Optional[str] = None
     session_cookie: Optional[str] = None
     timeout: float = 10.0
+    # Base URL of Product Opener, overrides the URL derived from the flavor,
+    # environment and country (ex: to use a `LocalAPIServer`)
+    base_url: Optional[str] = None
+    # Timeout for establishing connections, `timeout` is used if None
+    connect_timeout: Optional[float] = None
+    # Connection pool and retry settings of the session created by `API`, see
+    # `openfoodfacts.utils.create_http_session`
+    pool_connections: int = 10
+    pool_maxsize: int = 10
+    max_retries: int = 0
+
+    # Runtime state attached by `API`, kept out of the validated and
+    # serialized fields:
+    # - the cache of GET responses, see `openfoodfacts.cache.ResponseCache`
+    # - the client-side rate limiter, see
+    #   `openfoodfacts.ratelimit.AdaptiveRateLimiter`
+    # - the requests session used by the API resources, the global
+    #   `openfoodfacts.utils.http_session` is used if None
+    _cache: Optional["ResponseCache"] = PrivateAttr(default=None)
+    _rate_limiter: Optional["AdaptiveRateLimiter"] = PrivateAttr(default=None)
+    _session: Optional["requests.Session"] = PrivateAttr(default=None)
 
     @model_validator(mode="after")
     def check_credentials(self):
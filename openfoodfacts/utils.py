@@ -1,17 +1,41 @@
+import bisect
+import collections
+import concurrent.futures
+import contextlib
 import dataclasses
 import gzip
+import io
 import json
 import logging
+import os
+import re
 import shutil
+import struct
 import time
 from io import BytesIO
 from pathlib import Path
-from typing import Callable, Dict, Iterable, List, Optional, Union
+from typing import (
+    Any,
+    BinaryIO,
+    Callable,
+    Collection,
+    Deque,
+    Dict,
+    Iterable,
+    Iterator,
+    List,
+    Optional,
+    Tuple,
+    Union,
+    cast,
+)
 
 import requests
 import tqdm
+from requests.adapters import HTTPAdapter
+from urllib3.util import Retry
 
-from .types import COUNTRY_CODE_TO_NAME, Country, Environment, Flavor
+from .types import COUNTRY_CODE_TO_NAME, Country, Environment, Flavor, JSONType
 
 _orjson_available = True
 try:
@@ -19,6 +43,12 @@ try:
 except ImportError:
     _orjson_available = False
 
+_zstandard_available = True
+try:
+    import zstandard
+except ImportError:
+    _zstandard_available = False
+
 _pillow_available = True
 try:
     import PIL
@@ -26,8 +56,64 @@ try:
 except ImportError:
     _pillow_available = False
 
+HTTP_HEADERS = {"User-Agent": "openfoodfacts-python"}
+
 http_session = requests.Session()
-http_session.headers.update({"User-Agent": "openfoodfacts-python"})
+http_session.headers.update(HTTP_HEADERS)
+
+# Status codes of the responses retried by sessions created with
+# `create_http_session`
+RETRY_STATUS_CODES = (429, 500, 502, 503, 504)
+
+
+def create_http_session(
+    pool_connections: int = 10,
+    pool_maxsize: int = 10,
+    max_retries: int = 0,
+    backoff_factor: float = 0.5,
+    retry_status_codes: Collection[int] = RETRY_STATUS_CODES,
+) -> requests.Session:
+    """Create a requests session with a configured connection pool.
+
+    :param pool_connections: the number of hosts whose connection pool is
+        kept, defaults to 10
+    :param pool_maxsize: the maximum number of connections kept per host,
+        that should be at least the number of threads sharing the session,
+        defaults to 10
+    :param max_retries: the number of times idempotent requests (GET, HEAD,
+        PUT, DELETE,...) are retried on connection errors and on the status
+        codes of `retry_status_codes`, with an exponential backoff. The
+        `Retry-After` header is honored. Read timeouts are never retried and
+        raise `requests.Timeout`. Defaults to 0 (no retry).
+    :param backoff_factor: the backoff factor of the retries, see
+        `urllib3.util.Retry`, defaults to 0.5
+    :param retry_status_codes: the status codes of the retried responses,
+        defaults to `RETRY_STATUS_CODES`
+    :return: the session
+    """
+    session = requests.Session()
+    session.headers.update(HTTP_HEADERS)
+    adapter = HTTPAdapter(
+        pool_connections=pool_connections,
+        pool_maxsize=pool_maxsize,
+        max_retries=Retry(
+            total=max_retries,
+            # A read timeout means the server may have processed the request:
+            # let it propagate as `requests.Timeout` instead of retrying it
+            read=False,
+            backoff_factor=backoff_factor,
+            status_forcelist=retry_status_codes,
+            # urllib3 also retries the 429/503 responses with a Retry-After
+            # header that are not in `status_forcelist`
+            respect_retry_after_header=all(
+                status_code in retry_status_codes for status_code in (429, 503)
+            ),
+            raise_on_status=False,
+        ),
+    )
+    session.mount("http://", adapter)
+    session.mount("https://", adapter)
+    return session
 
 
 def configure_root_logger(
@@ -124,23 +210,209 @@ class URLBuilder:
         )
 
 
-def jsonl_iter(jsonl_path: Union[str, Path]) -> Iterable[Dict]:
+@contextlib.contextmanager
+def _open_binary(dataset_path: Path) -> Iterator[Tuple[BinaryIO, BinaryIO]]:
+    """Open a dataset file in binary mode.
+
+    Yield a (raw, stream) tuple, where `raw` is the file object of the file
+    as stored on disk and `stream` the (decompressed) file object to read
+    data from. For uncompressed files, `raw` and `stream` are the same
+    object.
+    """
+    if dataset_path.suffix == ".zst":
+        with ZstdSeekableReader(dataset_path) as reader:
+            with io.BufferedReader(reader) as stream:
+                yield reader.fp, stream  # type: ignore
+        return
+
+    with dataset_path.open("rb") as raw:
+        if dataset_path.suffix == ".gz":
+            with gzip.GzipFile(fileobj=raw, mode="rb") as stream:
+                yield raw, stream  # type: ignore
+        else:
+            yield raw, raw
+
+
+@dataclasses.dataclass
+class IterationStatsSnapshot:
+    """A snapshot of `IterationStats`.
+
+    :param elapsed: the time (in seconds) since the start of the iteration
+    :param compressed_bytes: the number of bytes read from disk, or None if
+        the file is not compressed
+    :param uncompressed_bytes: the number of (uncompressed) bytes read
+    :param lines: the number of decoded lines
+    :param read_time: the time (in seconds) spent reading and decompressing
+        data
+    :param decode_time: the time (in seconds) spent decoding lines
+    :param consumer_time: the time (in seconds) spent waiting for the
+        consumer of the iterator to ask for the next item
+    """
+
+    elapsed: float
+    compressed_bytes: Optional[int]
+    uncompressed_bytes: int
+    lines: int
+    read_time: float
+    decode_time: float
+    consumer_time: float
+
+    @property
+    def lines_per_second(self) -> float:
+        return self.lines / self.elapsed if self.elapsed else 0.0
+
+    @property
+    def uncompressed_bytes_per_second(self) -> float:
+        return self.uncompressed_bytes / self.elapsed if self.elapsed else 0.0
+
+    def to_dict(self) -> JSONType:
+        return {
+            **dataclasses.asdict(self),
+            "lines_per_second": self.lines_per_second,
+            "uncompressed_bytes_per_second": self.uncompressed_bytes_per_second,
+        }
+
+
+class IterationStats:
+    """Throughput statistics of an iteration over a dataset.
+
+    Pass an instance to `jsonl_iter` or `ProductDataset` to collect the
+    statistics, and call `snapshot` (from any thread) to get the current
+    values. Comparing `read_time`, `decode_time` and `consumer_time` tells
+    whether the iteration is bound by I/O and decompression, by JSON
+    decoding or by the code processing the items.
+
+    :param callback: a function called with a `IterationStatsSnapshot`
+        every `report_every` seconds during the iteration (and once at the
+        end), defaults to None
+    :param report_every: the interval (in seconds) between two calls of
+        `callback`, defaults to 10 seconds
+    """
+
+    def __init__(
+        self,
+        callback: Optional[Callable[[IterationStatsSnapshot], None]] = None,
+        report_every: float = 10.0,
+    ):
+        self.callback = callback
+        self.report_every = report_every
+        self.compressed_bytes: Optional[int] = None
+        self.uncompressed_bytes = 0
+        self.lines = 0
+        self.read_time = 0.0
+        self.decode_time = 0.0
+        self.consumer_time = 0.0
+        self.start_time: Optional[float] = None
+        self._last_report_time = 0.0
+
+    def start(self) -> None:
+        """Mark the start of the iteration, called by the iterator.
+
+        When the same object is used for several iterations, statistics are
+        accumulated and the start time is the start of the first
+        iteration.
+        """
+        if self.start_time is None:
+            self.start_time = self._last_report_time = time.perf_counter()
+
+    def maybe_report(self, now: float) -> None:
+        """Call `callback` if `report_every` seconds elapsed since the last
+        call."""
+        if self.callback is not None and now - self._last_report_time >= (
+            self.report_every
+        ):
+            self._last_report_time = now
+            self.callback(self.snapshot())
+
+    def finish(self) -> None:
+        """Mark the end of the iteration, called by the iterator."""
+        if self.callback is not None:
+            self.callback(self.snapshot())
+
+    def snapshot(self) -> IterationStatsSnapshot:
+        """Return the current statistics."""
+        return IterationStatsSnapshot(
+            elapsed=(
+                0.0
+                if self.start_time is None
+                else time.perf_counter() - self.start_time
+            ),
+            compressed_bytes=self.compressed_bytes,
+            uncompressed_bytes=self.uncompressed_bytes,
+            lines=self.lines,
+            read_time=self.read_time,
+            decode_time=self.decode_time,
+            consumer_time=self.consumer_time,
+        )
+
+
+def jsonl_iter(
+    jsonl_path: Union[str, Path], stats: Optional[IterationStats] = None
+) -> Iterable[Dict]:
     """Iterate over elements of a JSONL file.
 
-    :param jsonl_path: the path of the JSONL file. Both plain (.jsonl) and
-        gzipped (jsonl.gz) files are supported.
+    :param jsonl_path: the path of the JSONL file. Plain (.jsonl), gzipped
+        (.jsonl.gz) and zstd-compressed (.jsonl.zst) files are supported.
+    :param stats: if provided, the throughput statistics of the iteration
+        are collected in this object, defaults to None
     :yield: dict contained in the JSONL file
     """
+    if stats is not None:
+        yield from _jsonl_iter_with_stats(Path(jsonl_path), stats)
+        return
+
     open_fn = get_open_fn(jsonl_path)
 
     with open_fn(str(jsonl_path), "rt", encoding="utf-8") as f:
         yield from jsonl_iter_fp(f)
 
 
+def _jsonl_iter_with_stats(jsonl_path: Path, stats: IterationStats) -> Iterable[Dict]:
+    perf_counter = time.perf_counter
+    with _open_binary(jsonl_path) as (raw, stream):
+        compressed = raw is not stream
+        compressed_offset = 0
+        stats.start()
+        try:
+            lines = iter(stream)
+            while True:
+                start = perf_counter()
+                line = next(lines, None)
+                read_end = perf_counter()
+                stats.read_time += read_end - start
+                if line is None:
+                    break
+                stats.uncompressed_bytes += len(line)
+                if compressed:
+                    new_compressed_offset = raw.tell()
+                    stats.compressed_bytes = (stats.compressed_bytes or 0) + (
+                        new_compressed_offset - compressed_offset
+                    )
+                    compressed_offset = new_compressed_offset
+                line = line.rstrip(b"\n")
+                if not line:
+                    continue
+                item = decode_json(line)
+                decode_end = perf_counter()
+                stats.decode_time += decode_end - read_end
+                stats.lines += 1
+                yield item
+                now = perf_counter()
+                stats.consumer_time += now - decode_end
+                stats.maybe_report(now)
+        finally:
+            # Also called if the caller stops the iteration early
+            stats.finish()
+
+
 def get_open_fn(filepath: Union[str, Path]) -> Callable:
     filepath = str(filepath)
     if filepath.endswith(".gz"):
         return gzip.open
+    elif filepath.endswith(".zst"):
+        if not _zstandard_available:
+            raise ImportError("zstandard is required to read .zst files")
+        return zstandard.open
     else:
         return open
 
@@ -149,10 +421,443 @@ def jsonl_iter_fp(fp) -> Iterable[Dict]:
     for line in fp:
         line = line.strip("\n")
         if line:
-            if _orjson_available:
-                yield orjson.loads(line)
-            else:
-                yield json.loads(line)
+            yield decode_json(line)
+
+
+def dump_json_line(item: Any) -> bytes:
+    """Serialize `item` as a JSONL line (with a trailing newline).
+
+    orjson is used if available.
+    """
+    if _orjson_available:
+        return orjson.dumps(item) + b"\n"
+    return json.dumps(item, ensure_ascii=False).encode("utf-8") + b"\n"
+
+
+# Magic numbers of the zstd seekable format, see
+# https://github.com/facebook/zstd/blob/dev/contrib/seekable_format/zstd_seekable_compression_format.md
+_ZSTD_SKIPPABLE_MAGIC_NUMBER = 0x184D2A5E
+_ZSTD_SEEKABLE_MAGIC_NUMBER = 0x8F92EAB1
+
+
+def _compress_block(codec: str, block: bytes, compresslevel: int) -> bytes:
+    if codec == "gzip":
+        return gzip.compress(block, compresslevel, mtime=0)
+    # ZstdCompressor instances are not thread-safe, we create one per block
+    return zstandard.ZstdCompressor(level=compresslevel).compress(block)
+
+
+class JSONLWriter:
+    """Write items to a JSONL file, plain (.jsonl), gzipped (.jsonl.gz) or
+    zstd-compressed (.jsonl.zst).
+
+    For compressed files, lines are grouped in blocks of `block_size` bytes
+    and each block is compressed independently in a thread pool (as pigz
+    does): zlib and zstd release the GIL, so blocks are compressed in
+    parallel while the main thread serializes the next items.
+
+    For gzip, each block is a gzip member: the concatenation of gzip
+    members is a valid gzip file, that can be read with `jsonl_iter` or
+    `ProductDataset`. For zstd, each block is a zstd frame and a seek table
+    is appended at the end of the file (zstd seekable format), so that
+    `ZstdSeekableReader` can seek without decompressing the whole file.
+    zstd support requires the `zstandard` package.
+
+    The file is written in a temporary file, that is renamed to `path` when
+    the writer is closed. If an exception is raised in the `with` block, the
+    temporary file is deleted.
+
+    :param path: the output path
+    :param compresslevel: the compression level, defaults to 6 for gzip and
+        3 for zstd
+    :param block_size: the size (in bytes, before compression) of a block,
+        defaults to 4 MiB
+    :param executor: the executor to use to compress blocks, defaults to
+        None (a thread pool is created and shut down on close). An executor
+        can be shared between several writers.
+    :param max_workers: the number of compression threads, used only if
+        `executor` is None, defaults to the number of CPUs
+    """
+
+    def __init__(
+        self,
+        path: Union[str, Path],
+        compresslevel: Optional[int] = None,
+        block_size: int = 4 * 1024 * 1024,
+        executor: Optional[concurrent.futures.Executor] = None,
+        max_workers: Optional[int] = None,
+    ):
+        self.path = Path(path)
+        self.codec: Optional[str] = None
+        if self.path.suffix == ".gz":
+            self.codec = "gzip"
+        elif self.path.suffix == ".zst":
+            if not _zstandard_available:
+                raise ImportError("zstandard is required to write .zst files")
+            self.codec = "zstd"
+        if compresslevel is None:
+            compresslevel = 3 if self.codec == "zstd" else 6
+        self.compresslevel = compresslevel
+        self.block_size = block_size
+        self.count = 0
+        self._tmp_path = self.path.with_name(self.path.name + ".part")
+        self._fp = self._tmp_path.open("wb")
+        self._buffer: List[bytes] = []
+        self._buffer_size = 0
+        # (future, uncompressed size) of the blocks being compressed
+        self._pending: Deque[Tuple[concurrent.futures.Future, int]] = (
+            collections.deque()
+        )
+        # (compressed size, uncompressed size) of the written zstd frames
+        self._frames: List[Tuple[int, int]] = []
+        max_workers = max_workers or os.cpu_count() or 1
+        # Bound the number of blocks in memory
+        self._max_pending = 2 * max_workers
+        self._own_executor = executor is None and self.codec is not None
+        self._executor = executor
+        if self._own_executor:
+            self._executor = concurrent.futures.ThreadPoolExecutor(max_workers)
+
+    def write(self, item: Any) -> None:
+        """Serialize `item` as JSON and write it."""
+        self.write_line(dump_json_line(item))
+
+    def write_line(self, line: bytes) -> None:
+        """Write an already serialized line, including the trailing
+        newline."""
+        self.count += 1
+        if self.codec is None:
+            self._fp.write(line)
+            return
+
+        self._buffer.append(line)
+        self._buffer_size += len(line)
+        if self._buffer_size >= self.block_size:
+            self._submit_block()
+
+    def _submit_block(self) -> None:
+        if not self._buffer:
+            return
+        block = b"".join(self._buffer)
+        self._buffer = []
+        self._buffer_size = 0
+        executor = cast(concurrent.futures.Executor, self._executor)
+        codec = cast(str, self.codec)
+        future = executor.submit(_compress_block, codec, block, self.compresslevel)
+        self._pending.append((future, len(block)))
+        while len(self._pending) > self._max_pending:
+            self._write_next_block()
+
+    def _write_next_block(self) -> None:
+        future, block_size = self._pending.popleft()
+        compressed_block = future.result()
+        self._fp.write(compressed_block)
+        self._frames.append((len(compressed_block), block_size))
+
+    def _write_seek_table(self) -> None:
+        entries = b"".join(
+            struct.pack("<II", compressed_size, size)
+            for compressed_size, size in self._frames
+        )
+        footer = struct.pack("<IBI", len(self._frames), 0, _ZSTD_SEEKABLE_MAGIC_NUMBER)
+        self._fp.write(
+            struct.pack("<II", _ZSTD_SKIPPABLE_MAGIC_NUMBER, len(entries) + len(footer))
+        )
+        self._fp.write(entries + footer)
+
+    def close(self) -> None:
+        """Flush remaining blocks and move the file to its final path."""
+        if self.codec is not None:
+            self._submit_block()
+            while self._pending:
+                self._write_next_block()
+        if self.codec == "zstd":
+            self._write_seek_table()
+        self._shutdown()
+        shutil.move(self._tmp_path, self.path)
+
+    def discard(self) -> None:
+        """Abort the write and delete the temporary file."""
+        for future, _ in self._pending:
+            future.cancel()
+        self._pending.clear()
+        self._shutdown()
+        self._tmp_path.unlink()
+
+    def _shutdown(self) -> None:
+        self._fp.close()
+        if self._own_executor:
+            self._executor.shutdown()  # type: ignore
+
+    def __enter__(self) -> "JSONLWriter":
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback) -> None:
+        if exc_type is None:
+            self.close()
+        else:
+            self.discard()
+
+
+def jsonl_write(
+    jsonl_path: Union[str, Path],
+    items: Iterable[Any],
+    compresslevel: Optional[int] = None,
+    max_workers: Optional[int] = None,
+) -> int:
+    """Write items to a JSONL file, the counterpart of `jsonl_iter`.
+
+    Items are serialized with orjson (if available). If the path ends with
+    `.gz` or `.zst`, the file is compressed in parallel by blocks, see
+    `JSONLWriter`.
+
+    :param jsonl_path: the path of the JSONL file. Plain (.jsonl), gzipped
+        (.jsonl.gz) and zstd-compressed (.jsonl.zst) files are supported.
+    :param items: the items to write
+    :param compresslevel: the compression level, defaults to 6 for gzip and
+        3 for zstd
+    :param max_workers: the number of compression threads, defaults to the
+        number of CPUs
+    :return: the number of written items
+    """
+    with JSONLWriter(
+        jsonl_path, compresslevel=compresslevel, max_workers=max_workers
+    ) as writer:
+        for item in items:
+            writer.write(item)
+    return writer.count
+
+
+class ZstdSeekableReader(io.RawIOBase):
+    """A seekable reader of zstd-compressed files.
+
+    If the file ends with a seek table (zstd seekable format, as written by
+    `JSONLWriter`), a seek only decompresses the frame containing the
+    target offset. Otherwise, the file is decompressed from the start (or
+    from the current position for forward seeks).
+
+    Wrap it in a `io.BufferedReader` to read lines efficiently.
+
+    :param path: the path of the zstd file
+    """
+
+    def __init__(self, path: Union[str, Path]):
+        if not _zstandard_available:
+            raise ImportError("zstandard is required to read .zst files")
+        self.fp = open(path, "rb")
+        # Sorted (uncompressed offset, compressed offset) of frame starts
+        self.frames = self._read_seek_table()
+        self._dctx = zstandard.ZstdDecompressor()
+        self._position = 0
+        self._reader = self._open_reader(0)
+
+    def _read_seek_table(self) -> List[Tuple[int, int]]:
+        frames = [(0, 0)]
+        file_size = self.fp.seek(0, io.SEEK_END)
+        if file_size < 17:
+            return frames
+        self.fp.seek(file_size - 9)
+        frame_count, descriptor, magic_number = struct.unpack("<IBI", self.fp.read(9))
+        if magic_number != _ZSTD_SEEKABLE_MAGIC_NUMBER:
+            return frames
+        entry_size = 12 if descriptor & 0x80 else 8
+        self.fp.seek(file_size - 9 - frame_count * entry_size)
+        entries = self.fp.read(frame_count * entry_size)
+        offset = compressed_offset = 0
+        for i in range(frame_count):
+            compressed_size, size = struct.unpack_from("<II", entries, i * entry_size)
+            offset += size
+            compressed_offset += compressed_size
+            frames.append((offset, compressed_offset))
+        return frames
+
+    def _open_reader(self, compressed_offset: int):
+        self.fp.seek(compressed_offset)
+        return self._dctx.stream_reader(self.fp, read_across_frames=True, closefd=False)
+
+    def _skip(self, size: int) -> None:
+        while size > 0:
+            data = self._reader.read(min(size, 1024 * 1024))
+            if not data:
+                break
+            size -= len(data)
+            self._position += len(data)
+
+    def readable(self) -> bool:
+        return True
+
+    def seekable(self) -> bool:
+        return True
+
+    def tell(self) -> int:
+        return self._position
+
+    def compressed_tell(self) -> int:
+        """Return the current position in the compressed file."""
+        return self.fp.tell()
+
+    def readinto(self, buffer) -> int:
+        data = self._reader.read(len(buffer))
+        buffer[: len(data)] = data
+        self._position += len(data)
+        return len(data)
+
+    def seek(self, offset: int, whence: int = io.SEEK_SET) -> int:
+        if whence == io.SEEK_CUR:
+            offset += self._position
+        elif whence != io.SEEK_SET:
+            raise ValueError("only SEEK_SET and SEEK_CUR are supported")
+
+        index = bisect.bisect_right(self.frames, (offset, float("inf"))) - 1
+        frame_offset, compressed_offset = self.frames[index]
+        if not (frame_offset <= self._position <= offset):
+            # Restart decompression from the start of the frame
+            self._reader.close()
+            self._reader = self._open_reader(compressed_offset)
+            self._position = frame_offset
+        self._skip(offset - self._position)
+        return self._position
+
+    def close(self) -> None:
+        if not self.closed:
+            self._reader.close()
+            self.fp.close()
+        super().close()
+
+
+def decode_json(content: Union[bytes, str]) -> Any:
+    """Decode a JSON document, with orjson if it's available.
+
+    :param content: the JSON document, preferably as bytes (e.g. the
+        `content` of a response) to avoid decoding it to a string first
+    """
+    if _orjson_available:
+        return orjson.loads(content)
+    return json.loads(content)
+
+
+# Characters that change the structure of a JSON document, and characters
+# that end or escape something in a JSON string
+_JSON_STRUCTURE_RE = re.compile(rb'[][{}:,"]')
+_JSON_STRING_RE = re.compile(rb'["\\]')
+
+
+def iter_json_array(chunks: Iterable[bytes], key: str) -> Iterator[Any]:
+    """Iterate over the items of the array stored under `key` in a JSON
+    object, decoding each item as soon as it is complete.
+
+    The document is scanned incrementally, so that only the item being
+    parsed (and the current chunk) is kept in memory. The rest of the
+    document after the array is not read.
+
+    >>> chunks = [b'{"count": 2, "items": [{"a"', b": 1}, 2]}"]
+    >>> list(iter_json_array(chunks, "items"))
+    [{'a': 1}, 2]
+
+    :param chunks: the JSON document, as an iterable of byte chunks (e.g.
+        `Response.iter_content()`)
+    :param key: the key of the array, in the top-level object
+    :raises ValueError: if `key` is missing from the top-level object, if
+        its value is not an array (`null` included) or if the document ends
+        before the end of the array
+    :yield: the decoded items of the array
+    """
+    buffer = bytearray()
+    # position of the next byte to scan
+    pos = 0
+    # number of open objects/arrays
+    depth = 0
+    in_string = False
+    string_start = 0
+    # the last string read at the top level, and whether it was a key
+    # equal to `key`
+    last_string = b""
+    key_matched = False
+    # the depth of the array once it's found
+    array_depth: Optional[int] = None
+    # start of the item being read in the array, if any
+    item_start: Optional[int] = None
+
+    for chunk in chunks:
+        buffer += chunk
+        while True:
+            if in_string:
+                match = _JSON_STRING_RE.search(buffer, pos)
+                if match is None:
+                    pos = len(buffer)
+                    break
+                if match.group() == b"\\":
+                    if match.end() == len(buffer):
+                        # wait for the escaped character
+                        pos = match.start()
+                        break
+                    pos = match.end() + 1
+                    continue
+                in_string = False
+                pos = match.end()
+                if depth == 1 and array_depth is None:
+                    last_string = bytes(buffer[string_start:pos])
+                continue
+
+            match = _JSON_STRUCTURE_RE.search(buffer, pos)
+            if match is None:
+                pos = len(buffer)
+                break
+            char = match.group()
+            pos = match.end()
+            if key_matched and array_depth is None and char != b"[":
+                # The value of `key` is a string, an object, or a scalar
+                # (followed by `,` or `}`)
+                raise ValueError(f"{key!r} is not an array")
+            if char == b'"':
+                in_string = True
+                string_start = match.start()
+            elif char in b"{[":
+                if key_matched and array_depth is None:
+                    array_depth = depth + 1
+                    item_start = pos
+                depth += 1
+            elif char in b"}]":
+                depth -= 1
+                if array_depth is None:
+                    continue
+                if depth == array_depth - 1:
+                    # end of the array, the last item can be a scalar
+                    if item_start is not None:
+                        item = buffer[item_start : match.start()].strip()
+                        if item:
+                            yield decode_json(bytes(item))
+                    return
+                if depth == array_depth:
+                    yield decode_json(bytes(buffer[item_start:pos]))
+                    item_start = None
+            elif char == b",":
+                if depth == array_depth:
+                    if item_start is not None:
+                        item = buffer[item_start : match.start()].strip()
+                        if item:
+                            yield decode_json(bytes(item))
+                    item_start = pos
+            elif depth == 1 and array_depth is None:
+                # char == b":"
+                key_matched = decode_json(last_string) == key
+
+        # Drop the bytes that were scanned and are not needed anymore
+        if item_start is not None:
+            keep = item_start
+        elif in_string and depth == 1 and array_depth is None:
+            keep = string_start
+        else:
+            keep = pos
+        del buffer[:keep]
+        pos -= keep
+        string_start -= keep
+        if item_start is not None:
+            item_start -= keep
+
+    if array_depth is None:
+        raise ValueError(f"{key!r} not found in the JSON document")
+    raise ValueError("the JSON document ends before the end of the array")
 
 
 def load_json(filepath: Union[str, Path]) -> Union[Dict, List]:
@@ -162,10 +867,7 @@ def load_json(filepath: Union[str, Path]) -> Union[Dict, List]:
     """
     open = get_open_fn(filepath)
     with open(filepath, "rb") as f:
-        if _orjson_available:
-            return orjson.loads(f.read())
-        else:
-            return json.loads(f.read().decode("utf-8"))
+        return decode_json(f.read())
 
 
 def _sanitize_file_path(file_path: Path, suffix: str = "") -> Path:
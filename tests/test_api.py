@@ -1,10 +1,18 @@
 import json
+import threading
 import unittest
+import urllib.parse
+from unittest.mock import patch
 
 import pytest
+import requests
 import requests_mock
 
 import openfoodfacts
+from openfoodfacts.api import _iter_pages, get_http_session
+from openfoodfacts.cache import ResponseCache
+from openfoodfacts.ratelimit import AdaptiveRateLimiter, EndpointClass
+from openfoodfacts.utils import _compress_block, _zstandard_available
 
 TEST_USER_AGENT = "test_off_python"
 
@@ -105,6 +113,258 @@ class TestProducts(unittest.TestCase):
             )
             self.assertEqual(res["products"], ["banania", "banania big"])
 
+    def test_get_many(self):
+        api = openfoodfacts.API(user_agent=TEST_USER_AGENT, version="v2")
+        base_url = "https://world.openfoodfacts.org/api/v2/product"
+        codes = ["1", "2", "3", "4"]
+        with requests_mock.mock() as mock:
+            for code in ("1", "3"):
+                mock.get(
+                    f"{base_url}/{code}",
+                    text=json.dumps({"product": {"code": code}, "status": 1}),
+                )
+            mock.get(f"{base_url}/2", status_code=404, text="{}")
+            mock.get(f"{base_url}/4", status_code=500)
+            results = api.product.get_many(codes, fields=["code"], max_workers=2)
+            self.assertTrue(
+                all(
+                    request.qs["fields"] == ["code"] for request in mock.request_history
+                )
+            )
+
+        self.assertEqual([result.code for result in results], codes)
+        self.assertEqual(
+            [result.product for result in results],
+            [{"code": "1"}, None, {"code": "3"}, None],
+        )
+        self.assertEqual(
+            [result.error is None for result in results], [True] * 3 + [False]
+        )
+        self.assertIn("500", results[3].error or "")
+
+    def test_get_batch(self):
+        api = openfoodfacts.API(user_agent=TEST_USER_AGENT, version="v2")
+        with requests_mock.mock() as mock:
+            mock.get(
+                "https://world.openfoodfacts.org/api/v2/search",
+                text=json.dumps({"products": [{"code": "1"}, {"code": "3"}]}),
+            )
+            res = api.product.get_batch(["1", "2", "3"], fields=["product_name"])
+            self.assertEqual(res, {"1": {"code": "1"}, "3": {"code": "3"}})
+            self.assertEqual(mock.call_count, 1)
+            # Commas must not be escaped
+            self.assertTrue(
+                mock.last_request.url.endswith(
+                    "?code=1,2,3&page_size=3&fields=code,product_name"
+                )
+            )
+
+    def test_iter_facet_products(self):
+        api = openfoodfacts.API(user_agent=TEST_USER_AGENT, version="v2")
+        url = "https://world.openfoodfacts.org/label/en:organic.json"
+        with requests_mock.mock() as mock:
+            for page, codes in ((1, ["1", "2"]), (2, ["3", "4"]), (3, ["5"])):
+                mock.get(
+                    f"{url}?page={page}&page_size=2",
+                    complete_qs=True,
+                    text=json.dumps(
+                        {"count": 5, "products": [{"code": c} for c in codes]}
+                    ),
+                )
+            products = api.facet.iter_facet_products(
+                "label", "en:organic", page_size=2, prefetch=2
+            )
+            self.assertEqual(next(products), {"code": "1"})
+            self.assertEqual(
+                [product["code"] for product in products], ["2", "3", "4", "5"]
+            )
+            # No request is sent past the last page
+            self.assertEqual(mock.call_count, 3)
+
+            # The iteration stops on the first empty page
+            mock.get(f"{url}?page=2&page_size=2", text=json.dumps({"products": []}))
+            products = api.facet.iter_facet_products(
+                "label", "en:organic", page_size=2, prefetch=1
+            )
+            self.assertEqual(len(list(products)), 2)
+
+    def test_update_many(self):
+        api = openfoodfacts.API(
+            user_agent=TEST_USER_AGENT, username="user", password="pass"
+        )
+        base_url = "https://world.openfoodfacts.org/cgi"
+        bodies = [
+            {"code": "1", "product_name": "a"},
+            {"code": "2", "product_name": "b"},
+            {"code": "3", "product_name": "c"},
+            {"product_name": "d"},
+        ]
+        with requests_mock.mock() as mock:
+            mock.post(f"{base_url}/session.pl", cookies={"session": "abc"})
+
+            def update_callback(request, context):
+                code = urllib.parse.parse_qs(request.text)["code"][0]
+                if code == "2" and mock.call_count < 4:
+                    context.status_code = 503
+                    return ""
+                if code == "3":
+                    return json.dumps({"status": 0, "status_verbose": "invalid"})
+                return json.dumps({"status": 1})
+
+            mock.post(f"{base_url}/product_jqm2.pl", text=update_callback)
+            results = api.product.update_many(bodies, max_workers=1, backoff_factor=0)
+            # One login request, then 4 edits (1 retry)
+            self.assertEqual(mock.call_count, 5)
+            for request in mock.request_history[1:]:
+                self.assertEqual(request.headers["Cookie"], "session=abc")
+                self.assertNotIn("password", urllib.parse.parse_qs(request.text))
+
+        self.assertEqual([result.code for result in results], ["1", "2", "3", ""])
+        self.assertEqual(
+            [result.error for result in results],
+            [None, None, "invalid", "missing code from body"],
+        )
+        self.assertEqual(results[1].response, {"status": 1})
+
+        with requests_mock.mock() as mock:
+            results = api.product.update_many(bodies, dry_run=True)
+            self.assertEqual(mock.call_count, 0)
+        self.assertEqual(
+            [result.error is None for result in results], [True] * 3 + [False]
+        )
+
+    def test_update_many_retries(self):
+        api = openfoodfacts.API(user_agent=TEST_USER_AGENT, session_cookie="abc")
+        url = "https://world.openfoodfacts.org/cgi/product_jqm2.pl"
+        ok = {"text": json.dumps({"status": 1})}
+        with requests_mock.mock() as mock, patch("time.sleep") as sleep:
+            # Unsent requests and throttled responses are retried, honoring
+            # the Retry-After header
+            mock.post(
+                url,
+                [
+                    {"exc": requests.ConnectTimeout},
+                    {"status_code": 429, "headers": {"Retry-After": "7"}},
+                    ok,
+                ],
+            )
+            results = api.product.update_many([{"code": "1"}], backoff_factor=2)
+            self.assertIsNone(results[0].error)
+            self.assertEqual(mock.call_count, 3)
+            self.assertEqual([call.args[0] for call in sleep.call_args_list], [2, 7])
+            self.assertEqual(mock.last_request.headers["Cookie"], "session=abc")
+
+            # The server may have applied the edit: don't send it again
+            for response in ({"exc": requests.ReadTimeout}, {"status_code": 500}):
+                mock.reset_mock()
+                mock.post(url, [response, ok])
+                results = api.product.update_many([{"code": "1"}])
+                self.assertIsNotNone(results[0].error)
+                self.assertEqual(mock.call_count, 1)
+
+        # Throttled responses are only retried by the rate limiter
+        limiter = AdaptiveRateLimiter(
+            rates={EndpointClass.write: 1000}, max_retries=1, base_delay=0
+        )
+        api = openfoodfacts.API(
+            user_agent=TEST_USER_AGENT, session_cookie="abc", rate_limiter=limiter
+        )
+        with requests_mock.mock() as mock:
+            mock.post(url, status_code=503, headers={"Retry-After": "0"})
+            results = api.product.update_many([{"code": "1"}], backoff_factor=0)
+            self.assertIn("503", results[0].error or "")
+            self.assertEqual(mock.call_count, 2)
+
+    def test_iter_pages_prefetch(self):
+        api_config = openfoodfacts.API(user_agent=TEST_USER_AGENT).api_config
+        condition = threading.Condition()
+        # Pages that were requested but not processed by the caller yet
+        in_flight = 0
+        max_in_flight = 0
+
+        def fetch_page(page, session):
+            nonlocal in_flight, max_in_flight
+            with condition:
+                in_flight += 1
+                max_in_flight = max(max_in_flight, in_flight)
+                condition.notify_all()
+            return {"count": 8, "products": [page, page]}
+
+        for prefetch in (0, 1, 2):
+            in_flight = max_in_flight = 0
+            products = []
+            for product in _iter_pages(api_config, fetch_page, 2, prefetch):
+                with condition:
+                    if product not in products:
+                        # The next pages are fetched while the caller
+                        # processes the current one
+                        expected = min(prefetch, 4 - product) + 1
+                        self.assertTrue(
+                            condition.wait_for(lambda: in_flight == expected, 5)
+                        )
+                    else:
+                        in_flight -= 1
+                products.append(product)
+            self.assertEqual(products, [1, 1, 2, 2, 3, 3, 4, 4])
+            self.assertEqual(max_in_flight, prefetch + 1)
+
+
+class TestSession(unittest.TestCase):
+    def test_api_session(self):
+        api = openfoodfacts.API(
+            user_agent=TEST_USER_AGENT,
+            pool_maxsize=32,
+            max_retries=3,
+            connect_timeout=2,
+            timeout=30,
+        )
+        session = get_http_session(api.api_config)
+        adapter = session.get_adapter("https://world.openfoodfacts.org")
+        self.assertEqual(adapter._pool_maxsize, 32)  # type: ignore[attr-defined]
+        self.assertEqual(adapter.max_retries.total, 3)  # type: ignore[attr-defined]
+        # Each API instance has its own session
+        self.assertIsNot(
+            get_http_session(openfoodfacts.API(user_agent="other").api_config),
+            session,
+        )
+
+        with requests_mock.mock() as mock:
+            mock.post(
+                "https://robotoff.openfoodfacts.org/api/v1/predict/lang",
+                text=json.dumps({"predictions": []}),
+            )
+            self.assertEqual(api.robotoff.predict_lang("hello"), {"predictions": []})
+            self.assertEqual(mock.last_request.headers["User-Agent"], TEST_USER_AGENT)
+            self.assertEqual(mock.last_request.timeout, (2, 30))
+
+    def test_api_config_serialization(self):
+        api = openfoodfacts.API(
+            user_agent=TEST_USER_AGENT,
+            cache=ResponseCache(),
+            rate_limiter=AdaptiveRateLimiter(),
+        )
+        # The session, cache and rate limiter are not part of the config
+        data = json.loads(api.api_config.model_dump_json())
+        self.assertEqual(data["user_agent"], TEST_USER_AGENT)
+        self.assertNotIn("session", data)
+        self.assertNotIn("cache", data)
+        self.assertNotIn("rate_limiter", data)
+
+    @unittest.skipUnless(_zstandard_available, "zstandard is not installed")
+    def test_compressed_response(self):
+        api = openfoodfacts.API(user_agent=TEST_USER_AGENT, version="v2")
+        response_data = {"product": {"code": "1"}, "status": 1}
+        with requests_mock.mock() as mock:
+            mock.get(
+                "https://world.openfoodfacts.org/api/v2/product/1",
+                content=_compress_block(
+                    "zstd", json.dumps(response_data).encode("utf-8"), 3
+                ),
+                headers={"Content-Encoding": "zstd"},
+            )
+            self.assertEqual(api.product.get("1"), {"code": "1"})
+            self.assertIn("zstd", mock.last_request.headers["Accept-Encoding"])
+
 
 if __name__ == "__main__":
     unittest.main()
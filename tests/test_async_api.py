@@ -0,0 +1,80 @@
+import asyncio
+import json
+import urllib.parse
+
+import pytest
+
+from openfoodfacts import API
+from openfoodfacts.async_api import AsyncAPI
+from openfoodfacts.server import InMemoryProductStore, LocalAPIServer
+
+httpx = pytest.importorskip("httpx")
+
+PRODUCTS = [
+    {"code": "3017620422003", "product_name": "Nutella"},
+    {"code": "5449000000996", "product_name": "Coca-Cola"},
+]
+
+
+def test_async_api_product():
+    async def run(base_url: str):
+        async with AsyncAPI(
+            user_agent="test", base_url=base_url, max_connections=2
+        ) as api:
+            results = await asyncio.gather(
+                *(
+                    api.product.get(code)
+                    for code in ["3017620422003", "5449000000996", "1111111111111"]
+                )
+            )
+            assert results == PRODUCTS + [None]
+            assert await api.product.get("3017620422003", fields=["product_name"]) == {
+                "product_name": "Nutella"
+            }
+            search_results = await api.product.text_search("coca")
+            assert search_results is not None
+            assert search_results["products"] == PRODUCTS[1:]
+
+    with LocalAPIServer(InMemoryProductStore(PRODUCTS)) as server:
+        asyncio.run(run(server.base_url))
+
+
+def test_async_api_shares_api_config():
+    api = API(user_agent="test", username="user", password="pass")
+    requests = []
+
+    def handler(request):
+        requests.append(request)
+        if request.url.path == "/api/v3/product/test":
+            return httpx.Response(
+                200,
+                json={"status": "success", "product": {"ingredients": [{"id": "x"}]}},
+            )
+        return httpx.Response(200, json={"status": 1})
+
+    async def run():
+        client = httpx.AsyncClient(transport=httpx.MockTransport(handler))
+        async_api = AsyncAPI(
+            user_agent="ignored", api_config=api.api_config, client=client
+        )
+        await async_api.product.update({"code": "1234", "product_name": "test"})
+        ingredients = await async_api.parse_ingredients("water", "en")
+        await async_api.aclose()
+        # The client is not owned by the AsyncAPI instance
+        assert not client.is_closed
+        await client.aclose()
+        return ingredients
+
+    assert asyncio.run(run()) == [{"id": "x"}]
+    assert requests[0].url == "https://world.openfoodfacts.org/cgi/product_jqm2.pl"
+    assert requests[0].headers["User-Agent"] == "test"
+    assert urllib.parse.parse_qs(requests[0].content.decode()) == {
+        "code": ["1234"],
+        "product_name": ["test"],
+        "user_id": ["user"],
+        "password": ["pass"],
+    }
+    assert json.loads(requests[1].content)["product"] == {
+        "lang": "en",
+        "ingredients_text_en": "water",
+    }
@@ -1,6 +1,7 @@
 import pytest
 
 from openfoodfacts.barcode import (
+    BarcodeBloomFilter,
     calculate_check_digit,
     has_valid_check_digit,
     normalize_barcode,
@@ -71,3 +72,25 @@ def test_calculate_check_digit(gtin, expected):
 )
 def test_has_valid_check_digit(gtin, expected):
     assert has_valid_check_digit(gtin) is expected
+
+
+def test_barcode_bloom_filter(tmp_path):
+    barcode_filter = BarcodeBloomFilter.for_capacity(1000, false_positive_rate=0.01)
+    barcodes = [str(3000000000000 + i * 7) for i in range(1000)]
+    for barcode in barcodes:
+        barcode_filter.add(barcode)
+
+    assert all(barcode in barcode_filter for barcode in barcodes)
+    # Barcodes are normalized before lookup
+    assert "0" + barcodes[0] in barcode_filter
+    false_positives = sum(
+        str(4000000000000 + i) in barcode_filter for i in range(10_000)
+    )
+    assert false_positives < 300
+
+    path = tmp_path / "barcodes.bloom"
+    barcode_filter.save(path, metadata={"etag": "abc"})
+    loaded, metadata = BarcodeBloomFilter.load(path)
+    assert metadata == {"etag": "abc"}
+    assert loaded.bits == barcode_filter.bits
+    assert all(barcode in loaded for barcode in barcodes)
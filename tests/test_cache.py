@@ -0,0 +1,86 @@
+import json
+import time
+from pathlib import Path
+
+import requests_mock
+
+from openfoodfacts import API
+from openfoodfacts.cache import CacheEntry, ResponseCache
+
+PRODUCT_URL = "https://world.openfoodfacts.org/api/v2/product/3017620422003"
+
+
+def test_get_key():
+    assert ResponseCache.get_key(
+        "HTTPS://World.openfoodfacts.org/cgi/search.pl?json=1",
+        {"page": 1, "search_terms": "pizza", "sort_by": None},
+    ) == ResponseCache.get_key(
+        "https://world.openfoodfacts.org/cgi/search.pl?search_terms=pizza&page=1",
+        {"json": "1"},
+    )
+    assert ResponseCache.get_key(PRODUCT_URL) != ResponseCache.get_key(
+        PRODUCT_URL + "?fields=code"
+    )
+
+
+def test_lru_eviction():
+    cache = ResponseCache(max_size=2)
+    for key in ("a", "b"):
+        cache.set(key, CacheEntry(content=b"{}", stored_at=time.time()))
+    # "a" becomes the most recently used entry
+    assert cache.get("a") is not None
+    cache.set("c", CacheEntry(content=b"{}", stored_at=time.time()))
+    assert len(cache) == 2
+    assert cache.get("b") is None
+    assert cache.get("a") is not None
+
+
+def test_disk_tier(tmp_path: Path):
+    cache = ResponseCache(cache_dir=tmp_path)
+    entry = CacheEntry(content=b'{"a": 1}', stored_at=1.0, etag='"abc"')
+    cache.set("key", entry)
+    cache.clear()
+    assert cache.get("key") == entry
+    assert ResponseCache(cache_dir=tmp_path).get("key") == entry
+    assert cache.get("other") is None
+
+
+def test_send_get_request_cache():
+    cache = ResponseCache(ttl=60)
+    api = API(user_agent="test", cache=cache)
+    response_data = {"product": {"code": "3017620422003"}, "status": 1}
+
+    with requests_mock.mock() as mock:
+        mock.get(
+            PRODUCT_URL,
+            text=json.dumps(response_data),
+            headers={"ETag": '"v1"', "Last-Modified": "Mon, 01 Jan 2024 00:00:00 GMT"},
+        )
+        assert api.product.get("3017620422003") == response_data["product"]
+        assert api.product.get("3017620422003") == response_data["product"]
+        assert mock.call_count == 1
+
+        # Stale entries are revalidated
+        cache.ttl = 0
+        mock.get(PRODUCT_URL, status_code=304)
+        assert api.product.get("3017620422003") == response_data["product"]
+        assert mock.call_count == 2
+        assert mock.last_request.headers["If-None-Match"] == '"v1"'
+        assert (
+            mock.last_request.headers["If-Modified-Since"]
+            == "Mon, 01 Jan 2024 00:00:00 GMT"
+        )
+
+        # Modified responses replace the entry
+        response_data["product"]["product_name"] = "Nutella"
+        mock.get(PRODUCT_URL, text=json.dumps(response_data), headers={"ETag": '"v2"'})
+        assert api.product.get("3017620422003") == response_data["product"]
+        cache.ttl = 60
+        assert api.product.get("3017620422003") == response_data["product"]
+        assert mock.call_count == 3
+
+        # Errors are not cached
+        mock.get(PRODUCT_URL + "0", status_code=404)
+        assert api.product.get("30176204220030") is None
+        assert api.product.get("30176204220030") is None
+        assert mock.call_count == 5
@@ -0,0 +1,335 @@
+import gzip
+import itertools
+import json
+from pathlib import Path
+from typing import List
+
+import pytest
+
+from openfoodfacts.dataset import (
+    DATASET_FILE_NAMES,
+    DatasetCursor,
+    MultiFlavorDataset,
+    ProductDataset,
+    _recompress_threads,
+    get_country_partition_dir,
+    get_dataset,
+    get_recompressed_path,
+    get_sorted_dataset_path,
+    is_recompressed_dataset_up_to_date,
+    merge_join,
+    partition_dataset_by_country,
+    sort_dataset_by_barcode,
+)
+from openfoodfacts.types import Country, DatasetType, Flavor
+from openfoodfacts.utils import (
+    IterationStats,
+    IterationStatsSnapshot,
+    JSONLWriter,
+    get_file_etag,
+    get_open_fn,
+    jsonl_iter,
+    jsonl_write,
+)
+
+PRODUCTS = [
+    {"code": str(i).zfill(13), "product_name": f"product {i}"} for i in range(25)
+]
+
+
+@pytest.fixture(params=[".jsonl", ".jsonl.gz", ".jsonl.zst"])
+def dataset_path(tmp_path: Path, request) -> Path:
+    path = tmp_path / f"products{request.param}"
+    if path.suffix == ".zst":
+        # Use a small block size to get several zstd frames
+        with JSONLWriter(path, block_size=100) as writer:
+            for product in PRODUCTS:
+                writer.write(product)
+        return path
+
+    data = "".join(json.dumps(product) + "\n" for product in PRODUCTS).encode()
+    if path.suffix == ".gz":
+        data = gzip.compress(data)
+    path.write_bytes(data)
+    return path
+
+
+def test_iter_with_cursor_resume(dataset_path: Path):
+    dataset = ProductDataset(dataset_path=dataset_path)
+    items = list(dataset.iter_with_cursor())
+    assert [product for product, _ in items] == PRODUCTS
+    assert items[-1][1].line_number == len(PRODUCTS)
+
+    cursor = DatasetCursor.from_dict(items[9][1].to_dict())
+    resumed = [product for product, _ in dataset.iter_with_cursor(start_from=cursor)]
+    assert resumed == PRODUCTS[10:]
+
+
+def test_iter_checkpointed(dataset_path: Path, tmp_path: Path):
+    dataset = ProductDataset(dataset_path=dataset_path)
+    checkpoint_path = tmp_path / "checkpoint.json"
+
+    seen = []
+    for product in dataset.iter_checkpointed(checkpoint_path, every=5):
+        seen.append(product)
+        if len(seen) == 12:
+            # simulate a crash
+            break
+
+    cursor = DatasetCursor.load(checkpoint_path)
+    assert cursor is not None and cursor.line_number == 10
+    resumed = list(dataset.iter_checkpointed(checkpoint_path, every=5))
+    assert resumed == PRODUCTS[10:]
+    cursor = DatasetCursor.load(checkpoint_path)
+    assert cursor is not None and cursor.line_number == len(PRODUCTS)
+
+
+def test_get_barcode_filter(dataset_path: Path):
+    dataset = ProductDataset(dataset_path=dataset_path)
+    barcode_filter = dataset.get_barcode_filter()
+    assert all(product["code"] in barcode_filter for product in PRODUCTS)
+    assert "3017620422003" not in barcode_filter
+
+    # The filter is cached next to the dataset
+    filter_path = dataset_path.with_name(
+        dataset_path.name.replace(".", "_") + "_barcodes.bloom"
+    )
+    assert filter_path.is_file()
+    assert dataset.get_barcode_filter().bits == barcode_filter.bits
+
+
+def test_modified_since(tmp_path: Path):
+    products = [
+        {"code": str(i), "last_modified_t": timestamp}
+        for i, timestamp in enumerate([50, 10, 40, 20, 30])
+    ]
+    products.append({"code": "no-timestamp"})
+    dataset_path = tmp_path / "products.jsonl.gz"
+    dataset_path.write_bytes(
+        gzip.compress(
+            "".join(json.dumps(product) + "\n" for product in products).encode()
+        )
+    )
+    dataset = ProductDataset(dataset_path=dataset_path)
+    assert list(dataset.modified_since(25)) == [products[0], products[2], products[4]]
+    assert list(dataset.modified_since(50)) == []
+    assert list(dataset.modified_since(-1)) == products
+
+
+def test_countries(tmp_path: Path):
+    products = [
+        {"code": "1", "countries_tags": ["en:france"]},
+        {"code": "2", "countries_tags": ["en:france", "en:belgium"]},
+        {"code": "3", "countries_tags": ["en:germany"]},
+        {"code": "4", "countries_tags": ["en:belgium", "en:unknown"]},
+        {"code": "5"},
+    ]
+    dataset_path = tmp_path / "products.jsonl.gz"
+    jsonl_write(dataset_path, products)
+
+    partition_dir = partition_dataset_by_country(dataset_path)
+    assert sorted(path.name for path in partition_dir.glob("*.jsonl.gz")) == [
+        "be.jsonl.gz",
+        "de.jsonl.gz",
+        "fr.jsonl.gz",
+    ]
+    assert list(jsonl_iter(partition_dir / "be.jsonl.gz")) == [
+        products[1],
+        products[3],
+    ]
+
+    dataset = ProductDataset(dataset_path=dataset_path, countries=[Country.fr])
+    assert list(dataset) == products[:2]
+    dataset = ProductDataset(dataset_path=dataset_path, countries=["fr", "be", "it"])
+    assert list(dataset) == [products[0], products[1], products[3]]
+    assert dataset.count() == 3
+
+    # The barcode filter covers the full dataset, whatever the countries
+    barcode_filter = ProductDataset(
+        dataset_path=dataset_path, countries=[Country.fr]
+    ).get_barcode_filter()
+    assert all(code in barcode_filter for code in "12345")
+    barcode_filter = ProductDataset(dataset_path=dataset_path).get_barcode_filter()
+    assert "3" in barcode_filter
+
+
+def test_recompress(tmp_path: Path):
+    dataset_path = tmp_path / "openfoodfacts-products.jsonl.gz"
+    jsonl_write(dataset_path, PRODUCTS)
+    metadata_path = tmp_path / "openfoodfacts-products_jsonl_gz.json"
+    metadata_path.write_text(json.dumps({"etag": "abc", "url": "", "created_at": 0}))
+    assert not is_recompressed_dataset_up_to_date(dataset_path)
+
+    assert get_dataset(cache_dir=tmp_path, recompress="zstd") == dataset_path
+    _recompress_threads[dataset_path].join()
+
+    recompressed_path = get_recompressed_path(dataset_path)
+    assert recompressed_path.name == "openfoodfacts-products.jsonl.zst"
+    assert is_recompressed_dataset_up_to_date(dataset_path)
+    assert list(jsonl_iter(recompressed_path)) == PRODUCTS
+    assert get_file_etag(recompressed_path) == "abc"
+
+    dataset = ProductDataset(cache_dir=tmp_path)
+    assert dataset.dataset_path == recompressed_path
+    assert list(dataset) == PRODUCTS
+    # Country partitions are built from the downloaded dump
+    dataset = ProductDataset(cache_dir=tmp_path, countries=[Country.fr])
+    assert dataset.partition_dir == get_country_partition_dir(dataset_path)
+
+    # A new version of the dataset invalidates the zstd copy
+    jsonl_write(dataset_path, PRODUCTS[:3])
+    assert not is_recompressed_dataset_up_to_date(dataset_path)
+    assert ProductDataset(cache_dir=tmp_path).dataset_path == dataset_path
+
+
+def test_iteration_stats(dataset_path: Path):
+    snapshots: List[IterationStatsSnapshot] = []
+    stats = IterationStats(callback=snapshots.append, report_every=0)
+    dataset = ProductDataset(dataset_path=dataset_path, stats=stats)
+    assert list(dataset) == PRODUCTS
+
+    snapshot = stats.snapshot()
+    assert snapshot.lines == len(PRODUCTS)
+    with get_open_fn(dataset_path)(str(dataset_path), "rb") as f:
+        assert snapshot.uncompressed_bytes == len(f.read())
+    if dataset_path.suffix == ".jsonl":
+        assert snapshot.compressed_bytes is None
+    else:
+        assert snapshot.compressed_bytes == dataset_path.stat().st_size
+    assert snapshot.elapsed >= snapshot.decode_time
+    assert snapshot.to_dict()["lines_per_second"] > 0
+    # One report per line + one at the end of the iteration
+    assert len(snapshots) == len(PRODUCTS) + 1
+    assert snapshots[-1].lines == len(PRODUCTS)
+
+
+def test_iteration_stats_early_exit(dataset_path: Path):
+    snapshots: List[IterationStatsSnapshot] = []
+    stats = IterationStats(callback=snapshots.append, report_every=3600)
+    dataset = ProductDataset(dataset_path=dataset_path, stats=stats)
+    assert list(itertools.islice(dataset, 2)) == PRODUCTS[:2]
+    # The final report is sent even if the iteration stopped early
+    assert len(snapshots) == 1
+    assert snapshots[0].lines == 2
+
+
+@pytest.mark.parametrize("order", ["interleave", "sequential"])
+def test_multi_flavor_dataset(tmp_path: Path, order: str):
+    products = {
+        Flavor.off: [{"code": f"off-{i}"} for i in range(5)],
+        Flavor.obf: [{"code": f"obf-{i}"} for i in range(2)],
+    }
+    for flavor, flavor_products in products.items():
+        jsonl_write(
+            tmp_path / DATASET_FILE_NAMES[flavor][DatasetType.jsonl], flavor_products
+        )
+
+    dataset = MultiFlavorDataset(
+        [Flavor.off, "obf"], order=order, batch_size=2, cache_dir=tmp_path
+    )
+    items = list(dataset)
+    if order == "sequential":
+        assert items == [(Flavor.off, p) for p in products[Flavor.off]] + [
+            (Flavor.obf, p) for p in products[Flavor.obf]
+        ]
+    else:
+        assert [product["code"] for _, product in items] == [
+            "off-0",
+            "off-1",
+            "obf-0",
+            "obf-1",
+            "off-2",
+            "off-3",
+            "off-4",
+        ]
+    # Stopping the iteration early stops the reader threads
+    assert next(iter(dataset)) == (Flavor.off, products[Flavor.off][0])
+
+
+def test_load_frame(tmp_path: Path):
+    pd = pytest.importorskip("pandas")
+    dataset_path = tmp_path / "products.csv"
+    rows = [
+        ["code", "created_t", "nutriscore_grade", "fat_100g", "product_name"],
+        ["0012345", "1600000000", "a", "1.5", "product 1"],
+        ["3017620422003", "", "e", "", "product 2"],
+        ["42", "1700000000", "b", "300", "product 3"],
+    ]
+    dataset_path.write_text("".join("\t".join(row) + "\n" for row in rows))
+    dataset = ProductDataset(dataset_path=dataset_path)
+
+    df = dataset.load_frame(chunksize=2)
+    assert list(df.columns) == rows[0]
+    assert list(df["code"]) == ["0012345", "3017620422003", "42"]
+    assert df["product_name"].dtype == object
+    assert df["created_t"].dtype == "Int64"
+    assert df["created_t"].isna().tolist() == [False, True, False]
+    assert isinstance(df["nutriscore_grade"].dtype, pd.CategoricalDtype)
+    assert list(df["nutriscore_grade"]) == ["a", "e", "b"]
+    assert df["fat_100g"].dtype == "float32"
+
+    df = dataset.load_frame(columns=["code", "created_t"], downcast=True)
+    assert list(df.columns) == ["code", "created_t"]
+    assert df["created_t"].dtype == "Int32"
+    assert [len(chunk) for chunk in dataset.iter_frames(chunksize=2)] == [2, 1]
+
+
+def _get_code(product: dict) -> str:
+    return product["code"]
+
+
+def test_map(dataset_path: Path):
+    dataset = ProductDataset(dataset_path=dataset_path)
+    results = list(dataset.map(_get_code, max_workers=2, batch_size=3))
+    assert results == [product["code"] for product in PRODUCTS]
+
+
+def test_sort_dataset_by_barcode(tmp_path: Path):
+    products = [
+        {"code": "3017620422003", "n": 0},
+        {"code": "00000042", "n": 1},
+        {"code": "0123456789012", "n": 2},
+        {"code": "42", "n": 3},
+        {"code": "5449000000996", "n": 4},
+        {"code": "03017620422003", "n": 5},
+    ]
+    dataset_path = tmp_path / "products.jsonl.gz"
+    jsonl_write(dataset_path, products)
+
+    # A tiny run size to get one run per product
+    sorted_path = sort_dataset_by_barcode(
+        dataset_path, max_run_bytes=1, tmp_dir=tmp_path
+    )
+    assert sorted_path == get_sorted_dataset_path(dataset_path)
+    assert [product["n"] for product in jsonl_iter(sorted_path)] == [1, 3, 2, 0, 5, 4]
+    assert list(tmp_path.glob("tmp*")) == []
+
+    # The sorted copy is up to date
+    mtime = sorted_path.stat().st_mtime_ns
+    assert sort_dataset_by_barcode(dataset_path) == sorted_path
+    assert sorted_path.stat().st_mtime_ns == mtime
+
+
+def test_merge_join():
+    products = [{"code": code} for code in ["42", "123", "3017620422003"]]
+    barcodes = ["00000123", "00000123", "0000000000999", "3017620422003"]
+
+    assert list(merge_join(products, barcodes)) == [
+        (products[1], "00000123"),
+        (products[1], "00000123"),
+        (products[2], "3017620422003"),
+    ]
+    assert list(merge_join(products, barcodes, how="outer")) == [
+        (products[0], None),
+        (products[1], "00000123"),
+        (products[1], "00000123"),
+        (None, "0000000000999"),
+        (products[2], "3017620422003"),
+    ]
+    assert list(merge_join(products, [], how="left")) == [(p, None) for p in products]
+    assert list(merge_join([], barcodes[:1], how="right")) == [(None, "00000123")]
+
+    with pytest.raises(ValueError, match="not sorted"):
+        list(merge_join(products, ["2", "1"]))
+    with pytest.raises(ValueError, match="invalid join type"):
+        list(merge_join(products, barcodes, how="cross"))
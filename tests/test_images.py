@@ -1,12 +1,16 @@
+import gzip
 from typing import Optional
 
 import pytest
 
 from openfoodfacts.images import (
+    ImageManifestItem,
     extract_barcode_from_url,
     extract_source_from_url,
     generate_image_url,
     generate_json_ocr_url,
+    iter_image_manifest,
+    write_image_manifest,
 )
 from openfoodfacts.types import Environment, Flavor
 
@@ -156,3 +160,88 @@ def test_generate_json_ocr_url(code, image_id, flavor, environment, expected):
 )
 def test_extract_barcode_from_url(url, expected):
     assert extract_barcode_from_url(url) == expected
+
+
+def test_iter_image_manifest(tmp_path):
+    products = [
+        {
+            "code": "3017620422003",
+            "images": {
+                "1": {"uploaded_t": 1000},
+                "2": {"uploaded_t": "2000"},
+                "front_fr": {"imgid": "2", "rev": "5"},
+                "ingredients_en": {"imgid": "1", "rev": "7"},
+            },
+        },
+        {"code": "123", "images": {"1": {"uploaded_t": 3000}}},
+        {"code": "invalid", "images": {"1": {"uploaded_t": 3000}}},
+        {"code": "456"},
+    ]
+    base_url = "https://images.openfoodfacts.org/images/products"
+    items = list(iter_image_manifest(products))
+    assert items == [
+        ImageManifestItem(
+            "3017620422003",
+            "1",
+            None,
+            f"{base_url}/301/762/042/2003/1.jpg",
+            f"{base_url}/301/762/042/2003/1.json",
+        ),
+        ImageManifestItem(
+            "3017620422003",
+            "2",
+            None,
+            f"{base_url}/301/762/042/2003/2.jpg",
+            f"{base_url}/301/762/042/2003/2.json",
+        ),
+        ImageManifestItem(
+            "3017620422003",
+            "2",
+            "front_fr",
+            f"{base_url}/301/762/042/2003/front_fr.5.full.jpg",
+            f"{base_url}/301/762/042/2003/2.json",
+        ),
+        ImageManifestItem(
+            "3017620422003",
+            "1",
+            "ingredients_en",
+            f"{base_url}/301/762/042/2003/ingredients_en.7.full.jpg",
+            f"{base_url}/301/762/042/2003/1.json",
+        ),
+        ImageManifestItem(
+            "123",
+            "1",
+            None,
+            f"{base_url}/000/000/000/0123/1.jpg",
+            f"{base_url}/000/000/000/0123/1.json",
+        ),
+    ]
+
+    items = list(iter_image_manifest(products, lang="fr", resolution="400"))
+    assert [item.url for item in items] == [
+        f"{base_url}/301/762/042/2003/front_fr.5.400.jpg"
+    ]
+    items = list(iter_image_manifest(products, uploaded_after=1500))
+    assert [(item.barcode, item.image_id, item.image_key) for item in items] == [
+        ("3017620422003", "2", None),
+        ("3017620422003", "2", "front_fr"),
+        ("123", "1", None),
+    ]
+    items = list(iter_image_manifest(products, selected_only=True, resolution="200"))
+    assert [item.url.rsplit("/", 1)[-1] for item in items] == [
+        "front_fr.5.200.jpg",
+        "ingredients_en.7.200.jpg",
+    ]
+
+    with pytest.raises(ValueError, match="invalid image resolution"):
+        list(iter_image_manifest(products, resolution="300"))
+    with pytest.raises(ValueError, match="raw images are not available"):
+        list(iter_image_manifest(products, resolution="200"))
+
+    path = tmp_path / "manifest.tsv.gz"
+    assert write_image_manifest(path, iter_image_manifest(products)) == 5
+    with gzip.open(path, "rt") as f:
+        lines = f.read().splitlines()
+    assert lines[0] == "barcode\timage_id\timage_key\turl\tocr_url"
+    assert lines[3].split("\t")[:3] == ["3017620422003", "2", "front_fr"]
+    assert len(lines) == 6
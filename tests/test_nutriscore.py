@@ -0,0 +1,179 @@
+import pytest
+
+from openfoodfacts.nutriscore import (
+    NutriScoreCategory,
+    build_nutrient_matrix,
+    compute_nutriscore,
+    get_nutriscore_category,
+)
+from openfoodfacts.taxonomy import Taxonomy
+
+np = pytest.importorskip("numpy")
+
+
+def test_get_nutriscore_category():
+    assert get_nutriscore_category([]) == NutriScoreCategory.general
+    assert (
+        get_nutriscore_category(["en:dairies", "en:cheeses"])
+        == NutriScoreCategory.cheese
+    )
+    assert (
+        get_nutriscore_category(["en:beverages", "en:waters"])
+        == NutriScoreCategory.water
+    )
+    assert (
+        get_nutriscore_category(["en:beverages", "en:milks"])
+        == NutriScoreCategory.general
+    )
+
+    taxonomy = Taxonomy.from_dict(
+        {
+            "en:beverages": {"parents": []},
+            "en:sodas": {"parents": ["en:beverages"]},
+            "en:colas": {"parents": ["en:sodas"]},
+        }
+    )
+    assert get_nutriscore_category(["en:colas"]) == NutriScoreCategory.general
+    assert (
+        get_nutriscore_category(["en:colas"], taxonomy.get_ancestor_ids)
+        == NutriScoreCategory.beverage
+    )
+
+
+def test_compute_nutriscore():
+    products = [
+        # Hazelnut spread
+        {
+            "code": "1",
+            "nutriments": {
+                "energy-kj_100g": 2252,
+                "sugars_100g": 56.3,
+                "saturated-fat_100g": 10.6,
+                "fat_100g": 30.9,
+                "salt_100g": 0.107,
+                "fiber_100g": 0,
+                "proteins_100g": 6.3,
+            },
+        },
+        # Plain yogurt, fiber and fruits are missing
+        {
+            "code": "2",
+            "nutriments": {
+                "energy_100g": 240,
+                "sugars_100g": 4.4,
+                "saturated-fat_100g": 0.8,
+                "fat_100g": 1.2,
+                "sodium_100g": 0.05,
+                "proteins_100g": 4.5,
+            },
+        },
+        # Cheese: proteins are always counted
+        {
+            "code": "3",
+            "categories_tags": ["en:cheeses"],
+            "nutriments": {
+                "energy-kj_100g": 1600,
+                "sugars_100g": 0.5,
+                "saturated-fat_100g": 17,
+                "fat_100g": 28,
+                "sodium_100g": 0.6,
+                "proteins_100g": 22,
+            },
+        },
+        # Olive oil: saturated fat ratio of 14.3%
+        {
+            "code": "4",
+            "categories_tags": ["en:fats"],
+            "nutriments": {
+                "energy-kj_100g": 3404,
+                "sugars_100g": 0,
+                "saturated-fat_100g": 14.3,
+                "fat_100g": 100,
+                "sodium_100g": 0,
+                "proteins_100g": 0,
+            },
+        },
+        # Soda
+        {
+            "code": "5",
+            "categories_tags": ["en:beverages"],
+            "nutriments": {
+                "energy-kj_100g": 180,
+                "sugars_100g": 10.6,
+                "saturated-fat_100g": 0,
+                "fat_100g": 0,
+                "sodium_100g": 0,
+                "proteins_100g": 0,
+            },
+        },
+        {"code": "6", "categories_tags": ["en:waters"]},
+        # Missing sugars
+        {"code": "7", "nutriments": {"energy-kj_100g": 100}},
+    ]
+    matrix = build_nutrient_matrix(products)
+    assert matrix.codes == [str(i) for i in range(1, 8)]
+    assert matrix.values.shape == (7, 8)
+    assert matrix.values.dtype == np.float32
+
+    scores, grades = compute_nutriscore(matrix.values, matrix.categories)
+    # 6 (energy) + 10 (sugars) + 10 (saturated fat) + 0 (sodium), proteins are
+    # not counted
+    assert scores[0] == 26
+    # 0 + 0 + 0 + 0 - 2 (proteins)
+    assert scores[1] == -2
+    # 4 + 0 + 10 + 6 - 5 (proteins)
+    assert scores[2] == 15
+    # 10 (energy) + 0 + 1 (saturated fat ratio) + 0
+    assert scores[3] == 11
+    # 6 (energy) + 8 (sugars)
+    assert scores[4] == 14
+    assert scores[5] == 0
+    assert np.isnan(scores[6])
+    assert grades.tolist() == ["e", "a", "d", "d", "e", "a", ""]
+
+
+def test_compute_nutriscore_empty():
+    matrix = build_nutrient_matrix([])
+    scores, grades = compute_nutriscore(matrix.values, matrix.categories)
+    assert scores.shape == grades.shape == (0,)
+
+
+def test_compute_nutriscore_missing_proteins():
+    nutriments = {
+        "energy-kj_100g": 1000,
+        "sugars_100g": 10,
+        "saturated-fat_100g": 2,
+        "salt_100g": 0.5,
+    }
+    matrix = build_nutrient_matrix(
+        [
+            {"code": "1", "nutriments": nutriments},
+            {"code": "2", "nutriments": {**nutriments, "proteins_100g": 0}},
+        ]
+    )
+    scores, grades = compute_nutriscore(matrix.values, matrix.categories)
+    assert np.isnan(scores[0])
+    assert grades[0] == ""
+    assert scores[1] == 7
+
+
+def test_build_nutrient_matrix_invalid_values():
+    nutriments = {
+        "energy-kj_100g": 1000,
+        "sugars_100g": 10,
+        "saturated-fat_100g": 2,
+        "salt_100g": 0.5,
+        "proteins_100g": 0,
+    }
+    matrix = build_nutrient_matrix(
+        [
+            {"code": "1", "nutriments": {**nutriments, "proteins_100g": ""}},
+            {"code": "2", "nutriments": {**nutriments, "sugars_100g": "<0.5"}},
+            {"code": "3", "nutriments": nutriments},
+        ]
+    )
+    scores, grades = compute_nutriscore(matrix.values, matrix.categories)
+    # Values that are not numbers are treated as missing
+    assert np.isnan(scores[:2]).all()
+    assert list(grades[:2]) == ["", ""]
+    assert scores[2] == 7
@@ -0,0 +1,138 @@
+import email.utils
+import http.server
+import json
+import threading
+import time
+
+import pytest
+import requests
+import requests_mock
+
+from openfoodfacts import API
+from openfoodfacts.ratelimit import (
+    AdaptiveRateLimiter,
+    EndpointClass,
+    TokenBucket,
+    parse_retry_after,
+)
+
+SEARCH_URL = "https://world.openfoodfacts.org/cgi/search.pl"
+
+
+def test_token_bucket():
+    bucket = TokenBucket(rate=20)
+    start = time.monotonic()
+    for _ in range(3):
+        bucket.acquire()
+    # The first token is available immediately, then one token every 50ms
+    assert time.monotonic() - start >= 0.09
+
+    with pytest.raises(ValueError):
+        TokenBucket(rate=0)
+
+
+def test_parse_retry_after():
+    assert parse_retry_after(None) is None
+    assert parse_retry_after("invalid") is None
+    assert parse_retry_after("12") == 12
+    assert parse_retry_after("-1") == 0
+    retry_after = parse_retry_after(email.utils.formatdate(time.time() + 30))
+    assert retry_after is not None and 25 < retry_after <= 30
+
+
+def test_aimd():
+    limiter = AdaptiveRateLimiter(
+        rates={EndpointClass.product: 10},
+        max_rates={EndpointClass.product: 20},
+        min_rate=1,
+        increase_step=0.1,
+        latency_threshold=1,
+    )
+    limiter.on_success(EndpointClass.product, latency=0.1)
+    assert limiter.get_rate(EndpointClass.product) == 12
+    limiter.on_throttled(EndpointClass.product)
+    assert limiter.get_rate(EndpointClass.product) == 6
+    limiter.on_success(EndpointClass.product, latency=2)
+    assert limiter.get_rate(EndpointClass.product) == pytest.approx(5.4)
+    for _ in range(10):
+        limiter.on_throttled(EndpointClass.product)
+    assert limiter.get_rate(EndpointClass.product) == 1
+    for _ in range(100):
+        limiter.on_success(EndpointClass.product, latency=0.1)
+    assert limiter.get_rate(EndpointClass.product) == 20
+    # Other endpoint classes are not affected
+    assert limiter.get_rate(EndpointClass.search) == 10 / 60
+
+
+def test_retry_delay():
+    limiter = AdaptiveRateLimiter(base_delay=1, max_delay=10)
+    assert limiter.get_retry_delay(0, retry_after=3) == 3
+    assert limiter.get_retry_delay(0, retry_after=3600) == 10
+    assert 0.5 <= limiter.get_retry_delay(0, None) <= 1
+    assert 4 <= limiter.get_retry_delay(3, None) <= 8
+    assert 5 <= limiter.get_retry_delay(10, None) <= 10
+
+
+def test_api_rate_limiter():
+    limiter = AdaptiveRateLimiter(rates={EndpointClass.search: 1000}, max_retries=2)
+    api = API(user_agent="test", rate_limiter=limiter)
+    with requests_mock.mock() as mock:
+        mock.get(
+            SEARCH_URL,
+            [
+                {"status_code": 429, "headers": {"Retry-After": "0"}},
+                {"status_code": 503, "headers": {"Retry-After": "0"}},
+                {"text": json.dumps({"products": []})},
+            ],
+        )
+        assert api.product.text_search("pizza") == {"products": []}
+        assert mock.call_count == 3
+        assert limiter.get_rate(EndpointClass.search) < 1000
+
+        # Once all retries are exhausted, the error is raised
+        mock.get(SEARCH_URL, status_code=429, headers={"Retry-After": "0"})
+        with pytest.raises(requests.HTTPError, match="429"):
+            api.product.text_search("pizza")
+        assert mock.call_count == 6
+
+
+def test_api_rate_limiter_with_session_retries():
+    # With session retries enabled, throttled responses must still reach the
+    # rate limiter instead of being retried by urllib3
+    paths = []
+
+    class Handler(http.server.BaseHTTPRequestHandler):
+        def do_GET(self):
+            paths.append(self.path)
+            if len(paths) == 1:
+                self.send_response(429)
+                self.send_header("Retry-After", "0")
+                self.send_header("Content-Length", "0")
+                self.end_headers()
+                return
+            content = json.dumps({"status": 1, "product": {"code": "1"}}).encode()
+            self.send_response(200)
+            self.send_header("Content-Length", str(len(content)))
+            self.end_headers()
+            self.wfile.write(content)
+
+        def log_message(self, format, *args):
+            pass
+
+    server = http.server.ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    try:
+        limiter = AdaptiveRateLimiter(rates={EndpointClass.product: 1000}, base_delay=0)
+        api = API(
+            user_agent="test",
+            base_url="http://127.0.0.1:%d" % server.server_address[1],
+            rate_limiter=limiter,
+            max_retries=3,
+        )
+        assert api.product.get("1") == {"code": "1"}
+        assert len(paths) == 2
+        assert limiter.get_rate(EndpointClass.product) < 1000
+    finally:
+        server.shutdown()
+        server.server_close()
@@ -0,0 +1,74 @@
+import pytest
+
+from openfoodfacts import API
+from openfoodfacts.dataset import ProductDataset
+from openfoodfacts.server import (
+    DatasetProductStore,
+    InMemoryProductStore,
+    LocalAPIServer,
+)
+from openfoodfacts.utils import jsonl_write
+
+PRODUCTS = [
+    {"code": "3017620422003", "product_name": "Nutella", "brands": "Ferrero"},
+    {"code": "00012345", "product_name": "Kinder Bueno", "brands": "Ferrero"},
+    {"code": "5449000000996", "product_name": "Coca-Cola", "brands": "Coca-Cola"},
+]
+
+
+@pytest.fixture(params=["memory", "dataset"])
+def store(request, tmp_path):
+    if request.param == "memory":
+        yield InMemoryProductStore(PRODUCTS)
+    else:
+        dataset_path = tmp_path / "products.jsonl"
+        jsonl_write(dataset_path, PRODUCTS)
+        store = DatasetProductStore(ProductDataset(dataset_path=dataset_path))
+        yield store
+        store.close()
+
+
+def test_local_api_server(store):
+    with LocalAPIServer(store) as server:
+        api = API(user_agent="test", base_url=server.base_url)
+        assert api.product.get("3017620422003") == PRODUCTS[0]
+        # Barcodes are normalized
+        assert api.product.get("12345") == PRODUCTS[1]
+        assert api.product.get("3017620422003", fields=["product_name"]) == {
+            "product_name": "Nutella"
+        }
+        assert api.product.get("1111111111111") is None
+
+        response = api.product.text_search("ferrero", page_size=1)
+        assert response["count"] == 2
+        assert response["products"] == [PRODUCTS[0]]
+        response = api.product.text_search("ferrero", page=2, page_size=1)
+        assert response["products"] == [PRODUCTS[1]]
+        response = api.product.text_search("kinder ferrero")
+        assert response["products"] == [PRODUCTS[1]]
+
+        assert list(api.product.text_search_stream("ferrero", page=2, page_size=1)) == [
+            PRODUCTS[1]
+        ]
+        for prefetch in (0, 2):
+            assert (
+                list(api.product.iter_search("ferrero", page_size=1, prefetch=prefetch))
+                == PRODUCTS[:2]
+            )
+
+        assert api.product.get_batch(
+            ["3017620422003", "12345", "1111111111111"],
+            fields=["product_name"],
+            chunk_size=2,
+            max_workers=2,
+        ) == {
+            "3017620422003": {"code": "3017620422003", "product_name": "Nutella"},
+            "12345": {"code": "00012345", "product_name": "Kinder Bueno"},
+        }
+
+
+def test_dataset_product_store_gzip(tmp_path):
+    dataset_path = tmp_path / "products.jsonl.gz"
+    jsonl_write(dataset_path, PRODUCTS)
+    with pytest.raises(ValueError, match="not seekable"):
+        DatasetProductStore(ProductDataset(dataset_path=dataset_path))
@@ -0,0 +1,125 @@
+import json
+from pathlib import Path
+from typing import List
+
+import pytest
+
+from openfoodfacts.dataset import ProductDataset
+from openfoodfacts.taxonomy import (
+    ProductUnknownTags,
+    Taxonomy,
+    TaxonomyCoverageChecker,
+    TaxonomyEnricher,
+    scan_taxonomy_coverage,
+)
+from openfoodfacts.types import TaxonomyType
+from openfoodfacts.utils import jsonl_write
+
+TAXONOMY_DATA = {
+    "en:foods": {"name": {"en": "Foods"}},
+    "en:beverages": {"name": {"en": "Beverages"}, "parents": ["en:foods"]},
+    "en:plant-based-foods": {"name": {"en": "Plant-based foods"}},
+    "en:fruit-juices": {
+        "name": {"en": "Fruit juices"},
+        "parents": ["en:beverages", "en:plant-based-foods"],
+    },
+    "en:orange-juices": {
+        "name": {"en": "Orange juices"},
+        "parents": ["en:fruit-juices"],
+    },
+}
+
+
+def test_get_ancestor_ids():
+    taxonomy = Taxonomy.from_dict(TAXONOMY_DATA)
+    assert taxonomy.get_ancestor_ids("en:orange-juices") == (
+        "en:fruit-juices",
+        "en:beverages",
+        "en:plant-based-foods",
+        "en:foods",
+    )
+    assert taxonomy.get_ancestor_ids("en:foods") == ()
+    assert taxonomy.get_ancestor_ids("en:unknown") == ()
+    assert {
+        node.id for node in taxonomy["en:orange-juices"].get_parents_hierarchy()
+    } == set(taxonomy.get_ancestor_ids("en:orange-juices"))
+
+
+def test_expand_tags():
+    taxonomy = Taxonomy.from_dict(TAXONOMY_DATA)
+    assert taxonomy.expand_tags(
+        [["en:beverages", "en:orange-juices"], ["en:unknown", "en:foods"], []]
+    ) == [
+        [
+            "en:beverages",
+            "en:orange-juices",
+            "en:foods",
+            "en:fruit-juices",
+            "en:plant-based-foods",
+        ],
+        ["en:unknown", "en:foods"],
+        [],
+    ]
+
+
+def test_taxonomy_enricher():
+    enricher = TaxonomyEnricher(Taxonomy.from_dict(TAXONOMY_DATA), "categories_tags")
+    assert enricher({"categories_tags": ["en:beverages"]}) == {
+        "categories_tags": ["en:beverages"],
+        "categories_tags_hierarchy": ["en:beverages", "en:foods"],
+    }
+    assert enricher({})["categories_tags_hierarchy"] == []
+
+
+def test_taxonomy_coverage_checker():
+    checker = TaxonomyCoverageChecker(
+        {TaxonomyType.category: Taxonomy.from_dict(TAXONOMY_DATA)}
+    )
+    result = checker(
+        {"code": "1", "categories_tags": ["en:foods", "en:unknown", "fr:inconnu"]}
+    )
+    assert result.code == "1"
+    assert result.unknown_tags == {"categories_tags": ["en:unknown", "fr:inconnu"]}
+    assert result.checked_tags == {"categories_tags": 3}
+    assert checker({"code": "2"}).unknown_tags == {}
+
+    with pytest.raises(ValueError):
+        TaxonomyCoverageChecker({TaxonomyType.brand: Taxonomy()})
+
+
+def test_scan_taxonomy_coverage(tmp_path: Path):
+    (tmp_path / "category.json").write_text(json.dumps(TAXONOMY_DATA))
+    (tmp_path / "label.json").write_text(json.dumps({"en:organic": {}}))
+    dataset_path = tmp_path / "products.jsonl.gz"
+    jsonl_write(
+        dataset_path,
+        [
+            {"code": "1", "categories_tags": ["en:foods"], "labels_tags": []},
+            {"code": "2", "categories_tags": ["en:foods", "en:unknown"]},
+            {"code": "3", "categories_tags": ["en:unknown"], "labels_tags": ["x"]},
+            {"code": "4", "labels_tags": ["en:organic"]},
+        ],
+    )
+
+    results: List[ProductUnknownTags] = []
+    report = scan_taxonomy_coverage(
+        ProductDataset(dataset_path=dataset_path),
+        ["category", TaxonomyType.label],
+        max_workers=2,
+        batch_size=1,
+        cache_dir=tmp_path,
+        callback=results.append,
+    )
+    assert [result.code for result in results] == ["2", "3"]
+    assert report.product_count == 4
+    assert report.checked_tags == {"categories_tags": 4, "labels_tags": 2}
+    assert report.products_with_unknown_tags == {
+        "categories_tags": 2,
+        "labels_tags": 1,
+    }
+    assert report.unknown_tags == {
+        "categories_tags": {"en:unknown": 2},
+        "labels_tags": {"x": 1},
+    }
+    assert report.get_unknown_ratio("categories_tags") == 0.5
+    assert report.get_unknown_ratio("origins_tags") == 0.0
@@ -1,10 +1,24 @@
+import http.server
 import io
+import json
+import threading
+import time
 
 import pytest
 import requests
 from PIL import Image
 
-from openfoodfacts.utils import AssetLoadingException, get_image_from_url
+from openfoodfacts.dataset import ProductDataset
+from openfoodfacts.utils import (
+    AssetLoadingException,
+    JSONLWriter,
+    ZstdSeekableReader,
+    create_http_session,
+    get_image_from_url,
+    iter_json_array,
+    jsonl_iter,
+    jsonl_write,
+)
 
 
 def test_get_image_from_url(requests_mock):
@@ -66,3 +80,113 @@ def test_get_image_from_url(requests_mock):
     requests_mock.get(http_error_url, status_code=404)
     with pytest.raises(AssetLoadingException):
         get_image_from_url(http_error_url)
+
+
+@pytest.mark.parametrize(
+    "file_name", ["products.jsonl", "products.jsonl.gz", "products.jsonl.zst"]
+)
+def test_jsonl_write(tmp_path, file_name):
+    path = tmp_path / file_name
+    items = [{"code": str(i), "product_name": f"é {i}"} for i in range(1000)]
+    # Use a small block size to get several gzip members
+    with JSONLWriter(path, block_size=1024, max_workers=2) as writer:
+        for item in items:
+            writer.write(item)
+    assert writer.count == len(items)
+    assert list(jsonl_iter(path)) == items
+    assert list(ProductDataset(dataset_path=path)) == items
+
+    assert jsonl_write(path, items[:10]) == 10
+    assert list(jsonl_iter(path)) == items[:10]
+
+
+def test_jsonl_writer_discard_on_error(tmp_path):
+    path = tmp_path / "products.jsonl.gz"
+    with pytest.raises(RuntimeError):
+        with JSONLWriter(path) as writer:
+            writer.write({"code": "1"})
+            raise RuntimeError()
+    assert list(tmp_path.iterdir()) == []
+
+
+def test_zstd_seekable_reader(tmp_path):
+    path = tmp_path / "data.jsonl.zst"
+    items = list(range(1000))
+    with JSONLWriter(path, block_size=100) as writer:
+        for item in items:
+            writer.write(item)
+    data = "".join(f"{item}\n" for item in items).encode()
+
+    with ZstdSeekableReader(path) as reader:
+        # One frame start per block + the initial (0, 0) entry
+        assert len(reader.frames) > 10
+        assert reader.readall() == data
+        for offset in (2000, 150, 0, 3889, len(data)):
+            assert reader.seek(offset) == offset
+            assert reader.read(10) == data[offset : offset + 10]
+
+
+@pytest.mark.parametrize("chunk_size", [1, 3, 16, 10_000])
+def test_iter_json_array(chunk_size):
+    products = [
+        {"code": "1", "name": 'a "quoted"]}, name\\', "tags": [1, {"a": []}]},
+        2,
+        "s,]",
+        None,
+        [3, [4]],
+        {},
+    ]
+    data = json.dumps(
+        {
+            "count": 6,
+            "nested": {"products": [1]},
+            'x"products': "products",
+            "products": products,
+            "after": 1,
+        }
+    ).encode()
+    chunks = [data[i : i + chunk_size] for i in range(0, len(data), chunk_size)]
+    assert list(iter_json_array(chunks, "products")) == products
+    assert list(iter_json_array([b'{"products": []}'], "products")) == []
+
+
+@pytest.mark.parametrize(
+    "value", [b'{"a": 1}', b"null", b"1", b'"a"', b"true", b'"[1]"']
+)
+def test_iter_json_array_not_an_array(value):
+    with pytest.raises(ValueError, match="not an array"):
+        list(iter_json_array([b'{"products": ' + value + b"}"], "products"))
+    with pytest.raises(ValueError, match="not an array"):
+        list(iter_json_array([b'{"products": ' + value + b', "a": []}'], "products"))
+
+
+def test_iter_json_array_invalid():
+    with pytest.raises(ValueError, match="not found"):
+        list(iter_json_array([b'{"count": 0, "a": {"products": []}}'], "products"))
+    with pytest.raises(ValueError, match="ends before"):
+        list(iter_json_array([b'{"products": [{"a": 1},'], "products"))
+
+
+class _SlowHandler(http.server.BaseHTTPRequestHandler):
+    def do_GET(self):
+        time.sleep(0.5)
+        self.send_response(200)
+        self.end_headers()
+
+    def log_message(self, format, *args):
+        pass
+
+
+@pytest.mark.parametrize("max_retries", [0, 2])
+def test_create_http_session_read_timeout(max_retries):
+    server = http.server.ThreadingHTTPServer(("127.0.0.1", 0), _SlowHandler)
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    try:
+        session = create_http_session(max_retries=max_retries)
+        url = "http://127.0.0.1:%d/" % server.server_address[1]
+        with pytest.raises(requests.Timeout):
+            session.get(url, timeout=0.1)
+    finally:
+        server.shutdown()
+        server.server_close()